@@ -0,0 +1,483 @@
+import logging
+import mmap
+import os
+import struct
+from array import array
+from collections.abc import Mapping
+
+import numpy as np
+
+from .posting_list import PostingList
+from .term_dictionary import TermDictionary
+
+MAGIC = b'MIRIDX02'
+# magic, number of documents, number of terms, number of postings, then the
+# byte offsets of the doc table, the block offsets and blocks of the
+# front-coded term dictionary, the posting offsets, doc ids and tfs.
+HEADER = struct.Struct('<8sIIQ' + 'Q' * 7)
+ALIGNMENT = 8
+# the SMART document weightings with cosine normalization, in the order
+# their norms are stored in a document norms file
+NORMALIZED_SCHEMES = ('nnc', 'ntc', 'lnc', 'ltc')
+
+logger = logging.getLogger(__name__)
+
+
+def unmap(file_path: str, mapping, views=()) -> bool:
+    """
+    Releases the views over a mapped file and unmaps it.
+
+    Arrays or memoryviews handed out over the file, e.g. the arrays of a
+    posting list, keep the mapping alive: they stay valid, the mapping is
+    unmapped when the last of them is released, and this is logged.
+
+    Parameters
+    ----------
+    file_path : str
+        The path of the mapped file, for the log.
+    mapping : mmap.mmap
+        The mapping, or b'' for an empty file that could not be mapped.
+    views : iterable of memoryview
+        The views the index made over the mapping.
+
+    Returns
+    -------
+    bool
+        True if the file is unmapped, False if it is still referenced.
+    """
+    referenced = False
+    for view in views:
+        try:
+            view.release()
+        except BufferError:
+            referenced = True
+    if mapping:
+        try:
+            mapping.close()
+        except BufferError:
+            referenced = True
+    if referenced:
+        logger.warning('%s is still referenced, it is unmapped once the arrays over it are released', file_path)
+    return not referenced
+
+
+class BinaryIndexWriter:
+    magic = MAGIC
+    header = HEADER
+
+    def __init__(self, file_path: str, document_ids: list):
+        """
+        Initializes the BinaryIndexWriter.
+
+        Terms have to be added in ascending (UTF-8 byte) order, the file is
+        written when `close` is called.
+
+        Parameters
+        ----------
+        file_path : str
+            The path of the binary index file to write.
+        document_ids : list
+            The document IDs (e.g. 'tt0111161') of the index. Postings refer to
+            documents by their internal ID, i.e. their position in this list.
+        """
+        self.file_path = file_path
+        self.document_ids = list(document_ids)
+        self.terms = []
+        self.posting_offsets = array('Q', [0])
+        self.doc_ids = array('I')
+        self.tfs = array('I')
+        self.last_term = None
+
+    def add(self, term: str, doc_ids, tfs):
+        """
+        Appends the posting list of a term.
+
+        Parameters
+        ----------
+        term : str
+            The term. Must be greater than every term added before.
+        doc_ids : iterable of int
+            Sorted internal IDs of the documents.
+        tfs : iterable of int
+            The term frequency of the term in each of the documents.
+        """
+        encoded_term = term.encode('utf-8')
+        if self.last_term is not None and encoded_term <= self.last_term:
+            raise ValueError(f'Terms must be added in ascending order: {term}')
+        self.last_term = encoded_term
+
+        self.terms.append(encoded_term)
+        self.doc_ids.extend(doc_ids)
+        self.tfs.extend(tfs)
+        if len(self.doc_ids) != len(self.tfs):
+            raise ValueError(f'doc_ids and tfs of {term} have different lengths')
+        self.posting_offsets.append(len(self.doc_ids))
+
+    def get_counts(self):
+        """
+        Returns the counts stored in the header after the magic.
+        """
+        return len(self.document_ids), len(self.terms), len(self.doc_ids)
+
+    def get_posting_sections(self):
+        """
+        Returns the sections that follow the term dictionary.
+        """
+        return [self.posting_offsets.tobytes(), self.doc_ids.tobytes(), self.tfs.tobytes()]
+
+    def close(self):
+        """
+        Writes the index to `file_path`.
+        """
+        doc_offsets, doc_blob = self.pack_strings(
+            [doc_id.encode('utf-8') for doc_id in self.document_ids])
+        term_offsets, term_blob = TermDictionary.encode(self.terms)
+
+        sections = [doc_offsets, doc_blob, term_offsets, term_blob] + self.get_posting_sections()
+        offsets = []
+        position = self.header.size
+        for section in sections:
+            position = self.align(position)
+            offsets.append(position)
+            position += len(section)
+
+        with open(self.file_path, 'wb') as file:
+            file.write(self.header.pack(self.magic, *self.get_counts(), *offsets))
+            for offset, section in zip(offsets, sections):
+                file.write(b'\0' * (offset - file.tell()))
+                file.write(section)
+
+    @staticmethod
+    def pack_strings(strings):
+        """
+        Packs byte strings into an offsets array and one contiguous blob.
+        """
+        offsets = array('Q', [0])
+        for string in strings:
+            offsets.append(offsets[-1] + len(string))
+        return offsets.tobytes(), b''.join(strings)
+
+    @staticmethod
+    def align(position):
+        return (position + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def write_binary_index(file_path: str, field_index: dict, doc_id_map):
+    """
+    Writes a {term: PostingList} index in the binary format.
+
+    Parameters
+    ----------
+    file_path : str
+        The path of the binary index file to write.
+    field_index : dict
+        The index of one field (stars, genres, summaries).
+    doc_id_map : DocIdMap
+        The map the internal document IDs of the postings come from. It is
+        stored as the doc table of the file.
+    """
+    writer = BinaryIndexWriter(file_path, doc_id_map.document_ids)
+    for term in sorted(field_index, key=lambda t: t.encode('utf-8')):
+        postings = field_index[term]
+        writer.add(term, postings.doc_ids, postings.tfs)
+    writer.close()
+
+
+class BinaryIndex(Mapping):
+    magic = MAGIC
+    header = HEADER
+
+    def __init__(self, file_path: str):
+        """
+        Memory-maps a binary index file.
+
+        Nothing but the header is read here, posting lists are decoded on
+        demand when a term is looked up. The object behaves like a read-only
+        {term: PostingList} dict whose postings point into the mapped file.
+
+        Parameters
+        ----------
+        file_path : str
+            The path of the binary index file.
+        """
+        self.file_path = file_path
+        self.file = open(file_path, 'rb')
+        self.mmap = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.buffer = memoryview(self.mmap)
+        self.views = []
+
+        magic, *header_values = self.header.unpack_from(self.buffer)
+        if magic != self.magic:
+            raise ValueError(f'{file_path} is not a {type(self).__name__} file')
+        self.read_sections(*header_values)
+
+    def read_sections(self, number_of_documents, number_of_terms, number_of_postings,
+                      doc_offsets, doc_blob, term_offsets, term_blob, posting_offsets, doc_ids, tfs):
+        """
+        Maps the sections of the file given the counts and offsets of the header.
+        """
+        self.number_of_documents = number_of_documents
+        self.number_of_terms = number_of_terms
+        self.number_of_postings = number_of_postings
+        self.doc_offsets = self.section(doc_offsets, number_of_documents + 1, 'Q')
+        self.doc_blob = self.blob(doc_blob, term_offsets)
+        self.read_term_dictionary(term_offsets, term_blob, posting_offsets)
+        self.posting_offsets = self.section(posting_offsets, number_of_terms + 1, 'Q')
+        self.doc_ids = self.section(doc_ids, number_of_postings, 'I')
+        self.tfs = self.section(tfs, number_of_postings, 'I')
+
+    def read_term_dictionary(self, term_offsets, term_blob, end):
+        """
+        Maps the front-coded term dictionary, whose blocks end at `end`.
+        """
+        number_of_blocks = TermDictionary.get_number_of_blocks(self.number_of_terms)
+        self.term_offsets = self.section(term_offsets, number_of_blocks + 1, 'Q')
+        self.term_blob = self.blob(term_blob, end)
+        self.term_dictionary = TermDictionary(self.term_offsets, self.term_blob, self.number_of_terms)
+
+    def section(self, offset, length, typecode):
+        size = array(typecode).itemsize
+        view = self.buffer[offset:offset + length * size].cast(typecode)
+        self.views.append(view)
+        return view
+
+    def blob(self, start, end):
+        view = self.buffer[start:end]
+        self.views.append(view)
+        return view
+
+    def get_term(self, ordinal: int) -> str:
+        """
+        Returns the term with the given position in the sorted term dictionary.
+        """
+        return self.term_dictionary.get_term(ordinal)
+
+    def get_document_id(self, internal_id: int) -> str:
+        """
+        Returns the IMDb ID of the document with the given internal ID.
+        """
+        return str(self.doc_blob[self.doc_offsets[internal_id]:self.doc_offsets[internal_id + 1]], 'utf-8')
+
+    def get_document_ids(self) -> list:
+        """
+        Returns the doc table, i.e. the IMDb IDs ordered by internal ID.
+        """
+        return [self.get_document_id(internal_id) for internal_id in range(self.number_of_documents)]
+
+    def find_term(self, term: str) -> int:
+        """
+        Looks a term up in the term dictionary.
+
+        Returns
+        -------
+        int
+            The ordinal of the term, or -1 if it is not in the index.
+        """
+        return self.term_dictionary.find(term)
+
+    def get_terms_with_prefix(self, prefix: str) -> list:
+        """
+        Returns the terms starting with a prefix, in ascending order.
+        """
+        return self.term_dictionary.get_terms(self.term_dictionary.find_prefix(prefix))
+
+    def get_terms_in_range(self, low: str = None, high: str = None) -> list:
+        """
+        Returns the terms t with low <= t < high in ascending order, a missing bound being open.
+        """
+        return self.term_dictionary.get_terms(self.term_dictionary.find_range(low, high))
+
+    def get_posting_arrays(self, term: str):
+        """
+        Returns the raw posting list of a term without copying it.
+
+        Returns
+        -------
+        tuple
+            (internal doc IDs, tfs) as memoryviews into the mapped file, or
+            None if the term is not in the index.
+        """
+        ordinal = self.find_term(term)
+        if ordinal < 0:
+            return None
+        start, end = self.posting_offsets[ordinal], self.posting_offsets[ordinal + 1]
+        return self.doc_ids[start:end], self.tfs[start:end]
+
+    def get_posting_list(self, term: str):
+        """
+        Returns the posting list of a term, or None if it is not in the index.
+        """
+        posting_arrays = self.get_posting_arrays(term)
+        if posting_arrays is None:
+            return None
+        return PostingList(*posting_arrays)
+
+    def get_posting_lists(self, terms) -> dict:
+        """
+        Looks up many terms at once.
+
+        Returns
+        -------
+        dict
+            {term: PostingList} for the terms that are in the index.
+        """
+        posting_lists = {}
+        for term in terms:
+            postings = self.get_posting_list(term)
+            if postings is not None:
+                posting_lists[term] = postings
+        return posting_lists
+
+    def get_document_frequency(self, term: str) -> int:
+        """
+        Returns the number of documents containing a term without touching
+        its posting list.
+        """
+        ordinal = self.find_term(term)
+        if ordinal < 0:
+            return 0
+        return self.posting_offsets[ordinal + 1] - self.posting_offsets[ordinal]
+
+    def __getitem__(self, term):
+        postings = self.get_posting_list(term)
+        if postings is None:
+            raise KeyError(term)
+        return postings
+
+    def __contains__(self, term):
+        return isinstance(term, str) and self.find_term(term) >= 0
+
+    def __iter__(self):
+        return iter(self.term_dictionary)
+
+    def __len__(self):
+        return self.number_of_terms
+
+    def close(self):
+        """
+        Unmaps the file, see `unmap`. Posting arrays returned before that are
+        still referenced keep it mapped until they are released.
+        """
+        unmap(self.file_path, self.mmap, self.views + [self.buffer])
+        self.views = []
+        self.file.close()
+
+
+def write_document_lengths(file_path: str, lengths):
+    """
+    Writes the lengths of the documents of one field, ordered by internal
+    document ID, as a raw array of uint32.
+
+    Parameters
+    ----------
+    file_path : str
+        The path of the file to write.
+    lengths : iterable of int
+        The length of every document, the first one being internal ID 0.
+    """
+    with open(file_path, 'wb') as file:
+        file.write(array('I', lengths).tobytes())
+
+
+class DocumentLengths(Mapping):
+    def __init__(self, file_path: str):
+        """
+        Memory-maps a document lengths file written by `write_document_lengths`.
+
+        It behaves like a read-only {internal document ID: length} dict.
+        Every process mapping the file shares the same pages.
+
+        Parameters
+        ----------
+        file_path : str
+            The path of the document lengths file.
+        """
+        self.file_path = file_path
+        self.file = open(file_path, 'rb')
+        # an empty file can not be mapped
+        self.mmap = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ) if os.fstat(self.file.fileno()).st_size else b''
+        self.lengths = memoryview(self.mmap).cast('I')
+
+    def as_array(self) -> np.ndarray:
+        """
+        Returns the lengths as a uint32 array over the mapped file, indexed by internal ID.
+        """
+        return np.frombuffer(self.lengths, dtype=np.uint32)
+
+    def __getitem__(self, internal_id):
+        try:
+            if 0 <= internal_id < len(self.lengths):
+                return self.lengths[int(internal_id)]
+        except TypeError:
+            pass
+        raise KeyError(internal_id)
+
+    def __iter__(self):
+        return iter(range(len(self.lengths)))
+
+    def __len__(self):
+        return len(self.lengths)
+
+    def close(self):
+        """
+        Unmaps the file, see `unmap`.
+        """
+        unmap(self.file_path, self.mmap, [self.lengths])
+        self.file.close()
+
+
+def write_document_norms(file_path: str, norms: dict):
+    """
+    Writes the vector norms of the documents of one field as float64 arrays
+    ordered by internal document ID, one after the other in the order of
+    NORMALIZED_SCHEMES.
+
+    Parameters
+    ----------
+    file_path : str
+        The path of the file to write.
+    norms : dict
+        {scheme: array of the norm of every document}
+    """
+    with open(file_path, 'wb') as file:
+        for scheme in NORMALIZED_SCHEMES:
+            file.write(np.asarray(norms[scheme], dtype=np.float64).tobytes())
+
+
+class DocumentNorms(Mapping):
+    def __init__(self, file_path: str):
+        """
+        Memory-maps a document norms file written by `write_document_norms`.
+
+        It behaves like a read-only {scheme: array} dict, where the array
+        holds the norm of every document by internal ID.
+
+        Parameters
+        ----------
+        file_path : str
+            The path of the document norms file.
+        """
+        self.file_path = file_path
+        self.file = open(file_path, 'rb')
+        # an empty file can not be mapped
+        self.mmap = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ) if os.fstat(self.file.fileno()).st_size else b''
+        self.norms = np.frombuffer(self.mmap, dtype=np.float64).reshape(len(NORMALIZED_SCHEMES), -1)
+
+    def __getitem__(self, scheme):
+        if scheme not in NORMALIZED_SCHEMES:
+            raise KeyError(scheme)
+        return self.norms[NORMALIZED_SCHEMES.index(scheme)]
+
+    def __iter__(self):
+        return iter(NORMALIZED_SCHEMES)
+
+    def __len__(self):
+        return len(NORMALIZED_SCHEMES)
+
+    def close(self):
+        """
+        Unmaps the file, see `unmap`.
+        """
+        del self.norms
+        unmap(self.file_path, self.mmap)
+        self.file.close()
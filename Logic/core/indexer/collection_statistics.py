@@ -0,0 +1,255 @@
+import json
+import struct
+
+import numpy as np
+
+from .indexes_enum import Index_types, Index_formats
+
+MAGIC = b'MIRSTA01'
+# magic, number of documents, number of tokens, number of terms, followed by
+# the document frequencies (uint32) and collection frequencies (uint64) of
+# the terms in the order of the term ordinals of the binary index.
+HEADER = struct.Struct('<8sQQQ')
+IDF_VARIANTS = ('raw', 'log', 'smoothed', 'bm25')
+# the idf of the SMART t weighting unless an index is built with another one, see `Index`
+DEFAULT_IDF_VARIANT = 'raw'
+
+
+def compute_idfs(document_frequencies, number_of_documents: int, variant: str = 'log') -> np.ndarray:
+    """
+    Computes the inverse document frequencies of terms.
+
+    Parameters
+    ----------
+    document_frequencies : array
+        The document frequency df of every term.
+    number_of_documents : int
+        The number of documents N.
+    variant : str
+        raw: N / df
+        log: log(N / df)
+        smoothed: log((N + 1) / (df + 1)) + 1
+        bm25: log((N - df + 0.5) / (df + 0.5) + 1), the probabilistic idf,
+        kept positive for terms in more than half of the documents.
+
+    Returns
+    -------
+    numpy.ndarray
+        The idf of every term, 0 for the terms with df 0.
+    """
+    df = np.asarray(document_frequencies, dtype=np.float64)
+    n = float(number_of_documents)
+    present = df > 0
+    safe_df = np.where(present, df, 1)
+    if variant == 'raw':
+        idfs = n / safe_df
+    elif variant == 'log':
+        idfs = np.log(n / safe_df)
+    elif variant == 'smoothed':
+        idfs = np.log((n + 1) / (safe_df + 1)) + 1
+    elif variant == 'bm25':
+        idfs = np.log((n - safe_df + 0.5) / (safe_df + 0.5) + 1)
+    else:
+        raise ValueError(f'Unknown idf variant {variant}, expected one of {IDF_VARIANTS}')
+    return np.where(present, idfs, 0.0)
+
+
+class FieldStatistics:
+    def __init__(self, document_frequencies=None, collection_frequencies=None, number_of_documents: int = 0,
+                 total_tokens: int = 0, find_term=None):
+        """
+        The collection statistics of one field: the document frequency and
+        collection frequency of every term, the number of documents and of
+        tokens, and the idf tables derived from them.
+
+        Every term has a slot in the arrays, so a lookup is an array read.
+        The idf tables are computed for all the terms at once the first time
+        they are needed after a change.
+
+        Parameters
+        ----------
+        document_frequencies : array
+            The df of every term slot.
+        collection_frequencies : array
+            The number of occurrences of every term slot in the field.
+        number_of_documents : int
+            The number of documents, including the ones with an empty field.
+        total_tokens : int
+            The number of tokens of the field in all the documents.
+        find_term : callable
+            Returns the slot of a term, -1 if it has none, e.g. the
+            `find_term` of a binary index whose term ordinals are the slots.
+            By default terms get slots as they are added, and the statistics
+            can be updated with `add_document` and `remove_document`.
+        """
+        self.df = np.zeros(0, dtype=np.int64) if document_frequencies is None else document_frequencies
+        self.cf = np.zeros(0, dtype=np.int64) if collection_frequencies is None else collection_frequencies
+        self.number_of_documents = number_of_documents
+        self.total_tokens = total_tokens
+        self.slots = {} if find_term is None else None
+        self.find_term = (lambda term: self.slots.get(term, -1)) if find_term is None else find_term
+        self.idf_tables = {}
+
+    def get_slot(self, term: str) -> int:
+        """
+        Returns the slot of a term, allocating one if needed.
+        """
+        slot = self.slots.get(term)
+        if slot is None:
+            slot = self.slots[term] = len(self.slots)
+            if slot == len(self.df):
+                capacity = max(2 * len(self.df), 16)
+                self.df = np.concatenate([self.df, np.zeros(capacity - len(self.df), dtype=np.int64)])
+                self.cf = np.concatenate([self.cf, np.zeros(capacity - len(self.cf), dtype=np.int64)])
+        return slot
+
+    def update_document(self, term_frequencies: dict, sign: int):
+        if self.slots is None:
+            raise TypeError('Statistics read from a file can not be updated')
+        for term, tf in term_frequencies.items():
+            slot = self.get_slot(term)
+            self.df[slot] += sign
+            self.cf[slot] += sign * tf
+        self.number_of_documents += sign
+        self.total_tokens += sign * sum(term_frequencies.values())
+        self.idf_tables = {}
+
+    def add_document(self, term_frequencies: dict):
+        """
+        Counts a document with the given {term: tf} in this field.
+        """
+        self.update_document(term_frequencies, 1)
+
+    def remove_document(self, term_frequencies: dict):
+        """
+        Stops counting a document added with the given {term: tf}.
+        """
+        self.update_document(term_frequencies, -1)
+
+    def get_idf_table(self, variant: str = 'log') -> np.ndarray:
+        """
+        Returns the idf of every term slot, see `compute_idfs`.
+        """
+        idfs = self.idf_tables.get(variant)
+        if idfs is None:
+            idfs = self.idf_tables[variant] = compute_idfs(self.df, self.number_of_documents, variant)
+        return idfs
+
+    def get_document_frequency(self, term: str) -> int:
+        slot = self.find_term(term)
+        return int(self.df[slot]) if slot >= 0 else 0
+
+    def get_collection_frequency(self, term: str) -> int:
+        slot = self.find_term(term)
+        return int(self.cf[slot]) if slot >= 0 else 0
+
+    def get_idf(self, term: str, variant: str = 'log') -> float:
+        slot = self.find_term(term)
+        return float(self.get_idf_table(variant)[slot]) if slot >= 0 else 0.0
+
+    def get_average_length(self) -> float:
+        """
+        Returns the average number of tokens of the field per document.
+        """
+        return self.total_tokens / self.number_of_documents if self.number_of_documents else 0.0
+
+    def get_terms(self):
+        """
+        Returns the terms with a non-zero document frequency, for statistics built in memory.
+        """
+        return [term for term, slot in self.slots.items() if self.df[slot]]
+
+    def store(self, path: str, field: str, index_format: Index_formats = Index_formats.JSON):
+        """
+        Stores the statistics next to the index of the field.
+
+        The JSON format stores {term: [df, cf]}. The binary formats store
+        arrays in the order of the term ordinals of the binary index of the
+        field, i.e. of the terms sorted by their UTF-8 bytes, which the
+        statistics are then read with.
+
+        Parameters
+        ----------
+        path : str
+            The path to the directory where the indexes are stored.
+        field : str
+            The name of the field.
+        index_format : Index_formats
+            The format of the index of the field.
+        """
+        terms = sorted(self.get_terms(), key=lambda term: term.encode('utf-8'))
+        file_path = get_statistics_path(path, field, index_format)
+        if index_format == Index_formats.JSON:
+            with open(file_path, 'w') as file:
+                json.dump({
+                    'document_count': self.number_of_documents,
+                    'total_tokens': self.total_tokens,
+                    'terms': {term: [int(self.df[self.slots[term]]), int(self.cf[self.slots[term]])] for term in terms},
+                }, file)
+            return
+        slots = np.array([self.slots[term] for term in terms], dtype=np.int64)
+        with open(file_path, 'wb') as file:
+            file.write(HEADER.pack(MAGIC, self.number_of_documents, self.total_tokens, len(terms)))
+            file.write(self.df[slots].astype(np.uint32).tobytes())
+            file.write(self.cf[slots].astype(np.uint64).tobytes())
+
+    @classmethod
+    def read(cls, path: str, field: str, index_format: Index_formats = Index_formats.JSON, find_term=None):
+        """
+        Reads statistics stored by `store`.
+
+        Parameters
+        ----------
+        find_term : callable
+            For the binary formats, the `find_term` of the binary index of the field.
+        """
+        file_path = get_statistics_path(path, field, index_format)
+        if index_format == Index_formats.JSON:
+            with open(file_path) as file:
+                data = json.load(file)
+            statistics = cls(number_of_documents=data['document_count'], total_tokens=data['total_tokens'])
+            for term, (df, cf) in data['terms'].items():
+                slot = statistics.get_slot(term)
+                statistics.df[slot] = df
+                statistics.cf[slot] = cf
+            return statistics
+        with open(file_path, 'rb') as file:
+            magic, number_of_documents, total_tokens, number_of_terms = HEADER.unpack(file.read(HEADER.size))
+            if magic != MAGIC:
+                raise ValueError(f'{file_path} is not a statistics file')
+            df = np.fromfile(file, dtype=np.uint32, count=number_of_terms).astype(np.int64)
+            cf = np.fromfile(file, dtype=np.uint64, count=number_of_terms).astype(np.int64)
+        return cls(df, cf, number_of_documents, total_tokens, find_term)
+
+
+def get_statistics_path(path: str, field: str, index_format: Index_formats) -> str:
+    extension = Index_formats.JSON.value if index_format == Index_formats.JSON else Index_formats.BINARY.value
+    return f'{path}{field}_{Index_types.STATISTICS.value}.{extension}'
+
+
+class CollectionStatistics(dict):
+    def __init__(self, fields):
+        """
+        The {field: FieldStatistics} of an index, kept up to date as
+        documents are added and removed.
+
+        Parameters
+        ----------
+        fields : List[str]
+            The names of the fields.
+        """
+        super().__init__({field: FieldStatistics() for field in fields})
+
+    def add_document(self, forward_postings: dict):
+        """
+        Counts a document given as {field: {term: tf}}.
+        """
+        for field, term_frequencies in forward_postings.items():
+            self[field].add_document(term_frequencies)
+
+    def remove_document(self, forward_postings: dict):
+        """
+        Stops counting a document given as {field: {term: tf}}.
+        """
+        for field, term_frequencies in forward_postings.items():
+            self[field].remove_document(term_frequencies)
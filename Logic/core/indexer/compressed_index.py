@@ -0,0 +1,387 @@
+import struct
+from array import array
+
+import numpy as np
+
+from .binary_index import BinaryIndexWriter, BinaryIndex
+from .posting_list import PostingList
+
+MAGIC = b'MIRIDZ02'
+# magic, number of documents, terms, postings and blocks, then the byte
+# offsets of the doc table, term dictionary (two sections), posting offsets, term block offsets,
+# block last doc ids, block byte offsets and the compressed postings.
+HEADER = struct.Struct('<8sIIQQ' + 'Q' * 9)
+BLOCK_SIZE = 128
+VARBYTE_LIMITS = np.array([1 << 7, 1 << 14, 1 << 21, 1 << 28], dtype=np.uint64)
+
+
+def encode_varbyte(values) -> bytes:
+    """
+    Variable-byte encodes unsigned integers.
+
+    Every value is split into 7 bit groups, lowest group first, and the high
+    bit marks the last byte of a value.
+
+    Parameters
+    ----------
+    values : numpy.ndarray
+        The values to encode, at most 2^35 - 1.
+    """
+    values = np.asarray(values, dtype=np.uint64)
+    lengths = 1 + (values[:, None] >= VARBYTE_LIMITS).sum(axis=1)
+    ends = np.cumsum(lengths)
+    starts = ends - lengths
+    encoded = np.zeros(ends[-1] if len(ends) else 0, dtype=np.uint8)
+    for group in range(len(VARBYTE_LIMITS) + 1):
+        has_group = lengths > group
+        encoded[starts[has_group] + group] = (values[has_group] >> np.uint64(7 * group)) & np.uint64(0x7f)
+    encoded[ends - 1] |= 0x80
+    return encoded.tobytes()
+
+
+def decode_varbyte(data) -> np.ndarray:
+    """
+    Decodes a buffer of variable-byte encoded unsigned integers.
+
+    Returns
+    -------
+    numpy.ndarray
+        The decoded values as uint64.
+    """
+    encoded = np.frombuffer(data, dtype=np.uint8)
+    if not len(encoded):
+        return np.zeros(0, dtype=np.uint64)
+    stops = (encoded & 0x80) != 0
+    value_index = np.cumsum(stops) - stops
+    value_starts = np.concatenate(([0], np.flatnonzero(stops)[:-1] + 1))
+    shifts = 7 * (np.arange(len(encoded)) - value_starts[value_index])
+    groups = (encoded & 0x7f).astype(np.uint64) << shifts.astype(np.uint64)
+    # every bit is set by exactly one group, so summing is exact
+    return np.bincount(value_index, weights=groups, minlength=len(value_starts)).astype(np.uint64)
+
+
+def encode_block(doc_ids, tfs, previous_doc_id: int) -> bytes:
+    """
+    Encodes one block of postings as interleaved (doc id gap, tf - 1) varbytes.
+
+    Parameters
+    ----------
+    doc_ids : numpy.ndarray
+        The sorted doc ids of the block.
+    tfs : numpy.ndarray
+        The tfs of the block, all at least 1.
+    previous_doc_id : int
+        The last doc id of the previous block, -1 for the first block.
+    """
+    gaps = np.diff(doc_ids.astype(np.int64), prepend=previous_doc_id)
+    values = np.empty(2 * len(doc_ids), dtype=np.uint64)
+    values[0::2] = gaps
+    values[1::2] = tfs.astype(np.uint64) - 1
+    return encode_varbyte(values)
+
+
+def decode_postings(data, previous_doc_id: int):
+    """
+    Decodes consecutive encoded blocks.
+
+    Parameters
+    ----------
+    data : buffer
+        The encoded blocks.
+    previous_doc_id : int
+        The last doc id before the first decoded block, -1 for the first block.
+
+    Returns
+    -------
+    tuple
+        (doc ids, tfs) as uint32 arrays.
+    """
+    values = decode_varbyte(data).astype(np.int64)
+    doc_ids = np.cumsum(values[0::2]) + previous_doc_id
+    return doc_ids.astype(np.uint32), (values[1::2] + 1).astype(np.uint32)
+
+
+class CompressedIndexWriter(BinaryIndexWriter):
+    magic = MAGIC
+    header = HEADER
+
+    def __init__(self, file_path: str, document_ids: list):
+        """
+        Initializes the CompressedIndexWriter.
+
+        Posting lists are gap encoded with variable-byte codes in blocks of
+        BLOCK_SIZE postings. The last doc id and byte offset of every block
+        are stored uncompressed, so a reader can skip to and decode a single
+        block.
+
+        Parameters
+        ----------
+        file_path : str
+            The path of the compressed index file to write.
+        document_ids : list
+            The doc table of the index, see `BinaryIndexWriter`.
+        """
+        super().__init__(file_path, document_ids)
+        self.term_block_offsets = array('Q', [0])
+        self.block_last_doc_ids = array('I')
+        self.block_offsets = array('Q', [0])
+        self.data = bytearray()
+        self.number_of_postings = 0
+
+    def add(self, term: str, doc_ids, tfs):
+        """
+        Appends the posting list of a term, see `BinaryIndexWriter.add`.
+        """
+        encoded_term = term.encode('utf-8')
+        if self.last_term is not None and encoded_term <= self.last_term:
+            raise ValueError(f'Terms must be added in ascending order: {term}')
+        self.last_term = encoded_term
+        doc_ids = np.asarray(doc_ids, dtype=np.uint32)
+        tfs = np.asarray(tfs, dtype=np.uint32)
+        if len(doc_ids) != len(tfs):
+            raise ValueError(f'doc_ids and tfs of {term} have different lengths')
+
+        self.terms.append(encoded_term)
+        previous_doc_id = -1
+        for start in range(0, len(doc_ids), BLOCK_SIZE):
+            block_doc_ids = doc_ids[start:start + BLOCK_SIZE]
+            self.data += encode_block(block_doc_ids, tfs[start:start + BLOCK_SIZE], previous_doc_id)
+            previous_doc_id = int(block_doc_ids[-1])
+            self.block_last_doc_ids.append(previous_doc_id)
+            self.block_offsets.append(len(self.data))
+        self.number_of_postings += len(doc_ids)
+        self.posting_offsets.append(self.number_of_postings)
+        self.term_block_offsets.append(len(self.block_last_doc_ids))
+
+    def get_counts(self):
+        return len(self.document_ids), len(self.terms), self.number_of_postings, len(self.block_last_doc_ids)
+
+    def get_posting_sections(self):
+        return [self.posting_offsets.tobytes(), self.term_block_offsets.tobytes(),
+                self.block_last_doc_ids.tobytes(), self.block_offsets.tobytes(), bytes(self.data)]
+
+
+def write_compressed_index(file_path: str, field_index: dict, doc_id_map):
+    """
+    Writes a {term: PostingList} index in the compressed format.
+
+    Parameters
+    ----------
+    file_path : str
+        The path of the compressed index file to write.
+    field_index : dict
+        The index of one field (stars, genres, summaries).
+    doc_id_map : DocIdMap
+        The map the internal document IDs of the postings come from.
+    """
+    writer = CompressedIndexWriter(file_path, doc_id_map.document_ids)
+    for term in sorted(field_index, key=lambda t: t.encode('utf-8')):
+        postings = field_index[term]
+        writer.add(term, postings.doc_ids, postings.tfs)
+    writer.close()
+
+
+class CompressedPostingList(PostingList):
+    def __init__(self, compressed_index, ordinal: int):
+        """
+        A posting list of a compressed index that decodes its blocks lazily.
+
+        Looking a document up only decodes the block that may contain it,
+        found through the last doc ids of the blocks. The full `doc_ids` and
+        `tfs` arrays are decoded the first time they are used.
+
+        Parameters
+        ----------
+        compressed_index : CompressedIndex
+            The index the posting list belongs to.
+        ordinal : int
+            The ordinal of the term in the term dictionary.
+        """
+        self.compressed_index = compressed_index
+        self.first_block = compressed_index.term_block_offsets[ordinal]
+        self.end_block = compressed_index.term_block_offsets[ordinal + 1]
+        self.length = compressed_index.posting_offsets[ordinal + 1] - compressed_index.posting_offsets[ordinal]
+        self.last_doc_ids = np.frombuffer(
+            compressed_index.block_last_doc_ids[self.first_block:self.end_block], dtype=np.uint32)
+        self.decoded = None
+        self.decoded_blocks = {}
+
+    def decode(self):
+        if self.decoded is None:
+            self.decoded = self.compressed_index.decode_blocks(self.first_block, self.end_block, -1)
+        return self.decoded
+
+    @property
+    def doc_ids(self):
+        return self.decode()[0]
+
+    @property
+    def tfs(self):
+        return self.decode()[1]
+
+    def get_block(self, block: int):
+        """
+        Returns the decoded (doc ids, tfs) of one block of the posting list.
+        """
+        if self.decoded is not None:
+            start = block * BLOCK_SIZE
+            return self.decoded[0][start:start + BLOCK_SIZE], self.decoded[1][start:start + BLOCK_SIZE]
+        if block not in self.decoded_blocks:
+            previous_doc_id = int(self.last_doc_ids[block - 1]) if block else -1
+            self.decoded_blocks[block] = self.compressed_index.decode_blocks(
+                self.first_block + block, self.first_block + block + 1, previous_doc_id)
+        return self.decoded_blocks[block]
+
+    def find_block(self, doc_id: int) -> int:
+        """
+        Returns the block that may contain a document, or -1 if it is past the last one.
+        """
+        block = int(np.searchsorted(self.last_doc_ids, doc_id))
+        return block if block < len(self.last_doc_ids) else -1
+
+    def get(self, doc_id: int, default=None):
+        block = self.find_block(doc_id)
+        if block < 0:
+            return default
+        doc_ids, tfs = self.get_block(block)
+        position = int(np.searchsorted(doc_ids, doc_id))
+        if position < len(doc_ids) and doc_ids[position] == doc_id:
+            return int(tfs[position])
+        return default
+
+    def find(self, doc_id: int) -> int:
+        block = self.find_block(doc_id)
+        if block < 0:
+            return -1
+        doc_ids = self.get_block(block)[0]
+        position = int(np.searchsorted(doc_ids, doc_id))
+        if position < len(doc_ids) and doc_ids[position] == doc_id:
+            return block * BLOCK_SIZE + position
+        return -1
+
+    def advance(self, doc_id: int, position: int = 0) -> int:
+        """
+        Returns the position of the first document not smaller than doc_id,
+        searching from position on.
+
+        The last doc ids of the blocks are the skip pointers, so only the
+        block the cursor lands in is decoded.
+        """
+        block = position // BLOCK_SIZE
+        block += int(np.searchsorted(self.last_doc_ids[block:], doc_id))
+        if block >= len(self.last_doc_ids):
+            return self.length
+        start = max(position - block * BLOCK_SIZE, 0)
+        block_doc_ids = self.get_block(block)[0]
+        return block * BLOCK_SIZE + start + int(np.searchsorted(block_doc_ids[start:], doc_id))
+
+    def intersect(self, doc_ids) -> list:
+        matches = []
+        position = 0
+        for doc_id in doc_ids:
+            position = self.advance(doc_id, position)
+            if position >= self.length:
+                break
+            block, offset = divmod(position, BLOCK_SIZE)
+            if self.get_block(block)[0][offset] == doc_id:
+                matches.append(doc_id)
+        return matches
+
+    def add(self, doc_id: int, tf: int):
+        raise TypeError('Compressed posting lists are read-only')
+
+    def remove(self, doc_id: int) -> bool:
+        raise TypeError('Compressed posting lists are read-only')
+
+    def __getitem__(self, doc_id):
+        tf = self.get(doc_id)
+        if tf is None:
+            raise KeyError(doc_id)
+        return tf
+
+    def __contains__(self, doc_id):
+        return self.get(doc_id) is not None
+
+    def __len__(self):
+        return self.length
+
+
+class CompressedIndex(BinaryIndex):
+    magic = MAGIC
+    header = HEADER
+
+    def __init__(self, file_path: str):
+        """
+        Memory-maps a compressed index file.
+
+        It has the interface of `BinaryIndex`, but its posting lists are
+        `CompressedPostingList`s that decode their blocks on demand.
+
+        Parameters
+        ----------
+        file_path : str
+            The path of the compressed index file.
+        """
+        super().__init__(file_path)
+
+    def read_sections(self, number_of_documents, number_of_terms, number_of_postings, number_of_blocks,
+                      doc_offsets, doc_blob, term_offsets, term_blob, posting_offsets,
+                      term_block_offsets, block_last_doc_ids, block_offsets, data):
+        self.number_of_documents = number_of_documents
+        self.number_of_terms = number_of_terms
+        self.number_of_postings = number_of_postings
+        self.number_of_blocks = number_of_blocks
+        self.doc_offsets = self.section(doc_offsets, number_of_documents + 1, 'Q')
+        self.doc_blob = self.blob(doc_blob, term_offsets)
+        self.read_term_dictionary(term_offsets, term_blob, posting_offsets)
+        self.posting_offsets = self.section(posting_offsets, number_of_terms + 1, 'Q')
+        self.term_block_offsets = self.section(term_block_offsets, number_of_terms + 1, 'Q')
+        self.block_last_doc_ids = self.section(block_last_doc_ids, number_of_blocks, 'I')
+        self.block_offsets = self.section(block_offsets, number_of_blocks + 1, 'Q')
+        self.data = self.blob(data, data + self.block_offsets[number_of_blocks])
+
+    def decode_blocks(self, first_block: int, end_block: int, previous_doc_id: int):
+        """
+        Decodes the consecutive blocks [first_block, end_block) of one posting list.
+
+        Parameters
+        ----------
+        first_block : int
+            The first block to decode.
+        end_block : int
+            The block after the last one to decode.
+        previous_doc_id : int
+            The last doc id of the block before first_block in the same
+            posting list, -1 if first_block is its first block.
+
+        Returns
+        -------
+        tuple
+            (doc ids, tfs) as uint32 arrays.
+        """
+        start, end = self.block_offsets[first_block], self.block_offsets[end_block]
+        return decode_postings(self.data[start:end], previous_doc_id)
+
+    def get_posting_arrays(self, term: str):
+        """
+        Decodes the whole posting list of a term.
+
+        Returns
+        -------
+        tuple
+            (internal doc IDs, tfs) as uint32 arrays, or None if the term is
+            not in the index.
+        """
+        postings = self.get_posting_list(term)
+        if postings is None:
+            return None
+        return postings.doc_ids, postings.tfs
+
+    def get_posting_list(self, term: str):
+        """
+        Returns the lazily decoded posting list of a term, or None if it is not in the index.
+        """
+        ordinal = self.find_term(term)
+        if ordinal < 0:
+            return None
+        return CompressedPostingList(self, ordinal)
@@ -0,0 +1,96 @@
+"""
+Compares the size and the decoding speed of the index formats.
+
+The module uses relative imports, run it as a module from the repository root:
+
+    python -m Logic.core.indexer.compression_benchmark [path to IMDB_crawledP.json]
+"""
+import json
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from .index import Index, INVERTED_INDEXES
+from .index_reader import Index_reader
+from .indexes_enum import Index_formats
+
+
+def decode_all(field_index) -> int:
+    """
+    Reads every posting of an index and returns the number of postings read.
+
+    The posting lists are read as whole arrays, the way the scorer reads
+    them, so the timing is the one of decoding and not of a Python loop
+    over the postings.
+    """
+    number_of_postings = 0
+    for term in field_index:
+        postings = field_index[term]
+        if isinstance(postings, dict):
+            # JSON postings are {document_id: tf} dicts, decoded when the file is loaded
+            number_of_postings += len(postings)
+            continue
+        doc_ids, tfs = np.asarray(postings.doc_ids), np.asarray(postings.tfs)
+        # summing touches every mapped page of the binary format
+        doc_ids.sum(), tfs.sum()
+        number_of_postings += len(doc_ids)
+    return number_of_postings
+
+
+def benchmark(index: Index, path: str, repeats: int = 3) -> dict:
+    """
+    Compares the size and the decoding speed of the index formats.
+
+    Parameters
+    ----------
+    index : Index
+        The index to store in every format.
+    path : str
+        The directory to store the indexes in.
+    repeats : int
+        The number of full decodes to take the best time of.
+
+    Returns
+    -------
+    dict
+        {field: {format: {'bytes_per_posting': float, 'postings_per_second': float}}}
+    """
+    # Index_reader joins the path and the file name without a separator
+    path = os.path.join(path, '')
+    results = {}
+    for field in INVERTED_INDEXES:
+        results[field.value] = {}
+        for index_format in (Index_formats.JSON, Index_formats.BINARY, Index_formats.COMPRESSED):
+            index.store_index(path, field.value, index_format)
+            file_path = os.path.join(path, f'{field.value}.{index_format.value}')
+
+            best_time, number_of_postings = float('inf'), 0
+            for _ in range(repeats):
+                start = time.perf_counter()
+                field_index = Index_reader(path, field, index_format=index_format).index
+                number_of_postings = decode_all(field_index)
+                best_time = min(best_time, time.perf_counter() - start)
+                if index_format != Index_formats.JSON:
+                    field_index.close()
+
+            results[field.value][index_format.value] = {
+                'bytes_per_posting': os.path.getsize(file_path) / max(number_of_postings, 1),
+                'postings_per_second': number_of_postings / best_time if best_time else float('inf'),
+            }
+    return results
+
+
+if __name__ == '__main__':
+    # the crawled movies are next to the indexer package by default
+    default_path = os.path.join(os.path.dirname(__file__), '..', 'IMDB_crawledP.json')
+    data_path = sys.argv[1] if len(sys.argv) > 1 else default_path
+    with open(data_path) as f:
+        data = json.load(f)
+    results = benchmark(Index(list(data.values())), tempfile.mkdtemp())
+    for field, formats in results.items():
+        for index_format, result in formats.items():
+            print(f'{field:10} {index_format:5} {result["bytes_per_posting"]:8.2f} bytes/posting '
+                  f'{result["postings_per_second"]:14,.0f} postings/s')
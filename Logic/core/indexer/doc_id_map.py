@@ -0,0 +1,114 @@
+class DocIdMap:
+    def __init__(self, document_ids=()):
+        """
+        Initializes the DocIdMap.
+
+        The map interns IMDb document IDs (e.g. 'tt0111161') as dense integers
+        in the order they are added, so that posting lists can store documents
+        as sorted unsigned integer arrays.
+
+        Parameters
+        ----------
+        document_ids : iterable of str
+            The document IDs to intern, in the order of their internal IDs.
+        """
+        self.document_ids = []
+        self.internal_ids = {}
+        for document_id in document_ids:
+            self.add(document_id)
+
+    def add(self, document_id: str) -> int:
+        """
+        Interns a document ID.
+
+        Parameters
+        ----------
+        document_id : str
+            The IMDb ID of the document.
+
+        Returns
+        -------
+        int
+            The internal ID of the document. Documents that are already in the
+            map keep their internal ID.
+        """
+        internal_id = self.internal_ids.get(document_id)
+        if internal_id is None:
+            internal_id = len(self.document_ids)
+            self.internal_ids[document_id] = internal_id
+            self.document_ids.append(document_id)
+        return internal_id
+
+    def get_internal_id(self, document_id: str) -> int:
+        """
+        Returns the internal ID of a document, or None if it is not in the map.
+        """
+        return self.internal_ids.get(document_id)
+
+    def get_document_id(self, internal_id: int) -> str:
+        """
+        Returns the IMDb ID of the document with the given internal ID.
+        """
+        return self.document_ids[internal_id]
+
+    def __contains__(self, document_id):
+        return document_id in self.internal_ids
+
+    def __len__(self):
+        return len(self.document_ids)
+
+
+class MappedDocIdMap:
+    def __init__(self, binary_index):
+        """
+        A read-only DocIdMap over the doc table of a memory-mapped index.
+
+        Internal IDs are turned into IMDb IDs straight from the mapped file,
+        so processes mapping the same file share it instead of each holding
+        a list of every ID. The reverse {IMDb ID: internal ID} dict is only
+        built the first time it is needed.
+
+        Parameters
+        ----------
+        binary_index : BinaryIndex
+            The index whose doc table to use.
+        """
+        self.binary_index = binary_index
+        self.internal_ids = None
+
+    def get_internal_ids(self) -> dict:
+        if self.internal_ids is None:
+            self.internal_ids = {document_id: internal_id
+                                 for internal_id, document_id in enumerate(self.binary_index.get_document_ids())}
+        return self.internal_ids
+
+    def add(self, document_id: str) -> int:
+        """
+        Returns the internal ID of a document, which has to be in the map already.
+        """
+        internal_id = self.get_internal_id(document_id)
+        if internal_id is None:
+            raise ValueError(f'{document_id} is not in the read-only doc table')
+        return internal_id
+
+    def get_internal_id(self, document_id: str) -> int:
+        """
+        Returns the internal ID of a document, or None if it is not in the map.
+        """
+        return self.get_internal_ids().get(document_id)
+
+    def get_document_id(self, internal_id: int) -> str:
+        """
+        Returns the IMDb ID of the document with the given internal ID.
+        """
+        return self.binary_index.get_document_id(internal_id)
+
+    @property
+    def document_ids(self) -> list:
+        return self.binary_index.get_document_ids()
+
+    def __contains__(self, document_id):
+        return document_id in self.get_internal_ids()
+
+    def __len__(self):
+        return self.binary_index.number_of_documents
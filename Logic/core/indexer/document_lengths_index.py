@@ -1,9 +1,11 @@
 import json
-from indexes_enum import Indexes,Index_types
-from index_reader import Index_reader
+from .indexes_enum import Indexes,Index_types,Index_formats
+from .index_reader import Index_reader
+from .binary_index import write_document_lengths
+from .index import INVERTED_INDEXES, get_term_frequencies
 
 class DocumentLengthsIndex:
-    def __init__(self,path='./indexes/'):
+    def __init__(self,path='./indexes/', index=None, index_format=Index_formats.JSON):
         """
         Initializes the DocumentLengthsIndex class.
 
@@ -11,48 +13,45 @@ class DocumentLengthsIndex:
         ----------
         path : str
             The path to the directory where the indexes are stored.
+        index : Index
+            An index built in this process. Its document lengths were counted
+            while indexing, so the documents are not read and walked again.
+        index_format : Index_formats
+            JSON stores {document_id: length} dicts. BINARY stores arrays of
+            lengths ordered by internal document ID, which can be memory-mapped
+            and need an index for the internal IDs.
 
         """
 
-        self.documents_index = Index_reader(path, index_name=Indexes.DOCUMENTS).index
-        self.document_length_index = {
-            Indexes.STARS: self.get_documents_length(Indexes.STARS.value),
-            Indexes.GENRES: self.get_documents_length(Indexes.GENRES.value),
-            Indexes.SUMMARIES: self.get_documents_length(Indexes.SUMMARIES.value)
-        }
-        self.store_document_lengths_index(path, Indexes.STARS)
-        self.store_document_lengths_index(path, Indexes.GENRES)
-        self.store_document_lengths_index(path, Indexes.SUMMARIES)
+        self.doc_id_map = None
+        if index is not None:
+            self.document_length_index = {field: index.document_lengths[field.value] for field in INVERTED_INDEXES}
+            self.doc_id_map = index.doc_id_map
+        else:
+            self.documents_index = Index_reader(path, index_name=Indexes.DOCUMENTS).index
+            self.document_length_index = self.get_documents_lengths()
+        self.store_document_lengths_index(path, Indexes.STARS, index_format)
+        self.store_document_lengths_index(path, Indexes.GENRES, index_format)
+        self.store_document_lengths_index(path, Indexes.SUMMARIES, index_format)
 
-    def get_documents_length(self, where):
+    def get_documents_lengths(self):
         """
-        Gets the documents' length for the specified field.
-
-        Parameters
-        ----------
-        where : str
-            The field to get the document lengths for.
+        Gets the documents' lengths for all the fields in one pass over the documents.
 
         Returns
         -------
         dict
-            A dictionary of the document lengths. The keys are the document IDs, and the values are
-            the document's length in that field (where).
+            {field: lengths} where lengths is a dictionary of the document lengths. The keys are
+            the document IDs, and the values are the number of terms of the document in that field.
         """
 
-        lengths={}
+        lengths = {field: {} for field in INVERTED_INDEXES}
         for doc in self.documents_index.values():
-            total_length = 0
-            if doc[where] is not None:
-
-                for str in doc[where]:
-                    total_length += len(str)
-                lengths[doc["id"]]=total_length
-
-
+            for field in INVERTED_INDEXES:
+                lengths[field][doc["id"]] = sum(get_term_frequencies(doc, field.value).values())
         return lengths
     
-    def store_document_lengths_index(self, path , index_name):
+    def store_document_lengths_index(self, path , index_name, index_format=Index_formats.JSON):
         """
         Stores the document lengths index to a file.
 
@@ -62,7 +61,19 @@ class DocumentLengthsIndex:
             The path to the directory where the indexes are stored.
         index_name : Indexes
             The name of the index to store.
+        index_format : Index_formats
+            The format of the file, JSON or BINARY.
         """
+        if index_format == Index_formats.BINARY:
+            if self.doc_id_map is None:
+                raise ValueError('The binary format needs the internal document IDs of an index')
+            lengths = self.document_length_index[index_name]
+            # removed documents keep their internal ID, with length 0
+            write_document_lengths(
+                path + index_name.value + '_' + Index_types.DOCUMENT_LENGTH.value + '.' + index_format.value,
+                (lengths.get(self.doc_id_map.get_document_id(internal_id), 0)
+                 for internal_id in range(len(self.doc_id_map))))
+            return
         path = path + index_name.value + '_' + Index_types.DOCUMENT_LENGTH.value + '.json'
         with open(path, 'w') as file:
             json.dump(self.document_length_index[index_name], file, indent=4)
@@ -70,4 +81,4 @@ class DocumentLengthsIndex:
 
 if __name__ == '__main__':
     document_lengths_index = DocumentLengthsIndex()
-    print('Document lengths index stored successfully.')
\ No newline at end of file
+    print('Document lengths index stored successfully.')
@@ -0,0 +1,159 @@
+import json
+
+import numpy as np
+
+from .indexes_enum import Indexes, Index_types, Index_formats
+from .index_reader import Index_reader
+from .binary_index import NORMALIZED_SCHEMES, write_document_norms
+from .collection_statistics import DEFAULT_IDF_VARIANT, compute_idfs
+from .index import INVERTED_INDEXES, get_term_frequencies
+from .score_bounds import store_score_bounds
+
+
+def compute_document_norms(posting_lists, number_of_documents, size, idf_variant=DEFAULT_IDF_VARIANT):
+    """
+    Computes the vector norm of every document of a field under every
+    cosine normalized SMART weighting.
+
+    The weight of a term in a document is its tf (n) or 1 + log(tf) (l),
+    multiplied by the idf for the t schemes, as the scorer weighs it.
+
+    Parameters
+    ----------
+    posting_lists : iterable
+        The (doc_ids, tfs) arrays of every term of the field.
+    number_of_documents : int
+        The number of documents N of the idf.
+    size : int
+        The number of internal document IDs.
+    idf_variant : str
+        The idf of the t schemes, see `compute_idfs`.
+
+    Returns
+    -------
+    dict
+        {scheme: float64 array of the norm of every document by internal ID}
+    """
+    squares = {scheme: np.zeros(size) for scheme in NORMALIZED_SCHEMES}
+    for doc_ids, tfs in posting_lists:
+        doc_ids = np.asarray(doc_ids, dtype=np.int64)
+        if not len(doc_ids):
+            continue
+        tfs = np.asarray(tfs, dtype=np.float64)
+        idf = float(compute_idfs([len(doc_ids)], number_of_documents, idf_variant)[0])
+        tf_weights = {'n': tfs, 'l': 1 + np.log(tfs)}
+        for scheme in NORMALIZED_SCHEMES:
+            weights = tf_weights[scheme[0]] * idf if scheme[1] == 't' else tf_weights[scheme[0]]
+            squares[scheme][doc_ids] += weights ** 2
+    return {scheme: np.sqrt(scheme_squares) for scheme, scheme_squares in squares.items()}
+
+
+class DocumentNormsIndex:
+    def __init__(self, path='./indexes/', index=None, index_format=Index_formats.JSON):
+        """
+        Initializes the DocumentNormsIndex class.
+
+        The norm of a document vector takes every term of the document into
+        account, so it can not be computed at query time without walking the
+        whole document. It is computed here, for each field and each cosine
+        normalized weighting in NORMALIZED_SCHEMES, and stored next to the
+        document lengths. The score bounds top-k searches prune with are
+        normalized by the norms, they are stored along with them in every
+        format, see `store_score_bounds`.
+
+        Parameters
+        ----------
+        path : str
+            The path to the directory where the indexes are stored.
+        index : Index
+            An index built in this process, whose posting lists are used
+            instead of reading the documents again. The norms are computed
+            with its idf variant, with DEFAULT_IDF_VARIANT otherwise.
+        index_format : Index_formats
+            JSON stores {scheme: {document_id: norm}} dicts. BINARY stores
+            arrays of norms ordered by internal document ID, which can be
+            memory-mapped and need an index for the internal IDs.
+        """
+
+        self.doc_id_map = None
+        if index is not None:
+            self.doc_id_map = index.doc_id_map
+            self.document_ids = [self.doc_id_map.get_document_id(internal_id)
+                                 for internal_id in range(len(self.doc_id_map))]
+            number_of_documents = len(index.index[Indexes.DOCUMENTS.value])
+            idf_variant = index.idf_variant
+            self.posting_lists = {field: {term: (postings.doc_ids, postings.tfs)
+                                          for term, postings in index.index[field.value].items()}
+                                  for field in INVERTED_INDEXES}
+            # removed documents keep their internal ID, with length 0
+            self.document_lengths = {field: np.array([index.document_lengths[field.value].get(document_id, 0)
+                                                      for document_id in self.document_ids], dtype=np.int64)
+                                     for field in INVERTED_INDEXES}
+        else:
+            documents_index = Index_reader(path, index_name=Indexes.DOCUMENTS).index
+            self.document_ids = list(documents_index)
+            number_of_documents = len(documents_index)
+            idf_variant = DEFAULT_IDF_VARIANT
+            self.posting_lists, self.document_lengths = self.get_posting_lists(documents_index)
+        self.document_norm_index = {
+            field: compute_document_norms(self.posting_lists[field].values(), number_of_documents,
+                                          len(self.document_ids), idf_variant)
+            for field in INVERTED_INDEXES}
+        for field in INVERTED_INDEXES:
+            self.store_document_norms_index(path, field, index_format)
+            store_score_bounds(path, field.value, self.posting_lists[field], self.document_lengths[field],
+                               self.document_norm_index[field])
+
+    def get_posting_lists(self, documents_index):
+        """
+        Gets the posting lists and the lengths of all the fields from the
+        documents, the n-th document having internal ID n.
+
+        Returns
+        -------
+        tuple
+            ({field: {term: (doc_ids, tfs)}}, {field: array of the length of
+            the field in every document})
+        """
+        posting_lists = {field: {} for field in INVERTED_INDEXES}
+        document_lengths = {field: np.zeros(len(documents_index), dtype=np.int64) for field in INVERTED_INDEXES}
+        for internal_id, doc in enumerate(documents_index.values()):
+            for field in INVERTED_INDEXES:
+                term_frequencies = get_term_frequencies(doc, field.value)
+                document_lengths[field][internal_id] = sum(term_frequencies.values())
+                for term, tf in term_frequencies.items():
+                    doc_ids, tfs = posting_lists[field].setdefault(term, ([], []))
+                    doc_ids.append(internal_id)
+                    tfs.append(tf)
+        return posting_lists, document_lengths
+
+    def store_document_norms_index(self, path, index_name, index_format=Index_formats.JSON):
+        """
+        Stores the document norms index to a file.
+
+        Parameters
+        ----------
+        path : str
+            The path to the directory where the indexes are stored.
+        index_name : Indexes
+            The name of the index to store.
+        index_format : Index_formats
+            The format of the file, JSON or BINARY.
+        """
+        norms = self.document_norm_index[index_name]
+        path = path + index_name.value + '_' + Index_types.DOCUMENT_NORM.value + '.' + index_format.value
+        if index_format == Index_formats.BINARY:
+            if self.doc_id_map is None:
+                raise ValueError('The binary format needs the internal document IDs of an index')
+            # removed documents keep their internal ID, with norm 0
+            write_document_norms(path, norms)
+            return
+        with open(path, 'w') as file:
+            json.dump({scheme: {document_id: norm for document_id, norm in zip(self.document_ids, norms[scheme].tolist())
+                                if norm}
+                       for scheme in NORMALIZED_SCHEMES}, file, indent=4)
+
+
+if __name__ == '__main__':
+    document_norms_index = DocumentNormsIndex()
+    print('Document norms index stored successfully.')
@@ -0,0 +1,106 @@
+import numpy as np
+
+# the number of quantized impact levels of a field
+LEVELS = 255
+# the weightings impacts can be precomputed for: the Okapi BM25 score of a
+# posting, or its ltc document weight
+IMPACT_WEIGHTINGS = ('OkapiBM25', 'ltc')
+
+
+class ImpactIndex:
+    def __init__(self, term_segment_offsets, segment_levels, segment_offsets, doc_ids, scale, find_term):
+        """
+        An impact-ordered layout of the posting lists of a field, for
+        score-at-a-time evaluation, see `Logic.core.utility.top_k.score_at_a_time`.
+
+        The impact of a posting, its score contribution under a weighting,
+        is quantized to one of LEVELS levels, the level times the scale of
+        the field approximating it. The postings of every term are grouped
+        into segments of equal level, the highest level first, and ordered
+        by document within a segment.
+
+        Parameters
+        ----------
+        term_segment_offsets : numpy.ndarray
+            The first segment of every term ordinal, and the number of segments.
+        segment_levels : numpy.ndarray
+            The level of every segment.
+        segment_offsets : numpy.ndarray
+            The first posting of every segment, and the number of postings.
+        doc_ids : numpy.ndarray
+            The internal IDs of the documents of the postings, segment after segment.
+        scale : float
+            The impact of one level.
+        find_term : callable
+            Returns the ordinal of a term, -1 if it has none, e.g. the
+            `find_term` of the binary index of the field.
+        """
+        self.term_segment_offsets = term_segment_offsets
+        self.segment_levels = segment_levels
+        self.segment_offsets = segment_offsets
+        self.doc_ids = doc_ids
+        self.scale = scale
+        self.find_term = find_term
+
+    @classmethod
+    def from_impacts(cls, term_impacts, find_term, levels: int = LEVELS):
+        """
+        Quantizes the impacts of posting lists given in the order of their term ordinals.
+
+        The scale maps the largest impact of the field to the highest level.
+        Every positive impact gets at least the lowest level, the postings
+        with no positive impact are left out.
+
+        Parameters
+        ----------
+        term_impacts : iterable
+            The (doc_ids, impacts) arrays of every term.
+        find_term : callable
+            See `ImpactIndex`.
+        levels : int
+            The number of levels.
+        """
+        term_impacts = [(np.asarray(doc_ids, dtype=np.int64), np.asarray(impacts, dtype=np.float64))
+                        for doc_ids, impacts in term_impacts]
+        max_impact = max((float(impacts.max()) for _, impacts in term_impacts if len(impacts)), default=0.0)
+        scale = max_impact / levels if max_impact > 0 else 1.0
+
+        term_segment_offsets = [0]
+        segment_levels = []
+        segment_offsets = [0]
+        postings = []
+        for doc_ids, impacts in term_impacts:
+            positive = impacts > 0
+            doc_ids = doc_ids[positive]
+            quantized = np.clip(np.rint(impacts[positive] / scale), 1, levels).astype(np.int64)
+            order = np.lexsort((doc_ids, -quantized))
+            doc_ids, quantized = doc_ids[order], quantized[order]
+            starts = np.flatnonzero(np.diff(quantized, prepend=levels + 1))
+            ends = np.append(starts, len(doc_ids))[1:]
+            segment_levels.extend(quantized[starts].tolist())
+            segment_offsets.extend((segment_offsets[-1] + ends).tolist())
+            term_segment_offsets.append(len(segment_levels))
+            postings.append(doc_ids)
+
+        return cls(np.array(term_segment_offsets, dtype=np.int64), np.array(segment_levels, dtype=np.int64),
+                   np.array(segment_offsets, dtype=np.int64),
+                   np.concatenate(postings) if postings else np.zeros(0, dtype=np.int64), scale, find_term)
+
+    def get_segments(self, term: str) -> list:
+        """
+        Returns the segments of a term, highest level first.
+
+        Returns
+        -------
+        list
+            [(impact, doc_ids)] of the segments, the impact being the level
+            times the scale. Empty for a term the field does not have.
+        """
+        ordinal = self.find_term(term)
+        if ordinal < 0:
+            return []
+        segments = []
+        for segment in range(int(self.term_segment_offsets[ordinal]), int(self.term_segment_offsets[ordinal + 1])):
+            start, end = self.segment_offsets[segment:segment + 2].tolist()
+            segments.append((int(self.segment_levels[segment]) * self.scale, self.doc_ids[start:end]))
+        return segments
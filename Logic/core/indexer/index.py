@@ -1,357 +1,572 @@
-import time
-import os
-import json
-import copy
-from indexes_enum import Indexes
-
-
-class Index:
-    def __init__(self, preprocessed_documents: list):
-        """
-        Create a class for indexing.
-        """
-
-        self.preprocessed_documents = preprocessed_documents
-
-        self.index = {
-            Indexes.DOCUMENTS.value: self.index_documents(),
-            Indexes.STARS.value: self.index_stars(),
-            Indexes.GENRES.value: self.index_genres(),
-            Indexes.SUMMARIES.value: self.index_summaries(),
-        }
-
-
-    def index_documents(self):
-        """
-        Index the documents based on the document ID. In other words, create a dictionary
-        where the key is the document ID and the value is the document.
-
-        Returns
-        ----------
-        dict
-            The index of the documents based on the document ID.
-        """
-
-        current_index = {}
-        for doc in self.preprocessed_documents:
-            doc_id = doc['id']
-            current_index[doc_id] = doc
-        return current_index
-
-    def index_stars(self):
-        """
-        Index the documents based on the stars.
-
-        Returns
-        ----------
-        dict
-            The index of the documents based on the stars. You should also store each terms' tf in each document.
-            So the index type is: {term: {document_id: tf}}
-        """
-
-        current_index = {}
-        for doc in self.preprocessed_documents:
-            doc_id = doc['id']
-            stars = doc.get('stars', [])
-            if stars is not None:
-             for star in stars:
-                if star not in current_index:
-                    current_index[star] = {}
-                current_index[star][doc_id] = stars.count(star)
-        return current_index
-
-    def index_genres(self):
-        """
-        Index the documents based on the genres.
-
-        Returns
-        ----------
-        dict
-            The index of the documents based on the genres. You should also store each terms' tf in each document.
-            So the index type is: {term: {document_id: tf}}
-        """
-        current_index = {}
-        for doc in self.preprocessed_documents:
-            doc_id = doc['id']
-            genres = doc.get('genres', [])
-            if genres is not None:
-             for genre in genres:
-                if genre not in current_index:
-                    current_index[genre] = {}
-                current_index[genre][doc_id] = genres.count(genre)
-        return current_index
-
-    def index_summaries(self):
-        """
-        Index the documents based on the summaries (not first_page_summary).
-
-        Returns
-        ----------
-        dict
-            The index of the documents based on the summaries. You should also store each terms' tf in each document.
-            So the index type is: {term: {document_id: tf}}
-        """
-
-        current_index = {}
-        for doc in self.preprocessed_documents:
-            doc_id = doc['id']
-            summaries = doc.get('summaries', [])
-            if summaries is not None:
-             for summary in summaries:
-                for term in summary.split():
-
-                    if term not in current_index:
-                        current_index[term] = {}
-                    if doc_id not in current_index[term]:
-                        current_index.setdefault(term, {}).setdefault(doc_id, 0)
-                    current_index[term][doc_id] +=1
-        return current_index
-
-    def get_posting_list(self, word: str, index_type: str):
-        """
-        get posting_list of a word
-
-        Parameters
-        ----------
-        word: str
-            word we want to check
-        index_type: str
-            type of index we want to check (documents, stars, genres, summaries)
-
-        Return
-        ----------
-        list
-            posting list of the word (you should return the list of document IDs that contain the word and ignore the tf)
-        """
-
-        try:
-            if index_type not in self.index:
-                raise ValueError('Invalid index type')
-
-            posting_list = []
-            for term, postings in self.index[index_type].items():
-                if term == word:
-                    posting_list.extend(postings.keys())
-            return posting_list
-
-        except:
-            return []
-
-    def add_document_to_index(self, document: dict):
-        """
-        Add a document to all the indexes.
-
-        Parameters
-        ----------
-        document : dict
-            Document to add to all the indexes.
-        """
-
-        doc_id = document['id']
-        for index_type, index_data in self.index.items():
-            if index_type == Indexes.DOCUMENTS.value:
-                index_data[doc_id] = document
-            else:
-                terms = document.get(index_type, [])
-                for term in terms:
-                    if term not in index_data:
-                        index_data[term] = {}
-                    if doc_id not in index_data[term]:
-                        index_data[term][doc_id] = terms.count(term)
-
-    def remove_document_from_index(self, document_id: str):
-        """
-        Remove a document from all the indexes.
-
-        Parameters
-        ----------
-        document_id : str
-            ID of the document to remove from all the indexes.
-        """
-
-        for index_data in self.index.values():
-            for term, postings in index_data.items():
-                if document_id in postings:
-                    del postings[document_id]
-
-    def check_add_remove_is_correct(self):
-        """
-        Check if the add and remove is correct
-        """
-
-        dummy_document = {
-            'id': '100',
-            'stars': ['tim', 'henry'],
-            'genres': ['drama', 'crime'],
-            'summaries': ['good']
-        }
-
-        index_before_add = copy.deepcopy(self.index)
-        self.add_document_to_index(dummy_document)
-        index_after_add = copy.deepcopy(self.index)
-
-        if set(index_after_add[Indexes.DOCUMENTS.value]).difference(index_before_add[Indexes.DOCUMENTS.value]) != dummy_document:
-            print('Add is incorrect, document')
-            return
-
-        if (set(list(index_after_add[Indexes.STARS.value]['tim'].keys())[0]).difference(
-                set(index_before_add[Indexes.STARS.value]['tim']))
-                != {dummy_document['id']}):
-            print('Add is incorrect, tim')
-            return
-
-        if (set(index_after_add[Indexes.STARS.value]['henry']).difference(
-                set(index_before_add[Indexes.STARS.value]['henry']))
-                != {dummy_document['id']}):
-            print('Add is incorrect, henry')
-            return
-        if (set(index_after_add[Indexes.GENRES.value]['drama']).difference(
-                set(index_before_add[Indexes.GENRES.value]['drama']))
-                != {dummy_document['id']}):
-            print('Add is incorrect, drama')
-            return
-
-        if (set(index_after_add[Indexes.GENRES.value]['crime']).difference(
-                set(index_before_add[Indexes.GENRES.value]['crime']))
-                != {dummy_document['id']}):
-            print('Add is incorrect, crime')
-            return
-
-        if (set(index_after_add[Indexes.SUMMARIES.value]['good']).difference(
-                set(index_before_add[Indexes.SUMMARIES.value]['good']))
-                != {dummy_document['id']}):
-            print('Add is incorrect, good')
-            return
-
-        print('Add is correct')
-
-        self.remove_document_from_index('100')
-        index_after_remove = copy.deepcopy(self.index)
-
-        if index_after_remove == index_before_add:
-            print('Remove is correct')
-        else:
-            print('Remove is incorrect')
-
-    def store_index(self, path: str, index_name: str = None):
-        """
-        Stores the index in a file (such as a JSON file)
-
-        Parameters
-        ----------
-        path : str
-            Path to store the file
-        index_name: str
-            name of index we want to store (documents, stars, genres, summaries)
-        """
-
-        if not os.path.exists(path):
-            os.makedirs(path)
-
-        if index_name not in self.index:
-            raise ValueError('Invalid index name')
-        index_data = self.index[index_name]
-        with open(os.path.join(path, f'{index_name}.json'), 'w') as file:
-            json.dump(index_data, file)
-
-        pass
-
-    def load_index(self, path: str):
-        """
-        Loads the index from a file (such as a JSON file)
-
-        Parameters
-        ----------
-        path : str
-            Path to load the file
-        """
-
-        print(os.path.exists(path))
-        if os.path.exists(path):
-                with open(path, 'r') as file:
-                    return  json.load(file)
-
-
-    def check_if_index_loaded_correctly(self, index_type: str, loaded_index: dict):
-        """
-        Check if the index is loaded correctly
-
-        Parameters
-        ----------
-        index_type : str
-            Type of index to check (documents, stars, genres, summaries)
-        loaded_index : dict
-            The loaded index
-
-        Returns
-        ----------
-        bool
-            True if index is loaded correctly, False otherwise
-        """
-
-        return self.index[index_type] == loaded_index
-
-    def check_if_indexing_is_good(self, index_type: str, check_word: str = 'good'):
-        """
-        Checks if the indexing is good. Do not change this function. You can use this
-        function to check if your indexing is correct.
-
-        Parameters
-        ----------
-        index_type : str
-            Type of index to check (documents, stars, genres, summaries)
-        check_word : str
-            The word to check in the index
-
-        Returns
-        ----------
-        bool
-            True if indexing is good, False otherwise
-        """
-
-        # brute force to check check_word in the summaries
-        start = time.time()
-        docs = []
-        for document in self.preprocessed_documents:
-            if index_type not in document or document[index_type] is None:
-                continue
-
-            for field in document[index_type]:
-                if check_word in field:
-                    docs.append(document['id'])
-                    break
-
-            # if we have found 3 documents with the word, we can break
-            if len(docs) == 3:
-                break
-
-
-        end = time.time()
-        brute_force_time = end - start
-
-        # check by getting the posting list of the word
-        start = time.time()
-
-        # TODO: based on your implementation, you may need to change the following line
-        posting_list = self.get_posting_list(check_word, index_type)
-
-        end = time.time()
-        implemented_time = end - start
-
-        print('Brute force time: ', brute_force_time)
-        print('Implemented time: ', implemented_time)
-
-        if set(docs).issubset(set(posting_list)):
-            print('Indexing is correct')
-
-            if implemented_time < brute_force_time:
-                print('Indexing is good')
-                return True
-            else:
-                print('Indexing is bad')
-                return False
-        else:
-            print('Indexing is wrong')
-            return False
-
-# TODO: Run the class with needed parameters, then run check methods and finally report the results of check methods
+import time
+import os
+import json
+import copy
+from collections import Counter
+from .indexes_enum import Indexes, Index_formats
+from .binary_index import write_binary_index
+from .compressed_index import write_compressed_index
+from .positional_index import PositionalPostingList, get_term_positions, write_positional_index
+from .collection_statistics import DEFAULT_IDF_VARIANT, CollectionStatistics
+from .doc_id_map import DocIdMap
+from .posting_list import PostingList, FieldIndex
+
+INVERTED_INDEXES = [Indexes.STARS, Indexes.GENRES, Indexes.SUMMARIES]
+# the version of the stored indexes, kept in their metadata index: version 2
+# counts the document lengths in tokens, version 1 counted characters
+FORMAT_VERSION = 2
+
+
+def get_field_tokens(document: dict, field: str) -> list:
+    """
+    Tokenizes one field of a preprocessed document.
+
+    Stars and genres are indexed as whole strings, summaries word by word.
+    The token offsets of a positional index refer to this list, i.e. to the
+    words of the summaries joined by whitespace.
+
+    Parameters
+    ----------
+    document : dict
+        The preprocessed document.
+    field : str
+        The field to tokenize (stars, genres, summaries).
+
+    Returns
+    -------
+    list
+        The terms of the field in order.
+    """
+    values = document.get(field) or []
+    if field == Indexes.SUMMARIES.value:
+        return [term for value in values for term in value.split()]
+    return list(values)
+
+
+def get_term_frequencies(document: dict, field: str) -> Counter:
+    """
+    Tokenizes one field of a preprocessed document and counts its terms.
+
+    Parameters
+    ----------
+    document : dict
+        The preprocessed document.
+    field : str
+        The field to tokenize (stars, genres, summaries).
+
+    Returns
+    -------
+    Counter
+        The tf of each term of the field.
+    """
+    return Counter(get_field_tokens(document, field))
+
+
+class Index:
+    def __init__(self, preprocessed_documents: list, positional_fields: list = (),
+                 idf_variant: str = DEFAULT_IDF_VARIANT):
+        """
+        Create a class for indexing.
+
+        Every document is tokenized once, and that single pass fills the
+        documents index, the stars, genres and summaries indexes, the
+        document lengths and the statistics of the metadata index.
+
+        Parameters
+        ----------
+        preprocessed_documents : list
+            The preprocessed documents.
+        positional_fields : list
+            The fields (Indexes) whose postings also keep the token offsets
+            of the terms, which phrase and proximity queries need, e.g.
+            [Indexes.SUMMARIES].
+        idf_variant : str
+            The idf of the SMART t weighting, raw N / df by default or e.g.
+            log for log(N / df), see `compute_idfs`. The document norms are
+            stored with it and the metadata index records it for the search engine.
+        """
+
+        self.preprocessed_documents = preprocessed_documents
+        self.positional_fields = {field.value for field in positional_fields}
+        self.idf_variant = idf_variant
+        self.doc_id_map = DocIdMap()
+
+        self.index = {
+            Indexes.DOCUMENTS.value: {},
+            Indexes.STARS.value: FieldIndex(),
+            Indexes.GENRES.value: FieldIndex(),
+            Indexes.SUMMARIES.value: FieldIndex(),
+        }
+        self.document_lengths = {field.value: {} for field in INVERTED_INDEXES}
+        self.total_field_lengths = {field.value: 0 for field in INVERTED_INDEXES}
+        # df, collection frequencies and idf tables of every field
+        self.collection_statistics = CollectionStatistics([field.value for field in INVERTED_INDEXES])
+        # internal document ID -> {field: {term: tf}}, so that removing a
+        # document only touches the posting lists of its own terms
+        self.forward_index = {}
+        # set by a Tiered_index built from this index, kept in sync on updates
+        self.tiered_index = None
+
+        for document in self.preprocessed_documents:
+            self.index_document(document)
+
+    def index_document(self, document: dict):
+        """
+        Index one document in all the indexes.
+
+        The index type of the stars, genres and summaries indexes is
+        {term: PostingList} where the posting list maps internal document IDs to tf.
+        Positional fields have PositionalPostingLists instead.
+
+        Parameters
+        ----------
+        document : dict
+            The preprocessed document.
+        """
+
+        internal_id = self.doc_id_map.add(document['id'])
+        forward_postings = {}
+        for field in INVERTED_INDEXES:
+            field_index = self.index[field.value]
+            tokens = get_field_tokens(document, field.value)
+            term_frequencies = Counter(tokens)
+            term_positions = get_term_positions(tokens) if field.value in self.positional_fields else None
+            for term, tf in term_frequencies.items():
+                postings = field_index.get_posting_list(term)
+                if term_positions is None:
+                    if postings is None:
+                        postings = field_index[term] = PostingList()
+                    postings.add(internal_id, tf)
+                else:
+                    if postings is None:
+                        postings = field_index[term] = PositionalPostingList()
+                    postings.add(internal_id, tf, term_positions[term])
+            forward_postings[field.value] = term_frequencies
+        self.count_document(document, internal_id, forward_postings)
+
+    def count_document(self, document: dict, internal_id: int, forward_postings: dict):
+        """
+        Keeps a document whose postings are indexed, with its forward
+        postings, and counts it in the document lengths and statistics.
+
+        Parameters
+        ----------
+        document : dict
+            The preprocessed document.
+        internal_id : int
+            The internal ID of the document.
+        forward_postings : dict
+            {field: {term: tf}} of the document.
+        """
+
+        doc_id = document['id']
+        self.index[Indexes.DOCUMENTS.value][doc_id] = document
+        self.forward_index[internal_id] = forward_postings
+        for field, term_frequencies in forward_postings.items():
+            length = sum(term_frequencies.values())
+            self.total_field_lengths[field] += length
+            self.document_lengths[field][doc_id] = length
+        self.collection_statistics.add_document(forward_postings)
+
+    @classmethod
+    def from_posting_lists(cls, preprocessed_documents: list, field_indexes: dict, forward_index: list):
+        """
+        Creates an index from posting lists built elsewhere, e.g. merged by an
+        `IndexBuilder`, instead of indexing the documents again.
+
+        Parameters
+        ----------
+        preprocessed_documents : list
+            The preprocessed documents, the i-th one having internal ID i.
+        field_indexes : dict
+            {field: FieldIndex} of the stars, genres and summaries indexes.
+        forward_index : list
+            The {field: {term: tf}} of every document, in the same order.
+
+        Returns
+        -------
+        Index
+            An index that can be stored and updated like one built from the documents.
+        """
+
+        index = cls([])
+        index.preprocessed_documents = preprocessed_documents
+        index.index.update(field_indexes)
+        for document, forward_postings in zip(preprocessed_documents, forward_index):
+            index.count_document(document, index.doc_id_map.add(document['id']), forward_postings)
+        return index
+
+    def get_metadata_index(self):
+        """
+        Returns the metadata index, i.e. the document count, the average
+        length of each field in tokens, the idf of the t weighting, the IMDb
+        IDs by internal ID and the format version.
+
+        Returns
+        ----------
+        dict
+            The metadata index in the layout of `Metadata_index`.
+        """
+
+        document_count = len(self.index[Indexes.DOCUMENTS.value])
+        return {
+            'average_document_length': {
+                field: total / document_count if document_count else 0
+                for field, total in self.total_field_lengths.items()
+            },
+            'document_count': document_count,
+            'idf_variant': self.idf_variant,
+            # the internal IDs the norms and score bounds are stored by, which JSON indexes do not keep
+            'document_ids': list(self.doc_id_map.document_ids),
+            'format_version': FORMAT_VERSION,
+        }
+
+    def get_posting_list(self, word: str, index_type: str):
+        """
+        get posting_list of a word
+
+        Parameters
+        ----------
+        word: str
+            word we want to check
+        index_type: str
+            type of index we want to check (documents, stars, genres, summaries)
+
+        Return
+        ----------
+        list
+            posting list of the word (you should return the list of document IDs that contain the word and ignore the tf)
+        """
+
+        try:
+            if index_type not in self.index:
+                raise ValueError('Invalid index type')
+
+            if index_type == Indexes.DOCUMENTS.value:
+                return [word] if word in self.index[index_type] else []
+
+            postings = self.index[index_type].get_posting_list(word)
+            if postings is None:
+                return []
+            return [self.doc_id_map.get_document_id(doc) for doc in postings.keys()]
+
+        except:
+            return []
+
+    def get_posting_lists(self, words: list, index_type: str, with_tf: bool = False):
+        """
+        get posting lists of many words with one lookup per word
+
+        Parameters
+        ----------
+        words: list
+            words we want to check
+        index_type: str
+            type of index we want to check (stars, genres, summaries)
+        with_tf: bool
+            if True, return the tf of the word in each document as well
+
+        Return
+        ----------
+        dict
+            {word: list of document IDs} or, with tf, {word: {document_id: tf}}.
+            Words that are not in the index are left out.
+        """
+
+        if index_type not in self.index or index_type == Indexes.DOCUMENTS.value:
+            raise ValueError('Invalid index type')
+
+        posting_lists = {}
+        for word, postings in self.index[index_type].get_posting_lists(words).items():
+            if with_tf:
+                posting_lists[word] = postings.to_dict(self.doc_id_map)
+            else:
+                posting_lists[word] = [self.doc_id_map.get_document_id(doc) for doc in postings.keys()]
+        return posting_lists
+
+    def get_document_frequency(self, word: str, index_type: str):
+        """
+        get the number of documents containing a word without building its posting list
+
+        Parameters
+        ----------
+        word: str
+            word we want to check
+        index_type: str
+            type of index we want to check (stars, genres, summaries)
+
+        Return
+        ----------
+        int
+            document frequency of the word
+        """
+
+        if index_type not in self.index or index_type == Indexes.DOCUMENTS.value:
+            raise ValueError('Invalid index type')
+        return self.index[index_type].get_document_frequency(word)
+
+    def add_document_to_index(self, document: dict):
+        """
+        Add a document to all the indexes. A document that is already indexed
+        is replaced.
+
+        The document lengths, the statistics of the metadata index and the
+        attached tiered index are updated as well, in time proportional to
+        the size of the document.
+
+        Parameters
+        ----------
+        document : dict
+            Document to add to all the indexes.
+        """
+
+        doc_id = document['id']
+        if doc_id in self.index[Indexes.DOCUMENTS.value]:
+            self.remove_document_from_index(doc_id)
+
+        self.index_document(document)
+        self.update_tiered_index(self.forward_index[self.doc_id_map.get_internal_id(doc_id)])
+
+    def remove_document_from_index(self, document_id: str):
+        """
+        Remove a document from all the indexes.
+
+        Only the posting lists of the document's own terms, found through the
+        forward index, are touched. Terms left without documents are removed.
+
+        Parameters
+        ----------
+        document_id : str
+            ID of the document to remove from all the indexes.
+        """
+
+        internal_id = self.doc_id_map.get_internal_id(document_id)
+        if internal_id not in self.forward_index:
+            return
+
+        forward_postings = self.forward_index.pop(internal_id)
+        for field, term_frequencies in forward_postings.items():
+            field_index = self.index[field]
+            for term in term_frequencies:
+                postings = field_index.get_posting_list(term)
+                postings.remove(internal_id)
+                if not postings:
+                    del field_index[term]
+
+            self.total_field_lengths[field] -= self.document_lengths[field].pop(document_id)
+
+        del self.index[Indexes.DOCUMENTS.value][document_id]
+        self.collection_statistics.remove_document(forward_postings)
+        self.update_tiered_index(forward_postings)
+
+    def update_tiered_index(self, forward_postings: dict):
+        """
+        Tells the attached tiered index that the postings of the given terms changed.
+
+        Parameters
+        ----------
+        forward_postings : dict
+            {field: {term: tf}} of the document that was added or removed.
+        """
+
+        if self.tiered_index is None:
+            return
+        for field, term_frequencies in forward_postings.items():
+            for term in term_frequencies:
+                self.tiered_index.update_term(Indexes(field), term, self.index[field].get_posting_list(term))
+
+    def check_add_remove_is_correct(self):
+        """
+        Check if the add and remove is correct
+
+        Raises
+        ----------
+        AssertionError
+            If adding a document does not add exactly its postings, or
+            removing it again does not give back the index from before.
+        """
+
+        dummy_document = {
+            'id': '100',
+            'stars': ['tim', 'henry'],
+            'genres': ['drama', 'crime'],
+            'summaries': ['good']
+        }
+
+        index_before_add = copy.deepcopy(self.index)
+        self.add_document_to_index(dummy_document)
+        internal_id = self.doc_id_map.get_internal_id(dummy_document['id'])
+
+        added_documents = set(self.index[Indexes.DOCUMENTS.value]).difference(index_before_add[Indexes.DOCUMENTS.value])
+        assert added_documents == {dummy_document['id']}, 'Add is incorrect, document'
+        for field in INVERTED_INDEXES:
+            for term in get_term_frequencies(dummy_document, field.value):
+                postings_before = index_before_add[field.value].get_posting_list(term)
+                added_postings = set(self.index[field.value][term]).difference(postings_before or ())
+                assert added_postings == {internal_id}, f'Add is incorrect, {term}'
+
+        self.remove_document_from_index(dummy_document['id'])
+        assert self.index == index_before_add, 'Remove is incorrect'
+
+    def store_index(self, path: str, index_name: str = None, index_format: Index_formats = Index_formats.JSON):
+        """
+        Stores the index in a file (such as a JSON file)
+
+        Parameters
+        ----------
+        path : str
+            Path to store the file
+        index_name: str
+            name of index we want to store (documents, stars, genres, summaries)
+        index_format: Index_formats
+            format of the file. The binary and compressed formats can only store
+            the inverted indexes (stars, genres, summaries), not the documents.
+            The positional format only the positional fields.
+
+        The collection statistics of an inverted index are stored next to it,
+        see `FieldStatistics.store`.
+        """
+
+        if not os.path.exists(path):
+            os.makedirs(path)
+
+        if index_name not in self.index:
+            raise ValueError('Invalid index name')
+        file_path = os.path.join(path, f'{index_name}.{index_format.value}')
+        if index_name != Indexes.DOCUMENTS.value:
+            self.collection_statistics[index_name].store(os.path.join(path, ''), index_name, index_format)
+
+        if index_format in (Index_formats.BINARY, Index_formats.COMPRESSED):
+            if index_name == Indexes.DOCUMENTS.value:
+                raise ValueError(f'The documents index can not be stored in the {index_format.name.lower()} format')
+            if index_format == Index_formats.BINARY:
+                write_binary_index(file_path, self.index[index_name], self.doc_id_map)
+            else:
+                write_compressed_index(file_path, self.index[index_name], self.doc_id_map)
+            return
+
+        if index_format == Index_formats.POSITIONAL:
+            if index_name not in self.positional_fields:
+                raise ValueError(f'The {index_name} index does not keep positions')
+            write_positional_index(file_path, self.index[index_name], self.doc_id_map)
+            return
+
+        with open(file_path, 'w') as file:
+            json.dump(self.get_index_as_dict(index_name), file)
+
+    def get_index_as_dict(self, index_name: str):
+        """
+        Returns an index in the JSON layout, i.e. the inverted indexes as
+        {term: {document_id: tf}} keyed by the IMDb document IDs.
+
+        Parameters
+        ----------
+        index_name: str
+            name of the index (documents, stars, genres, summaries)
+        """
+
+        if index_name == Indexes.DOCUMENTS.value:
+            return self.index[index_name]
+        return {term: postings.to_dict(self.doc_id_map) for term, postings in self.index[index_name].items()}
+
+    def load_index(self, path: str):
+        """
+        Loads the index from a file (such as a JSON file)
+
+        Parameters
+        ----------
+        path : str
+            Path to load the file
+        """
+
+        print(os.path.exists(path))
+        if os.path.exists(path):
+                with open(path, 'r') as file:
+                    return  json.load(file)
+
+
+    def check_if_index_loaded_correctly(self, index_type: str, loaded_index: dict):
+        """
+        Check if the index is loaded correctly
+
+        Parameters
+        ----------
+        index_type : str
+            Type of index to check (documents, stars, genres, summaries)
+        loaded_index : dict
+            The loaded index
+
+        Returns
+        ----------
+        bool
+            True if index is loaded correctly, False otherwise
+        """
+
+        if isinstance(loaded_index, dict) and index_type != Indexes.DOCUMENTS.value:
+            return self.get_index_as_dict(index_type) == loaded_index
+        return self.index[index_type] == dict(loaded_index.items())
+
+    def check_if_indexing_is_good(self, index_type: str, check_word: str = 'good'):
+        """
+        Checks if the indexing is good. Do not change this function. You can use this
+        function to check if your indexing is correct.
+
+        Parameters
+        ----------
+        index_type : str
+            Type of index to check (documents, stars, genres, summaries)
+        check_word : str
+            The word to check in the index
+
+        Returns
+        ----------
+        bool
+            True if indexing is good, False otherwise
+        """
+
+        # brute force to check check_word in the summaries
+        start = time.time()
+        docs = []
+        for document in self.preprocessed_documents:
+            if index_type not in document or document[index_type] is None:
+                continue
+
+            for field in document[index_type]:
+                if check_word in field:
+                    docs.append(document['id'])
+                    break
+
+            # if we have found 3 documents with the word, we can break
+            if len(docs) == 3:
+                break
+
+
+        end = time.time()
+        brute_force_time = end - start
+
+        # check by getting the posting list of the word
+        start = time.time()
+
+        # TODO: based on your implementation, you may need to change the following line
+        posting_list = self.get_posting_list(check_word, index_type)
+
+        end = time.time()
+        implemented_time = end - start
+
+        print('Brute force time: ', brute_force_time)
+        print('Implemented time: ', implemented_time)
+
+        if set(docs).issubset(set(posting_list)):
+            print('Indexing is correct')
+
+            if implemented_time < brute_force_time:
+                print('Indexing is good')
+                return True
+            else:
+                print('Indexing is bad')
+                return False
+        else:
+            print('Indexing is wrong')
+            return False
+
+# TODO: Run the class with needed parameters, then run check methods and finally report the results of check methods
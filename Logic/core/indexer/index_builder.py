@@ -0,0 +1,176 @@
+import heapq
+import json
+import os
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+
+from .binary_index import BinaryIndexWriter
+from .index import INVERTED_INDEXES, Index, get_term_frequencies
+from .indexes_enum import Indexes, Index_formats
+from .posting_list import FieldIndex, PostingList
+from .shared_index import publish_indexes
+
+
+def build_shard(shard):
+    """
+    Builds the partial inverted indexes of one shard of the corpus.
+
+    Runs in a worker process, so it only takes and returns picklable data.
+
+    Parameters
+    ----------
+    shard : tuple
+        (first internal document ID, list of documents). The documents get
+        consecutive internal IDs starting from the first one.
+
+    Returns
+    -------
+    tuple
+        ({field: run}, forward postings). A run is a list of (UTF-8 encoded
+        term, doc ids, tfs) sorted by term, the doc ids being sorted as well.
+        The forward postings are the {field: {term: tf}} of every document.
+    """
+    first_internal_id, documents = shard
+    partial_indexes = {field.value: {} for field in INVERTED_INDEXES}
+    forward_index = []
+
+    for internal_id, document in enumerate(documents, first_internal_id):
+        forward_postings = {}
+        for field, partial_index in partial_indexes.items():
+            term_frequencies = forward_postings[field] = get_term_frequencies(document, field)
+            for term, tf in term_frequencies.items():
+                postings = partial_index.get(term)
+                if postings is None:
+                    postings = partial_index[term] = (array('I'), array('I'))
+                postings[0].append(internal_id)
+                postings[1].append(tf)
+        forward_index.append(forward_postings)
+
+    runs = {}
+    for field, partial_index in partial_indexes.items():
+        runs[field] = sorted((term.encode('utf-8'), doc_ids, tfs) for term, (doc_ids, tfs) in partial_index.items())
+    return runs, forward_index
+
+
+def merge_terms(runs: list):
+    """
+    K-way merges sorted term runs.
+
+    Parameters
+    ----------
+    runs : list
+        Iterables of (UTF-8 encoded term, doc ids, tfs) sorted by term. The doc
+        ids of a term are concatenated in the order of the runs, so earlier
+        runs have to hold the smaller internal document IDs.
+
+    Yields
+    ------
+    tuple
+        (term, doc ids, tfs) of every term, in the order of the UTF-8 encoded terms.
+    """
+    current_term, doc_ids, tfs = None, array('I'), array('I')
+    # heapq.merge keeps equal terms in the order of the runs
+    for term, run_doc_ids, run_tfs in heapq.merge(*runs, key=lambda posting: posting[0]):
+        if term != current_term:
+            if current_term is not None:
+                yield current_term.decode('utf-8'), doc_ids, tfs
+            current_term, doc_ids, tfs = term, array('I'), array('I')
+        doc_ids.extend(run_doc_ids)
+        tfs.extend(run_tfs)
+    if current_term is not None:
+        yield current_term.decode('utf-8'), doc_ids, tfs
+
+
+def merge_runs(runs: list, file_path: str, document_ids: list):
+    """
+    K-way merges sorted term runs, see `merge_terms`, and writes the merged binary index.
+
+    Parameters
+    ----------
+    runs : list
+        Iterables of (UTF-8 encoded term, doc ids, tfs) sorted by term.
+    file_path : str
+        The path of the binary index file to write.
+    document_ids : list
+        The doc table of the index, see `BinaryIndexWriter`.
+    """
+    writer = BinaryIndexWriter(file_path, document_ids)
+    for term, doc_ids, tfs in merge_terms(runs):
+        writer.add(term, doc_ids, tfs)
+    writer.close()
+
+
+class IndexBuilder:
+    def __init__(self, preprocessed_documents: list, number_of_workers: int = None, shard_size: int = 5000):
+        """
+        Initializes the IndexBuilder.
+
+        The corpus is split into shards of consecutive documents whose partial
+        indexes are built in a process pool. As every shard covers a
+        contiguous range of internal document IDs, merging the runs of a term
+        in shard order keeps its posting list sorted. The merged posting lists
+        make up an `Index`, which is stored like any other one.
+
+        Parameters
+        ----------
+        preprocessed_documents : list
+            The preprocessed documents. For duplicated IDs the last document wins.
+        number_of_workers : int
+            The number of worker processes, all cores by default.
+        shard_size : int
+            The number of documents in each shard.
+        """
+        documents = {}
+        for document in preprocessed_documents:
+            documents[document['id']] = document
+        self.documents = documents
+        self.number_of_workers = number_of_workers or os.cpu_count()
+        self.shard_size = shard_size
+
+    def get_shards(self):
+        """
+        Splits the documents into (first internal document ID, documents) shards.
+        """
+        documents = list(self.documents.values())
+        return [(start, documents[start:start + self.shard_size])
+                for start in range(0, len(documents), self.shard_size)]
+
+    def build(self, path: str, index_format: Index_formats = Index_formats.BINARY) -> Index:
+        """
+        Builds the stars, genres and summaries indexes and stores them with
+        everything a `SearchEngine` reads, see `publish_indexes`, along with
+        the documents index, in `path`.
+
+        Parameters
+        ----------
+        path : str
+            The directory to store the indexes in.
+        index_format : Index_formats
+            The format of the stars, genres and summaries indexes, BINARY or COMPRESSED.
+
+        Returns
+        -------
+        Index
+            The built index.
+        """
+        with ProcessPoolExecutor(max_workers=self.number_of_workers) as executor:
+            shards = list(executor.map(build_shard, self.get_shards()))
+
+        field_indexes = {}
+        for field in INVERTED_INDEXES:
+            runs = [shard_runs[field.value] for shard_runs, _ in shards]
+            field_indexes[field.value] = FieldIndex(
+                (term, PostingList(doc_ids, tfs)) for term, doc_ids, tfs in merge_terms(runs))
+        forward_index = [forward_postings for _, shard_forward_index in shards
+                         for forward_postings in shard_forward_index]
+        index = Index.from_posting_lists(list(self.documents.values()), field_indexes, forward_index)
+        publish_indexes(index, path, index_format)
+        index.store_index(path, Indexes.DOCUMENTS.value)
+        return index
+
+
+if __name__ == '__main__':
+    with open('../IMDB_crawledP.json') as f:
+        data = json.load(f)
+    builder = IndexBuilder(list(data.values()))
+    builder.build('./indexes/')
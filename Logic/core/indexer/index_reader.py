@@ -1,8 +1,13 @@
-from .indexes_enum import Indexes,Index_types
+from .indexes_enum import Indexes,Index_types,Index_formats
+from .binary_index import BinaryIndex, DocumentLengths, DocumentNorms
+from .compressed_index import CompressedIndex
+from .positional_index import PositionalIndex
+from .posting_cache import CachedIndex
 import json
 import os
 class Index_reader:
-    def __init__(self,path: str, index_name: Indexes, index_type: Index_types = None):
+    def __init__(self,path: str, index_name: Indexes, index_type: Index_types = None,
+                 index_format: Index_formats = Index_formats.JSON, posting_cache=None):
         """
         Initializes the Index_reader.
 
@@ -14,11 +19,23 @@ class Index_reader:
             The name of the index to read.
         index_type : Index_types
             The type of the index to read.  
+        index_format : Index_formats
+            The format of the index file. Binary indexes are memory-mapped and
+            their posting lists are only decoded when a term is looked up.
+            Compressed and positional indexes are mapped as well and decode
+            their blocks and positions lazily.
+        posting_cache : PostingCache
+            If given, the term lookups and decoded posting lists of a binary,
+            compressed or positional index are cached in it, see `CachedIndex`.
         """
         self.path = path
         self.index_name = index_name
         self.index_type = index_type
+        self.index_format = index_format
+        self.posting_cache = posting_cache
         self.index = self.get_index()
+        if posting_cache is not None and index_type is None and index_format != Index_formats.JSON:
+            self.index = CachedIndex(self.index, posting_cache, index_name.value)
 
     def get_index(self):
         """
@@ -27,17 +44,33 @@ class Index_reader:
         Returns
         -------
         dict
-            The index.
+            The index. For the binary format this is a read-only `BinaryIndex`
+            mapping with the same {term: {document_id: tf}} interface, for the
+            compressed format a `CompressedIndex` and for the positional
+            format a `PositionalIndex`. Binary document lengths are a
+            memory-mapped {internal document ID: length} `DocumentLengths`,
+            binary document norms a {scheme: array} `DocumentNorms`.
         """
         absolute_path = self.path + self.index_name.value
         
         if self.index_type != None:
             absolute_path = absolute_path + "_" + self.index_type.value
 
-        absolute_path = absolute_path + ".json"
+        absolute_path = absolute_path + "." + self.index_format.value
+
+        if self.index_format == Index_formats.BINARY:
+            if self.index_type == Index_types.DOCUMENT_LENGTH:
+                return DocumentLengths(absolute_path)
+            if self.index_type == Index_types.DOCUMENT_NORM:
+                return DocumentNorms(absolute_path)
+            return BinaryIndex(absolute_path)
+        if self.index_format == Index_formats.COMPRESSED:
+            return CompressedIndex(absolute_path)
+        if self.index_format == Index_formats.POSITIONAL:
+            return PositionalIndex(absolute_path)
 
         with open(absolute_path, 'r') as file:
             return json.load(file)
         
     
-        
\ No newline at end of file
+        
@@ -10,4 +10,13 @@ class Indexes(Enum):
 class Index_types(Enum):
     TIERED = 'tiered'
     DOCUMENT_LENGTH = 'document_length'
-    METADATA = 'metadata'
\ No newline at end of file
+    DOCUMENT_NORM = 'document_norm'
+    STATISTICS = 'statistics'
+    SCORE_BOUNDS = 'score_bounds'
+    METADATA = 'metadata'
+
+class Index_formats(Enum):
+    JSON = 'json'
+    BINARY = 'bin'
+    COMPRESSED = 'cbin'
+    POSITIONAL = 'pbin'
@@ -0,0 +1,80 @@
+import threading
+import time
+from collections.abc import Mapping
+from enum import Enum
+
+
+class LazyIndexes(Mapping):
+    def __init__(self, loaders: dict, name: str, lock=None, load_times: dict = None):
+        """
+        A read-only {key: index} mapping whose indexes are loaded the first
+        time they are accessed.
+
+        Loading is serialized by a reentrant lock, which several mappings can
+        share when their loaders depend on each other. How long each index
+        took to load is recorded in `load_times`.
+
+        Parameters
+        ----------
+        loaders : dict
+            {key: function returning the index}
+        name : str
+            The name of the group of indexes, used in the component names of
+            `load_times`, e.g. 'tiered:stars'.
+        lock : threading.RLock
+            The lock loading is done under, a new one by default.
+        load_times : dict
+            {component name: seconds} to record the load times in.
+        """
+        self.loaders = loaders
+        self.name = name
+        self.lock = threading.RLock() if lock is None else lock
+        self.load_times = {} if load_times is None else load_times
+        self.indexes = {}
+
+    def get_component_name(self, key) -> str:
+        return f'{self.name}:{key.value if isinstance(key, Enum) else key}'
+
+    def is_loaded(self, key) -> bool:
+        return key in self.indexes
+
+    def load(self, keys=None):
+        """
+        Loads the indexes of the given keys, all of them by default, if they are not loaded yet.
+        """
+        for key in self.loaders if keys is None else keys:
+            self[key]
+
+    def close(self):
+        """
+        Closes the loaded indexes that hold files, e.g. memory-mapped ones, and forgets them.
+
+        A mapped index that is still referenced, e.g. by the arrays of a
+        posting list, stays mapped until they are released, see `unmap`.
+        """
+        with self.lock:
+            for index in self.indexes.values():
+                if hasattr(index, 'close'):
+                    index.close()
+            self.indexes = {}
+
+    def __getitem__(self, key):
+        if key in self.indexes:
+            return self.indexes[key]
+        if key not in self.loaders:
+            raise KeyError(key)
+        with self.lock:
+            if key not in self.indexes:
+                start = time.perf_counter()
+                self.indexes[key] = self.loaders[key]()
+                self.load_times[self.get_component_name(key)] = time.perf_counter() - start
+        return self.indexes[key]
+
+    def __contains__(self, key):
+        return key in self.loaders
+
+    def __iter__(self):
+        return iter(self.loaders)
+
+    def __len__(self):
+        return len(self.loaders)
@@ -1,9 +1,42 @@
-from index_reader import Index_reader
-from indexes_enum import Indexes, Index_types
+from .index_reader import Index_reader
+from .indexes_enum import Indexes, Index_types
+from .collection_statistics import DEFAULT_IDF_VARIANT
+from .index import FORMAT_VERSION, INVERTED_INDEXES, get_term_frequencies
 import json
 
+
+def read_metadata_index(path: str) -> dict:
+    """
+    Reads a stored metadata index and checks the format of the indexes stored with it.
+
+    Indexes stored before version 2 counted the document lengths in
+    characters, which BM25 and the tiers would take for token counts.
+
+    Parameters
+    ----------
+    path : str
+        The path to the indexes.
+
+    Returns
+    -------
+    dict
+        The metadata index.
+
+    Raises
+    ------
+    ValueError
+        If the indexes were stored in an older format and have to be rebuilt.
+    """
+    metadata_index = Index_reader(path, Indexes.DOCUMENTS, Index_types.METADATA).index
+    format_version = metadata_index.get('format_version', 1)
+    if format_version != FORMAT_VERSION:
+        raise ValueError(f'The indexes in {path} are in format version {format_version} instead of '
+                         f'{FORMAT_VERSION}, rebuild them')
+    return metadata_index
+
+
 class Metadata_index:
-    def __init__(self, path=''):
+    def __init__(self, path='', index=None):
         """
         Initializes the Metadata_index.
 
@@ -11,7 +44,13 @@ class Metadata_index:
         ----------
         path : str
             The path to the indexes.
+        index : Index
+            An index built in this process. Its statistics were collected
+            while indexing, so the documents are not read and walked again.
         """
+        if index is not None:
+            self.metadata_index = index.get_metadata_index()
+            return
         self.document_reader = Index_reader(path, Indexes.DOCUMENTS)
         self.documents = self.read_documents()
         self.metadata_index = self.create_metadata_index()
@@ -32,38 +71,31 @@ class Metadata_index:
         Creates the metadata index.
         """
         metadata_index = {}
-        metadata_index['average_document_length'] = {
-            'stars': self.get_average_document_field_length('stars'),
-            'genres': self.get_average_document_field_length('genres'),
-            'summaries': self.get_average_document_field_length('summaries')
-        }
+        metadata_index['average_document_length'] = self.get_average_document_field_lengths()
         metadata_index['document_count'] = len(self.documents)
+        metadata_index['idf_variant'] = DEFAULT_IDF_VARIANT
+        # the n-th document has internal ID n, as in `DocumentNormsIndex`
+        metadata_index['document_ids'] = list(self.documents)
+        metadata_index['format_version'] = FORMAT_VERSION
         return metadata_index
 
-    def get_average_document_field_length(self, field):
+    def get_average_document_field_lengths(self):
         """
-        Returns the average length of the field in all documents in the index.
-
-        Parameters
-        ----------
-        field : str
-            The field to get the document lengths for.
+        Returns the average length of every field in all documents in the index,
+        walking the documents only once.
 
         Returns
         -------
-        float
-            The average length of the field in all documents.
+        dict
+            {field: average number of terms of the field in all documents}.
         """
 
-        total_length=0
+        total_lengths = {field.value: 0 for field in INVERTED_INDEXES}
         for doc in self.documents.values():
+            for field in total_lengths:
+                total_lengths[field] += sum(get_term_frequencies(doc, field).values())
 
-            if doc[field] is not None:
-
-             for str in doc[field]:
-                total_length+=len(str)
-
-        return total_length / len(self.documents)
+        return {field: total / len(self.documents) for field, total in total_lengths.items()}
 
     def store_metadata_index(self, path):
         """
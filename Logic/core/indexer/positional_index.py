@@ -0,0 +1,306 @@
+import struct
+from array import array
+from bisect import bisect_left
+from functools import reduce
+
+import numpy as np
+
+from .binary_index import BinaryIndexWriter, BinaryIndex
+from .compressed_index import encode_varbyte, decode_varbyte
+from .posting_list import PostingList
+
+MAGIC = b'MIRIDP02'
+# the binary index header followed by the byte offsets of the position
+# offsets and of the compressed positions.
+HEADER = struct.Struct('<8sIIQ' + 'Q' * 9)
+
+
+def get_term_positions(tokens: list) -> dict:
+    """
+    Returns the token offsets of every term of a tokenized field.
+
+    Parameters
+    ----------
+    tokens : list
+        The tokens of the field, see `get_field_tokens`.
+
+    Returns
+    -------
+    dict
+        {term: array of increasing positions}
+    """
+    term_positions = {}
+    for position, term in enumerate(tokens):
+        positions = term_positions.get(term)
+        if positions is None:
+            positions = term_positions[term] = array('I')
+        positions.append(position)
+    return term_positions
+
+
+def encode_positions(positions) -> bytes:
+    """
+    Gap encodes increasing positions with variable-byte codes.
+    """
+    return encode_varbyte(np.diff(np.asarray(positions, dtype=np.int64), prepend=0))
+
+
+def decode_positions(data) -> np.ndarray:
+    """
+    Decodes positions encoded by `encode_positions` as a uint32 array.
+    """
+    return np.cumsum(decode_varbyte(data)).astype(np.uint32)
+
+
+class PositionalPostingList(PostingList):
+    def __init__(self, doc_ids=None, tfs=None, positions=None):
+        """
+        A posting list that also keeps where the term occurs in each document.
+
+        Parameters
+        ----------
+        doc_ids : array
+            The sorted internal document IDs.
+        tfs : array
+            The term frequency of the term in each document.
+        positions : list
+            The increasing token offsets of the term in each document,
+            parallel to `doc_ids`.
+        """
+        super().__init__(doc_ids, tfs)
+        self.positions = [] if positions is None else positions
+
+    def add(self, doc_id: int, tf: int, positions=None):
+        """
+        Sets the positions of a document, inserting it if needed.
+
+        Parameters
+        ----------
+        doc_id : int
+            The internal ID of the document.
+        tf : int
+            The term frequency, i.e. the number of positions.
+        positions : array
+            The token offsets of the term in the document.
+        """
+        positions = array('I') if positions is None else positions
+        if not self.doc_ids or doc_id > self.doc_ids[-1]:
+            super().add(doc_id, tf)
+            self.positions.append(positions)
+            return
+        position = bisect_left(self.doc_ids, doc_id)
+        if self.doc_ids[position] != doc_id:
+            self.positions.insert(position, positions)
+        else:
+            self.positions[position] = positions
+        super().add(doc_id, tf)
+
+    def remove(self, doc_id: int) -> bool:
+        position = self.find(doc_id)
+        if position < 0:
+            return False
+        del self.doc_ids[position]
+        del self.tfs[position]
+        del self.positions[position]
+        return True
+
+    def get_positions(self, doc_id: int):
+        """
+        Returns the token offsets of the term in a document, or None if it does not occur there.
+        """
+        position = self.find(doc_id)
+        return self.positions[position] if position >= 0 else None
+
+    def __repr__(self):
+        return f'PositionalPostingList({dict(self.items())})'
+
+
+def match_phrase(posting_lists: list, slop: int = 0) -> np.ndarray:
+    """
+    Finds the documents containing a phrase.
+
+    Parameters
+    ----------
+    posting_lists : list
+        The positional posting lists of the terms of the phrase, in order.
+        A missing term is None.
+    slop : int
+        With 0 the terms have to be consecutive and in order. Otherwise they
+        have to occur, in any order, within a window of `len(phrase) + slop`
+        tokens.
+
+    Returns
+    -------
+    numpy.ndarray
+        The sorted internal IDs of the matching documents.
+    """
+    if not posting_lists or any(postings is None for postings in posting_lists):
+        return np.zeros(0, dtype=np.uint32)
+
+    candidates = reduce(lambda left, right: np.intersect1d(left, right, assume_unique=True),
+                        sorted((np.asarray(postings.doc_ids) for postings in posting_lists), key=len))
+    matches = [doc_id for doc_id in candidates.tolist()
+               if contains_phrase([postings.get_positions(doc_id) for postings in posting_lists], slop)]
+    return np.array(matches, dtype=np.uint32)
+
+
+def contains_phrase(term_positions: list, slop: int) -> bool:
+    """
+    Checks the positions of the terms of a phrase in one document, see `match_phrase`.
+    """
+    if slop == 0:
+        starts = np.asarray(term_positions[0], dtype=np.int64)
+        for offset, positions in enumerate(term_positions[1:], 1):
+            starts = np.intersect1d(starts, np.asarray(positions, dtype=np.int64) - offset, assume_unique=True)
+            if not len(starts):
+                return False
+        return True
+
+    # a term repeated in the phrase has the same positions in every slot, and
+    # needs as many distinct occurrences in the window as it has slots
+    needed = {}
+    for positions in term_positions:
+        key = tuple(np.asarray(positions).tolist())
+        needed[key] = needed.get(key, 0) + 1
+    # smallest window covering every distinct term enough times, over the merged positions
+    window = len(term_positions) + slop
+    occurrences = sorted((position, term) for term, positions in enumerate(needed) for position in positions)
+    needed = list(needed.values())
+    counts = [0] * len(needed)
+    covered = 0
+    start = 0
+    for position, term in occurrences:
+        counts[term] += 1
+        covered += counts[term] == needed[term]
+        while covered == len(needed):
+            first_position, first_term = occurrences[start]
+            if position - first_position < window:
+                return True
+            counts[first_term] -= 1
+            covered -= counts[first_term] == needed[first_term] - 1
+            start += 1
+    return False
+
+
+class PositionalIndexWriter(BinaryIndexWriter):
+    magic = MAGIC
+    header = HEADER
+
+    def __init__(self, file_path: str, document_ids: list):
+        """
+        Initializes the PositionalIndexWriter.
+
+        The file is a binary index with two more sections: the positions of
+        every posting, gap and variable-byte encoded, and their byte offsets.
+
+        Parameters
+        ----------
+        file_path : str
+            The path of the positional index file to write.
+        document_ids : list
+            The doc table of the index, see `BinaryIndexWriter`.
+        """
+        super().__init__(file_path, document_ids)
+        self.position_offsets = array('Q', [0])
+        self.positions = bytearray()
+
+    def add(self, term: str, doc_ids, tfs, positions=None):
+        """
+        Appends the posting list of a term, see `BinaryIndexWriter.add`.
+
+        Parameters
+        ----------
+        positions : list
+            The increasing token offsets of the term in each of the documents.
+        """
+        super().add(term, doc_ids, tfs)
+        if positions is None or len(positions) != self.posting_offsets[-1] - self.posting_offsets[-2]:
+            raise ValueError(f'doc_ids and positions of {term} have different lengths')
+        for document_positions in positions:
+            self.positions += encode_positions(document_positions)
+            self.position_offsets.append(len(self.positions))
+
+    def get_posting_sections(self):
+        return super().get_posting_sections() + [self.position_offsets.tobytes(), bytes(self.positions)]
+
+
+def write_positional_index(file_path: str, field_index: dict, doc_id_map):
+    """
+    Writes a {term: PositionalPostingList} index in the positional format.
+
+    Parameters
+    ----------
+    file_path : str
+        The path of the positional index file to write.
+    field_index : dict
+        The positional index of one field.
+    doc_id_map : DocIdMap
+        The map the internal document IDs of the postings come from.
+    """
+    writer = PositionalIndexWriter(file_path, doc_id_map.document_ids)
+    for term in sorted(field_index, key=lambda t: t.encode('utf-8')):
+        postings = field_index[term]
+        writer.add(term, postings.doc_ids, postings.tfs, postings.positions)
+    writer.close()
+
+
+class EncodedPositions:
+    def __init__(self, positional_index, start: int, end: int):
+        """
+        The positions of the postings [start, end) of a positional index,
+        decoded when they are accessed.
+        """
+        self.positional_index = positional_index
+        self.start = start
+        self.end = end
+
+    def __getitem__(self, position: int):
+        if not 0 <= position < len(self):
+            raise IndexError(position)
+        return self.positional_index.get_positions(self.start + position)
+
+    def __len__(self):
+        return self.end - self.start
+
+
+class PositionalIndex(BinaryIndex):
+    magic = MAGIC
+    header = HEADER
+
+    def __init__(self, file_path: str):
+        """
+        Memory-maps a positional index file.
+
+        It has the interface of `BinaryIndex`, its posting lists are
+        `PositionalPostingList`s whose positions are decoded on access.
+
+        Parameters
+        ----------
+        file_path : str
+            The path of the positional index file.
+        """
+        super().__init__(file_path)
+
+    def read_sections(self, number_of_documents, number_of_terms, number_of_postings,
+                      doc_offsets, doc_blob, term_offsets, term_blob, posting_offsets, doc_ids, tfs,
+                      position_offsets, positions):
+        super().read_sections(number_of_documents, number_of_terms, number_of_postings,
+                              doc_offsets, doc_blob, term_offsets, term_blob, posting_offsets, doc_ids, tfs)
+        self.position_offsets = self.section(position_offsets, number_of_postings + 1, 'Q')
+        self.positions = self.blob(positions, positions + self.position_offsets[number_of_postings])
+
+    def get_positions(self, posting: int) -> np.ndarray:
+        """
+        Decodes the positions of the posting with the given global number.
+        """
+        return decode_positions(self.positions[self.position_offsets[posting]:self.position_offsets[posting + 1]])
+
+    def get_posting_list(self, term: str):
+        """
+        Returns the positional posting list of a term, or None if it is not in the index.
+        """
+        ordinal = self.find_term(term)
+        if ordinal < 0:
+            return None
+        start, end = self.posting_offsets[ordinal], self.posting_offsets[ordinal + 1]
+        return PositionalPostingList(self.doc_ids[start:end], self.tfs[start:end], EncodedPositions(self, start, end))
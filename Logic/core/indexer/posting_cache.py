@@ -0,0 +1,252 @@
+import threading
+from collections import OrderedDict
+from collections.abc import Mapping
+
+import numpy as np
+
+from .positional_index import PositionalPostingList
+from .posting_list import PostingList
+
+# the estimated bytes of an entry besides its arrays: the key, the tuple
+# and the posting list object
+ENTRY_OVERHEAD = 200
+# the cached posting list of a term the index does not have
+ABSENT = object()
+
+
+class PostingCache:
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, protected_fraction: float = 0.8):
+        """
+        A byte-budgeted cache of decoded posting lists and term lookups,
+        shared by the indexes of the fields and safe to use from concurrent
+        searches, see `CachedIndex`.
+
+        Entries are evicted with a segmented LRU: a new entry goes to the
+        probation segment and is only promoted to the protected segment when
+        it is read again. The least recently used entries of probation are
+        evicted first, so the terms of one-off queries do not push out the
+        ones queries keep coming back to.
+
+        Parameters
+        ----------
+        max_bytes : int
+            The estimated size of all the entries, see `get_posting_list_size`.
+        protected_fraction : float
+            The share of max_bytes the protected segment may take, the
+            entries it overflows with are moved back to probation.
+        """
+        self.max_bytes = max_bytes
+        self.max_protected_bytes = int(max_bytes * protected_fraction)
+        # key -> (value, size), least recently used first
+        self.probation = OrderedDict()
+        self.protected = OrderedDict()
+        self.probation_bytes = 0
+        self.protected_bytes = 0
+        self.lock = threading.Lock()
+        # field -> [hits, misses]
+        self.counters = {}
+
+    def get(self, field: str, key):
+        """
+        Returns a cached value, None if it is not cached.
+
+        Parameters
+        ----------
+        field : str
+            The field the hit or miss is counted for.
+        key : tuple
+            The key of the value.
+        """
+        with self.lock:
+            counters = self.counters.setdefault(field, [0, 0])
+            entry = self.protected.get(key)
+            if entry is not None:
+                self.protected.move_to_end(key)
+                counters[0] += 1
+                return entry[0]
+            entry = self.probation.pop(key, None)
+            if entry is None:
+                counters[1] += 1
+                return None
+            self.probation_bytes -= entry[1]
+            self.protected[key] = entry
+            self.protected_bytes += entry[1]
+            while self.protected_bytes > self.max_protected_bytes:
+                demoted_key, demoted = self.protected.popitem(last=False)
+                self.protected_bytes -= demoted[1]
+                self.probation[demoted_key] = demoted
+                self.probation_bytes += demoted[1]
+            counters[0] += 1
+            return entry[0]
+
+    def put(self, key, value, size: int):
+        """
+        Caches a value of an estimated size in bytes, evicting the least
+        recently used entries to stay within max_bytes. A value larger than
+        the probation segment is not cached.
+        """
+        if size > self.max_bytes - self.max_protected_bytes:
+            return
+        with self.lock:
+            if key in self.protected or key in self.probation:
+                return
+            self.probation[key] = (value, size)
+            self.probation_bytes += size
+            while self.probation_bytes + self.protected_bytes > self.max_bytes:
+                segment = self.probation if self.probation else self.protected
+                _, (_, evicted_size) = segment.popitem(last=False)
+                if segment is self.probation:
+                    self.probation_bytes -= evicted_size
+                else:
+                    self.protected_bytes -= evicted_size
+
+    def discard(self, owner):
+        """
+        Drops the entries of one index, whose keys start with owner.
+        """
+        with self.lock:
+            for segment in (self.probation, self.protected):
+                for key in [key for key in segment if key[0] == owner]:
+                    _, size = segment.pop(key)
+                    if segment is self.probation:
+                        self.probation_bytes -= size
+                    else:
+                        self.protected_bytes -= size
+
+    def get_stats(self) -> dict:
+        """
+        Returns the counters of the cache.
+
+        Returns
+        -------
+        dict
+            {field: {'hits', 'misses', 'hit_rate'}} and the 'bytes' and
+            'entries' the cache holds.
+        """
+        with self.lock:
+            stats = {field: {'hits': hits, 'misses': misses,
+                             'hit_rate': hits / (hits + misses) if hits + misses else 0.0}
+                     for field, (hits, misses) in self.counters.items()}
+            stats['bytes'] = self.probation_bytes + self.protected_bytes
+            stats['entries'] = len(self.probation) + len(self.protected)
+            return stats
+
+
+def get_posting_list_size(postings) -> int:
+    """
+    Returns the estimated bytes a decoded posting list takes in the cache.
+    Positions are left out, they are decoded from the mapped file on access.
+    """
+    return ENTRY_OVERHEAD + postings.doc_ids.nbytes + postings.tfs.nbytes
+
+
+class CachedIndex(Mapping):
+    def __init__(self, index, posting_cache: PostingCache, field: str):
+        """
+        A memory-mapped field index whose term lookups and decoded posting
+        lists are kept in a `PostingCache`, so a term looked up again costs a
+        dict read instead of a term dictionary search and a decode.
+
+        The cached posting lists hold their doc ids and tfs as int64 arrays,
+        the dtype the scorer works on, and are shared by all the searches:
+        they must not be modified. It has the interface of the index, which
+        it forwards everything else to.
+
+        Parameters
+        ----------
+        index : BinaryIndex
+            A binary, compressed or positional index.
+        posting_cache : PostingCache
+            The cache, which several indexes can share.
+        field : str
+            The field of the index, which the hit rates are counted for.
+        """
+        self.index = index
+        self.posting_cache = posting_cache
+        self.field = field
+
+    def __getattr__(self, name):
+        return getattr(self.index, name)
+
+    def find_term(self, term: str) -> int:
+        """
+        Returns the ordinal of a term, or -1 if it is not in the index, see `BinaryIndex.find_term`.
+        """
+        key = (self.index.file_path, 'ordinal', term)
+        ordinal = self.posting_cache.get(self.field, key)
+        if ordinal is None:
+            ordinal = self.index.find_term(term)
+            self.posting_cache.put(key, ordinal, ENTRY_OVERHEAD + len(term))
+        return ordinal
+
+    def get_posting_list(self, term: str):
+        """
+        Returns the decoded posting list of a term, or None if it is not in the index.
+
+        A term that is not in the index is cached as well, so looking it up
+        again is a hit. A miss looks the term up through the cached ordinals,
+        which `get_document_frequency` and `in` read afterwards.
+        """
+        key = (self.index.file_path, 'postings', term)
+        postings = self.posting_cache.get(self.field, key)
+        if postings is not None:
+            return None if postings is ABSENT else postings
+        if self.find_term(term) < 0:
+            self.posting_cache.put(key, ABSENT, ENTRY_OVERHEAD + len(term))
+            return None
+        postings = self.index.get_posting_list(term)
+        doc_ids = np.asarray(postings.doc_ids, dtype=np.int64)
+        tfs = np.asarray(postings.tfs, dtype=np.int64)
+        if isinstance(postings, PositionalPostingList):
+            postings = PositionalPostingList(doc_ids, tfs, postings.positions)
+        else:
+            postings = PostingList(doc_ids, tfs)
+        self.posting_cache.put(key, postings, get_posting_list_size(postings))
+        return postings
+
+    def get_posting_lists(self, terms) -> dict:
+        """
+        Looks up many terms at once.
+
+        Returns
+        -------
+        dict
+            {term: PostingList} for the terms that are in the index.
+        """
+        posting_lists = {}
+        for term in terms:
+            postings = self.get_posting_list(term)
+            if postings is not None:
+                posting_lists[term] = postings
+        return posting_lists
+
+    def get_document_frequency(self, term: str) -> int:
+        """
+        Returns the number of documents containing a term without decoding its posting list.
+        """
+        ordinal = self.find_term(term)
+        if ordinal < 0:
+            return 0
+        return int(self.index.posting_offsets[ordinal + 1] - self.index.posting_offsets[ordinal])
+
+    def close(self):
+        """
+        Drops the cached entries of the index and unmaps it.
+        """
+        self.posting_cache.discard(self.index.file_path)
+        self.index.close()
+
+    def __getitem__(self, term):
+        postings = self.get_posting_list(term)
+        if postings is None:
+            raise KeyError(term)
+        return postings
+
+    def __contains__(self, term):
+        return isinstance(term, str) and self.find_term(term) >= 0
+
+    def __iter__(self):
+        return iter(self.index)
+
+    def __len__(self):
+        return len(self.index)
@@ -0,0 +1,231 @@
+from array import array
+from bisect import bisect_left
+
+
+class PostingList:
+    def __init__(self, doc_ids=None, tfs=None):
+        """
+        Initializes the PostingList.
+
+        A posting list keeps the internal IDs of the documents containing a
+        term in a sorted unsigned int array, and the term frequencies in a
+        parallel array. Any buffer of unsigned ints can back it, so read-only
+        memoryviews into a binary index file work as well.
+
+        Parameters
+        ----------
+        doc_ids : array
+            The sorted internal document IDs.
+        tfs : array
+            The term frequency of the term in each document.
+        """
+        self.doc_ids = array('I') if doc_ids is None else doc_ids
+        self.tfs = array('I') if tfs is None else tfs
+
+    @classmethod
+    def from_dict(cls, postings: dict, doc_id_map):
+        """
+        Builds a posting list from a {document_id: tf} dict of the JSON format.
+
+        Parameters
+        ----------
+        postings : dict
+            The postings keyed by IMDb document ID.
+        doc_id_map : DocIdMap
+            The map to intern the document IDs with.
+        """
+        pairs = sorted((doc_id_map.add(document_id), tf) for document_id, tf in postings.items())
+        return cls(array('I', [doc for doc, _ in pairs]), array('I', [tf for _, tf in pairs]))
+
+    def to_dict(self, doc_id_map) -> dict:
+        """
+        Returns the postings as a {document_id: tf} dict of the JSON format.
+        """
+        return {doc_id_map.get_document_id(doc): tf for doc, tf in zip(self.doc_ids, self.tfs)}
+
+    def find(self, doc_id: int) -> int:
+        """
+        Returns the position of a document in the posting list, or -1.
+        """
+        position = bisect_left(self.doc_ids, doc_id)
+        if position < len(self.doc_ids) and self.doc_ids[position] == doc_id:
+            return position
+        return -1
+
+    def advance(self, doc_id: int, position: int = 0) -> int:
+        """
+        Returns the position of the first document not smaller than doc_id,
+        searching from position on.
+
+        The sorted array is used as a skip list with implicit skip pointers
+        at power of two distances: the search gallops forward by doubling
+        steps and then binary searches the last step, so moving a cursor
+        by k documents costs O(log k).
+        """
+        doc_ids = self.doc_ids
+        length = len(doc_ids)
+        high, step = position, 1
+        while high < length and doc_ids[high] < doc_id:
+            position = high + 1
+            high += step
+            step *= 2
+        return bisect_left(doc_ids, doc_id, position, min(high, length))
+
+    def intersect(self, doc_ids) -> list:
+        """
+        Returns the documents of a sorted list of internal IDs that are in the posting list.
+
+        A cursor gallops through the posting list, so intersecting a short
+        list with a long posting list only touches a few of its entries.
+        """
+        own_doc_ids = self.doc_ids
+        length = len(own_doc_ids)
+        matches = []
+        position = 0
+        for doc_id in doc_ids:
+            position = self.advance(doc_id, position)
+            if position >= length:
+                break
+            if own_doc_ids[position] == doc_id:
+                matches.append(doc_id)
+        return matches
+
+    def add(self, doc_id: int, tf: int):
+        """
+        Sets the term frequency of a document, inserting it if needed.
+
+        Documents are usually added in increasing ID order, which is a plain
+        append.
+        """
+        if not self.doc_ids or doc_id > self.doc_ids[-1]:
+            self.doc_ids.append(doc_id)
+            self.tfs.append(tf)
+            return
+        position = bisect_left(self.doc_ids, doc_id)
+        if self.doc_ids[position] == doc_id:
+            self.tfs[position] = tf
+        else:
+            self.doc_ids.insert(position, doc_id)
+            self.tfs.insert(position, tf)
+
+    def remove(self, doc_id: int) -> bool:
+        """
+        Removes a document from the posting list.
+
+        Returns
+        -------
+        bool
+            True if the document was in the posting list.
+        """
+        position = self.find(doc_id)
+        if position < 0:
+            return False
+        del self.doc_ids[position]
+        del self.tfs[position]
+        return True
+
+    def get(self, doc_id: int, default=None):
+        position = self.find(doc_id)
+        return self.tfs[position] if position >= 0 else default
+
+    def keys(self):
+        return self.doc_ids
+
+    def items(self):
+        return zip(self.doc_ids, self.tfs)
+
+    def __getitem__(self, doc_id):
+        position = self.find(doc_id)
+        if position < 0:
+            raise KeyError(doc_id)
+        return self.tfs[position]
+
+    def __contains__(self, doc_id):
+        return self.find(doc_id) >= 0
+
+    def __iter__(self):
+        return iter(self.doc_ids)
+
+    def __len__(self):
+        return len(self.doc_ids)
+
+    def __eq__(self, other):
+        if not isinstance(other, PostingList):
+            return NotImplemented
+        return list(self.doc_ids) == list(other.doc_ids) and list(self.tfs) == list(other.tfs)
+
+    def __repr__(self):
+        return f'PostingList({dict(self.items())})'
+
+
+class FieldIndex(dict):
+    """
+    The inverted index of one field, a {term: PostingList} dict.
+
+    Consumers look terms up through `get_posting_list`,
+    `get_posting_lists` and `get_document_frequency`, which `BinaryIndex`
+    implements as well, instead of indexing the dict directly.
+    """
+
+    def get_posting_list(self, term: str):
+        """
+        Returns the posting list of a term, or None if it is not in the index.
+        """
+        return self.get(term)
+
+    def get_posting_lists(self, terms) -> dict:
+        """
+        Looks up many terms at once.
+
+        Returns
+        -------
+        dict
+            {term: PostingList} for the terms that are in the index.
+        """
+        posting_lists = {}
+        for term in terms:
+            postings = self.get(term)
+            if postings is not None:
+                posting_lists[term] = postings
+        return posting_lists
+
+    def get_document_frequency(self, term: str) -> int:
+        """
+        Returns the number of documents containing a term.
+        """
+        postings = self.get(term)
+        return 0 if postings is None else len(postings)
+
+    def get_terms_with_prefix(self, prefix: str) -> list:
+        """
+        Returns the terms starting with a prefix, in ascending order.
+
+        The dict has no order, so this scans the whole vocabulary. Read-only
+        indexes use a `TermDictionaryIndex` instead.
+        """
+        return sorted((term for term in self if term.startswith(prefix)), key=lambda term: term.encode('utf-8'))
+
+    def get_terms_in_range(self, low: str = None, high: str = None) -> list:
+        """
+        Returns the terms t with low <= t < high in ascending order, a missing bound being open.
+        """
+        low = None if low is None else low.encode('utf-8')
+        high = None if high is None else high.encode('utf-8')
+        return sorted((term for term in self
+                       if (low is None or term.encode('utf-8') >= low) and (high is None or term.encode('utf-8') < high)),
+                      key=lambda term: term.encode('utf-8'))
+
+
+def posting_lists_from_json(field_index: dict, doc_id_map) -> FieldIndex:
+    """
+    Converts a {term: {document_id: tf}} JSON index to {term: PostingList}.
+
+    Parameters
+    ----------
+    field_index : dict
+        The index of one field as stored in the JSON format.
+    doc_id_map : DocIdMap
+        The map to intern the document IDs with. Use the same map for all the
+        fields that are scored together.
+    """
+    return FieldIndex((term, PostingList.from_dict(postings, doc_id_map)) for term, postings in field_index.items())
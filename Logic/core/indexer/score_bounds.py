@@ -0,0 +1,182 @@
+import struct
+
+import numpy as np
+
+from .binary_index import NORMALIZED_SCHEMES
+from .compressed_index import BLOCK_SIZE
+from .indexes_enum import Index_types, Index_formats
+
+MAGIC = b'MIRSBD01'
+# magic, number of terms, number of blocks, followed by the term block
+# offsets (uint64) and, for every block, its last doc id, largest tf and
+# smallest field length (uint32) and its largest normalized weight under
+# every scheme of NORMALIZED_SCHEMES (float64, scheme after scheme).
+HEADER = struct.Struct('<8sQQ')
+
+
+def get_block_bounds(doc_ids, tfs, document_lengths, document_norms):
+    """
+    Computes the score bounds of the blocks of BLOCK_SIZE postings of one posting list.
+
+    Parameters
+    ----------
+    doc_ids : numpy.ndarray
+        The sorted internal IDs of the documents.
+    tfs : numpy.ndarray
+        The tf of the term in each of them.
+    document_lengths : numpy.ndarray
+        The length of the field in every document by internal ID.
+    document_norms : dict
+        {scheme: array of norms by internal ID}, see `DocumentNormsIndex`.
+
+    Returns
+    -------
+    tuple
+        (last doc ids, largest tfs, smallest lengths, {scheme: largest tf
+        weight / norm}) of the blocks. The tf weight is tf for the n schemes
+        and 1 + log(tf) for the l schemes, the idf is left out.
+    """
+    starts = np.arange(0, len(doc_ids), BLOCK_SIZE)
+    ends = np.minimum(starts + BLOCK_SIZE, len(doc_ids))
+    tfs = np.asarray(tfs, dtype=np.float64)
+    tf_weights = {'n': tfs, 'l': 1 + np.log(tfs)}
+    max_weights = {}
+    for scheme in NORMALIZED_SCHEMES:
+        norms = document_norms[scheme][doc_ids]
+        weights = np.divide(tf_weights[scheme[0]], norms, out=np.zeros(len(tfs)), where=norms > 0)
+        max_weights[scheme] = np.maximum.reduceat(weights, starts)
+    return (doc_ids[ends - 1], np.maximum.reduceat(tfs, starts), np.minimum.reduceat(document_lengths[doc_ids], starts),
+            max_weights)
+
+
+class ScoreBounds:
+    block_size = BLOCK_SIZE
+
+    def __init__(self, term_block_offsets, last_doc_ids, max_tfs, min_lengths, max_weights, find_term):
+        """
+        The per term and per block upper bounds a dynamic pruning top-k
+        evaluator skips documents with, see `Logic.core.utility.top_k`.
+
+        The postings of every term are split in blocks of BLOCK_SIZE, and
+        every block keeps the largest tf, the smallest field length and, for
+        each cosine normalized scheme, the largest normalized tf weight of
+        its documents. The bound of a term is the largest of its blocks.
+
+        Parameters
+        ----------
+        term_block_offsets : numpy.ndarray
+            The first block of every term ordinal, and the number of blocks.
+        last_doc_ids, max_tfs, min_lengths : numpy.ndarray
+            The bounds of every block.
+        max_weights : dict
+            {scheme: array of the largest normalized tf weight of every block}
+        find_term : callable
+            Returns the ordinal of a term, -1 if it has none, e.g. the
+            `find_term` of the binary index of the field.
+        """
+        self.term_block_offsets = term_block_offsets
+        self.last_doc_ids = last_doc_ids
+        self.max_tfs = max_tfs
+        self.min_lengths = min_lengths
+        self.max_weights = max_weights
+        self.find_term = find_term
+
+    @classmethod
+    def from_posting_lists(cls, posting_lists, document_lengths, document_norms, find_term):
+        """
+        Computes the bounds of posting lists given in the order of their term ordinals.
+
+        Parameters
+        ----------
+        posting_lists : iterable
+            The (doc_ids, tfs) arrays of every term.
+        document_lengths : numpy.ndarray
+            The length of the field in every document by internal ID.
+        document_norms : dict
+            {scheme: array of norms by internal ID}.
+        find_term : callable
+            See `ScoreBounds`.
+        """
+        document_lengths = np.asarray(document_lengths, dtype=np.int64)
+        term_block_offsets = [0]
+        bounds = []
+        for doc_ids, tfs in posting_lists:
+            doc_ids = np.asarray(doc_ids, dtype=np.int64)
+            bounds.append(get_block_bounds(doc_ids, tfs, document_lengths, document_norms))
+            term_block_offsets.append(term_block_offsets[-1] + len(bounds[-1][0]))
+
+        def concatenate(arrays, dtype):
+            return np.concatenate(arrays).astype(dtype) if arrays else np.zeros(0, dtype=dtype)
+
+        return cls(np.array(term_block_offsets, dtype=np.int64),
+                   concatenate([bound[0] for bound in bounds], np.int64),
+                   concatenate([bound[1] for bound in bounds], np.int64),
+                   concatenate([bound[2] for bound in bounds], np.int64),
+                   {scheme: concatenate([bound[3][scheme] for bound in bounds], np.float64)
+                    for scheme in NORMALIZED_SCHEMES},
+                   find_term)
+
+    def get_blocks(self, term: str):
+        """
+        Returns the blocks of a term as a slice of the block arrays, None if it has none.
+        """
+        ordinal = self.find_term(term)
+        if ordinal < 0:
+            return None
+        return slice(int(self.term_block_offsets[ordinal]), int(self.term_block_offsets[ordinal + 1]))
+
+    def store(self, file_path: str):
+        """
+        Writes the bounds in the binary layout `read` maps them from.
+        """
+        with open(file_path, 'wb') as file:
+            file.write(HEADER.pack(MAGIC, len(self.term_block_offsets) - 1, len(self.last_doc_ids)))
+            file.write(self.term_block_offsets.astype(np.uint64).tobytes())
+            for values in (self.last_doc_ids, self.max_tfs, self.min_lengths):
+                file.write(values.astype(np.uint32).tobytes())
+            for scheme in NORMALIZED_SCHEMES:
+                file.write(self.max_weights[scheme].astype(np.float64).tobytes())
+
+    @classmethod
+    def read(cls, file_path: str, find_term):
+        """
+        Reads bounds written by `store`, whose term ordinals are the ones of a binary index.
+        """
+        with open(file_path, 'rb') as file:
+            magic, number_of_terms, number_of_blocks = HEADER.unpack(file.read(HEADER.size))
+            if magic != MAGIC:
+                raise ValueError(f'{file_path} is not a score bounds file')
+            term_block_offsets = np.fromfile(file, dtype=np.uint64, count=number_of_terms + 1).astype(np.int64)
+            last_doc_ids, max_tfs, min_lengths = (np.fromfile(file, dtype=np.uint32, count=number_of_blocks)
+                                                  .astype(np.int64) for _ in range(3))
+            max_weights = {scheme: np.fromfile(file, dtype=np.float64, count=number_of_blocks)
+                           for scheme in NORMALIZED_SCHEMES}
+        return cls(term_block_offsets, last_doc_ids, max_tfs, min_lengths, max_weights, find_term)
+
+
+def get_score_bounds_path(path: str, field: str) -> str:
+    return f'{path}{field}_{Index_types.SCORE_BOUNDS.value}.{Index_formats.BINARY.value}'
+
+
+def store_score_bounds(path: str, field: str, posting_lists: dict, document_lengths, document_norms: dict):
+    """
+    Writes the score bounds of a field in the term order of its stored
+    indexes, the UTF-8 order the term dictionaries of every format use.
+
+    Parameters
+    ----------
+    path : str
+        The path to the directory where the indexes are stored.
+    field : str
+        The field (stars, genres, summaries).
+    posting_lists : dict
+        {term: (doc_ids, tfs)} of the field, by internal ID.
+    document_lengths : array
+        The length of the field in every document by internal ID.
+    document_norms : dict
+        {scheme: array of norms by internal ID}, see `DocumentNormsIndex`.
+    """
+    terms = sorted(posting_lists, key=lambda term: term.encode('utf-8'))
+    score_bounds = ScoreBounds.from_posting_lists((posting_lists[term] for term in terms), document_lengths,
+                                                  document_norms, None)
+    score_bounds.store(get_score_bounds_path(path, field))
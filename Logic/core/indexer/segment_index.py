@@ -0,0 +1,645 @@
+import json
+import os
+import shutil
+import threading
+from array import array
+from contextlib import contextmanager
+
+import numpy as np
+
+from .binary_index import BinaryIndex
+from .index import Index, INVERTED_INDEXES
+from .index_builder import merge_runs
+from .indexes_enum import Indexes, Index_formats
+from .posting_list import PostingList
+
+MANIFEST = 'segments.json'
+DEAD = -1
+
+
+class Segment:
+    def __init__(self, directory: str):
+        """
+        Opens an immutable on-disk segment.
+
+        A segment directory holds one binary index per field, the global IDs
+        of its documents (`global_ids.bin`, indexed by the segment's internal
+        IDs), the tombstones it carries for older segments (`deleted.json`)
+        and its documents (`documents.json`, only read when merging).
+
+        Parameters
+        ----------
+        directory : str
+            The directory of the segment.
+        """
+        self.directory = directory
+        self.name = os.path.basename(directory)
+        self.field_indexes = {
+            field.value: BinaryIndex(os.path.join(directory, f'{field.value}.{Index_formats.BINARY.value}'))
+            for field in INVERTED_INDEXES
+        }
+        self.global_ids = np.fromfile(os.path.join(directory, 'global_ids.bin'), dtype=np.uint32)
+        with open(os.path.join(directory, 'deleted.json')) as file:
+            self.deleted = set(json.load(file))
+        self.document_ids = self.field_indexes[Indexes.STARS.value].get_document_ids()
+
+    @classmethod
+    def write(cls, directory: str, document_ids: list, global_ids, deleted, documents: list, runs: dict):
+        """
+        Writes a new segment and opens it.
+
+        Parameters
+        ----------
+        directory : str
+            The directory of the new segment.
+        document_ids : list
+            The IMDb IDs of the documents, ordered by their internal IDs in the segment.
+        global_ids : array
+            The global IDs of the documents, in the same order. Must be increasing.
+        deleted : iterable of str
+            The IMDb IDs whose versions in older segments are dead.
+        documents : list
+            The documents, in the same order as `document_ids`.
+        runs : dict
+            {field: term run} as taken by `merge_runs`, using segment internal IDs.
+        """
+        os.makedirs(directory)
+        for field in INVERTED_INDEXES:
+            merge_runs(runs[field.value], os.path.join(directory, f'{field.value}.{Index_formats.BINARY.value}'),
+                       document_ids)
+        np.asarray(global_ids, dtype=np.uint32).tofile(os.path.join(directory, 'global_ids.bin'))
+        with open(os.path.join(directory, 'deleted.json'), 'w') as file:
+            json.dump(sorted(deleted), file)
+        with open(os.path.join(directory, 'documents.json'), 'w') as file:
+            json.dump(documents, file)
+        return cls(directory)
+
+    def get_documents(self):
+        """
+        Reads the documents of the segment, ordered by their internal IDs.
+        """
+        with open(os.path.join(self.directory, 'documents.json')) as file:
+            return json.load(file)
+
+    def get_run(self, field: str, remap):
+        """
+        Yields the term run of a field with remapped internal IDs.
+
+        Parameters
+        ----------
+        field : str
+            The field (stars, genres, summaries).
+        remap : numpy.ndarray
+            The new internal ID of every document of the segment, DEAD for
+            documents to drop.
+        """
+        field_index = self.field_indexes[field]
+        for ordinal in range(len(field_index)):
+            start, end = field_index.posting_offsets[ordinal], field_index.posting_offsets[ordinal + 1]
+            doc_ids = remap[np.frombuffer(field_index.doc_ids[start:end], dtype=np.uint32)]
+            live = doc_ids != DEAD
+            if live.any():
+                tfs = np.frombuffer(field_index.tfs[start:end], dtype=np.uint32)[live]
+                yield field_index.get_term(ordinal).encode('utf-8'), doc_ids[live].tolist(), tfs.tolist()
+
+    def close(self):
+        """
+        Unmaps the field indexes of the segment.
+        """
+        for field_index in self.field_indexes.values():
+            field_index.close()
+
+    def __len__(self):
+        return len(self.global_ids)
+
+
+class SegmentedFieldIndex:
+    def __init__(self, segmented_index, field: str):
+        """
+        The inverted index of one field across all the live segments.
+
+        It has the lookup API of `FieldIndex`. Documents are identified by
+        their global IDs, which do not change when segments are flushed or
+        merged.
+
+        Parameters
+        ----------
+        segmented_index : SegmentedIndex
+            The segmented index.
+        field : str
+            The field (stars, genres, summaries).
+        """
+        self.segmented_index = segmented_index
+        self.field = field
+
+    def get_posting_list(self, term: str):
+        """
+        Returns the posting list of a term across the segments and the
+        memtable, without dead documents, or None if no live document has it.
+        """
+        # the memtable has to be read along with the view, a flush moves its
+        # documents into a new segment
+        with self.segmented_index.lock:
+            segments, dead, epoch = self.segmented_index.acquire_view()
+            memtable_postings = self.segmented_index.get_memtable_postings(self.field, term)
+
+        doc_ids, tfs = [], []
+        try:
+            for segment in segments:
+                posting_arrays = segment.field_indexes[self.field].get_posting_arrays(term)
+                if posting_arrays is not None:
+                    doc_ids.append(segment.global_ids[np.frombuffer(posting_arrays[0], dtype=np.uint32)])
+                    tfs.append(np.frombuffer(posting_arrays[1], dtype=np.uint32))
+
+            if memtable_postings is not None:
+                doc_ids.append(memtable_postings[0])
+                tfs.append(memtable_postings[1])
+
+            if not doc_ids:
+                return None
+            # copies, so nothing refers to the mapped segments once the view is released
+            doc_ids, tfs = np.concatenate(doc_ids), np.concatenate(tfs)
+        finally:
+            self.segmented_index.release_view(epoch)
+        if len(dead):
+            live = ~np.isin(doc_ids, dead)
+            doc_ids, tfs = doc_ids[live], tfs[live]
+        if not len(doc_ids):
+            return None
+        return PostingList(doc_ids, tfs)
+
+    def get_posting_lists(self, terms) -> dict:
+        """
+        Looks up many terms at once.
+
+        Returns
+        -------
+        dict
+            {term: PostingList} for the terms that live documents contain.
+        """
+        posting_lists = {}
+        for term in terms:
+            postings = self.get_posting_list(term)
+            if postings is not None:
+                posting_lists[term] = postings
+        return posting_lists
+
+    def get_document_frequency(self, term: str) -> int:
+        """
+        Returns the number of live documents containing a term.
+        """
+        postings = self.get_posting_list(term)
+        return 0 if postings is None else len(postings)
+
+    def get_terms_with_prefix(self, prefix: str) -> list:
+        """
+        Returns the terms starting with a prefix in any segment or the
+        memtable, in ascending order. Terms of dead documents only may be included.
+        """
+        return self.merge_terms(lambda field_index: field_index.get_terms_with_prefix(prefix))
+
+    def get_terms_in_range(self, low: str = None, high: str = None) -> list:
+        """
+        Returns the terms t with low <= t < high, see `get_terms_with_prefix`.
+        """
+        return self.merge_terms(lambda field_index: field_index.get_terms_in_range(low, high))
+
+    def merge_terms(self, get_terms) -> list:
+        with self.segmented_index.lock:
+            segments, _, epoch = self.segmented_index.acquire_view()
+            terms = set(get_terms(self.segmented_index.memtable.index[self.field]))
+        try:
+            for segment in segments:
+                terms.update(get_terms(segment.field_indexes[self.field]))
+        finally:
+            self.segmented_index.release_view(epoch)
+        return sorted(terms, key=lambda term: term.encode('utf-8'))
+
+
+class SegmentedIndex:
+    def __init__(self, path: str, memtable_size: int = 1000, merge_factor: int = 4, background_merge: bool = True):
+        """
+        Initializes the SegmentedIndex.
+
+        A log-structured index: new documents are indexed in an in-memory
+        `Index` (the memtable) and are searchable right away. A full memtable
+        is flushed to a new immutable segment on disk, and segments of the
+        same size tier are merged in the background. Deleting or replacing a
+        document leaves a tombstone that hides its older versions until a
+        merge drops them.
+
+        Readers take a view of the segments, see `acquire_view` and `pin`.
+        The segments a merge replaces, and the global IDs of the versions a
+        merge or flush drops, are only closed and forgotten once every view
+        taken before is released.
+
+        Every document version gets a global ID when it is added. Global IDs
+        only grow, segments are ordered by age and merges only combine
+        neighbouring segments, so concatenating the postings of the segments
+        keeps them sorted.
+
+        Parameters
+        ----------
+        path : str
+            The directory of the segments and of the manifest listing them.
+        memtable_size : int
+            The number of documents in the memtable that triggers a flush.
+        merge_factor : int
+            The number of neighbouring segments of one size tier that are merged.
+        background_merge : bool
+            If True, merges run in a background thread after each flush,
+            otherwise `merge_segments` has to be called.
+        """
+        self.path = path
+        self.memtable_size = memtable_size
+        self.merge_factor = merge_factor
+        self.lock = threading.RLock()
+        # held while merging, two merges could otherwise pick the same segments
+        self.merge_lock = threading.Lock()
+
+        if not os.path.exists(path):
+            os.makedirs(path)
+        manifest = {'segments': [], 'next_segment': 0, 'next_global_id': 0}
+        if os.path.exists(os.path.join(path, MANIFEST)):
+            with open(os.path.join(path, MANIFEST)) as file:
+                manifest = json.load(file)
+        self.next_segment = manifest['next_segment']
+        self.next_global_id = manifest['next_global_id']
+        self.segments = [Segment(os.path.join(path, name)) for name in manifest['segments']]
+
+        # global ID -> IMDb ID of every version in the memtable and the
+        # segments, and of dropped versions that views taken before still read
+        self.document_ids = {}
+        # IMDb ID -> global ID of its live version
+        self.live_documents = {}
+        # global IDs of versions hidden by a tombstone but not merged away yet
+        self.dead = set()
+        for segment in self.segments:
+            self.apply_tombstones(segment.deleted)
+            for document_id, global_id in zip(segment.document_ids, segment.global_ids.tolist()):
+                self.document_ids[global_id] = document_id
+                self.live_documents[document_id] = global_id
+        self.dead_array = np.array(sorted(self.dead), dtype=np.uint32)
+        # incremented by every add and remove, see `SearchEngine.get_cache_version`
+        self.generation = 0
+        # views are counted per epoch, which every retirement ends: {epoch: number of views}
+        self.epoch = 0
+        self.readers = {}
+        # (epoch, segments, global IDs) retired in the epoch, freed once no view of it is left
+        self.retired = []
+
+        self.reset_memtable()
+        self.merger = None
+        if background_merge:
+            self.merger = SegmentMerger(self)
+            self.merger.start()
+
+    def reset_memtable(self):
+        self.memtable = Index([])
+        # memtable internal ID -> global ID
+        self.memtable_global_ids = array('I')
+        # tombstones for the versions of documents in the segments
+        self.memtable_deleted = set()
+
+    def apply_tombstones(self, document_ids):
+        """
+        Marks the live versions of the given documents in the segments as dead.
+        """
+        for document_id in document_ids:
+            global_id = self.live_documents.pop(document_id, None)
+            if global_id is not None:
+                self.dead.add(global_id)
+
+    def add_document(self, document: dict):
+        """
+        Adds a document, or replaces the live version of a document with the same ID.
+
+        Parameters
+        ----------
+        document : dict
+            The preprocessed document.
+        """
+        document_id = document['id']
+        with self.lock:
+            self.generation += 1
+            if document_id in self.live_documents and document_id not in self.memtable.index[Indexes.DOCUMENTS.value]:
+                self.memtable_deleted.add(document_id)
+                self.apply_tombstones([document_id])
+                self.dead_array = np.array(sorted(self.dead), dtype=np.uint32)
+
+            self.memtable.add_document_to_index(document)
+            internal_id = self.memtable.doc_id_map.get_internal_id(document_id)
+            if internal_id == len(self.memtable_global_ids):
+                self.memtable_global_ids.append(self.next_global_id)
+                self.next_global_id += 1
+            global_id = self.memtable_global_ids[internal_id]
+            self.document_ids[global_id] = document_id
+            self.live_documents[document_id] = global_id
+
+            if len(self.memtable.forward_index) >= self.memtable_size:
+                self.flush()
+
+    def remove_document(self, document_id: str):
+        """
+        Removes the live version of a document.
+
+        Parameters
+        ----------
+        document_id : str
+            The IMDb ID of the document.
+        """
+        with self.lock:
+            self.generation += 1
+            if document_id in self.memtable.index[Indexes.DOCUMENTS.value]:
+                self.memtable.remove_document_from_index(document_id)
+                self.live_documents.pop(document_id)
+            elif document_id in self.live_documents:
+                self.memtable_deleted.add(document_id)
+                self.apply_tombstones([document_id])
+                self.dead_array = np.array(sorted(self.dead), dtype=np.uint32)
+
+    def flush(self):
+        """
+        Writes the memtable and its tombstones to a new segment.
+        """
+        with self.lock:
+            if not self.memtable.forward_index and not self.memtable_deleted:
+                return
+            memtable = self.memtable
+            live_ids = sorted(memtable.forward_index)
+            remap = np.full(len(memtable.doc_id_map), DEAD, dtype=np.int64)
+            remap[live_ids] = np.arange(len(live_ids))
+            document_ids = [memtable.doc_id_map.get_document_id(internal_id) for internal_id in live_ids]
+
+            runs = {}
+            for field in INVERTED_INDEXES:
+                field_index = memtable.index[field.value]
+                runs[field.value] = [sorted(
+                    (term.encode('utf-8'), remap[np.frombuffer(postings.doc_ids, dtype=np.uint32)].tolist(),
+                     postings.tfs) for term, postings in field_index.items()
+                )]
+
+            segment = Segment.write(
+                os.path.join(self.path, self.get_segment_name()),
+                document_ids,
+                np.frombuffer(self.memtable_global_ids, dtype=np.uint32)[live_ids],
+                self.memtable_deleted,
+                [memtable.index[Indexes.DOCUMENTS.value][document_id] for document_id in document_ids],
+                runs,
+            )
+            self.segments.append(segment)
+            # the versions removed from the memtable never reach a segment
+            dropped = set(self.memtable_global_ids) - set(segment.global_ids.tolist())
+            self.reset_memtable()
+            self.store_manifest()
+            self.free(self.retire([], dropped))
+
+        if self.merger is not None:
+            self.merger.notify()
+
+    def get_segment_name(self):
+        name = f'segment_{self.next_segment:06d}'
+        self.next_segment += 1
+        return name
+
+    def store_manifest(self):
+        """
+        Atomically replaces the manifest with the current list of segments.
+        """
+        manifest = {
+            'segments': [segment.name for segment in self.segments],
+            'next_segment': self.next_segment,
+            'next_global_id': self.next_global_id,
+        }
+        temporary_path = os.path.join(self.path, MANIFEST + '.tmp')
+        with open(temporary_path, 'w') as file:
+            json.dump(manifest, file)
+        os.replace(temporary_path, os.path.join(self.path, MANIFEST))
+
+    def get_size_tier(self, segment):
+        """
+        Returns the size tier of a segment, tier t holding segments of up to
+        memtable_size * merge_factor ** t documents.
+        """
+        tier, capacity = 0, self.memtable_size
+        while len(segment) > capacity:
+            capacity *= self.merge_factor
+            tier += 1
+        return tier
+
+    def find_merge_group(self):
+        """
+        Returns the oldest run of `merge_factor` neighbouring segments of the
+        same size tier, or None.
+        """
+        with self.lock:
+            segments = list(self.segments)
+        start = 0
+        for end in range(1, len(segments) + 1):
+            if end == len(segments) or self.get_size_tier(segments[end]) != self.get_size_tier(segments[start]):
+                if end - start >= self.merge_factor:
+                    return segments[start:start + self.merge_factor]
+                start = end
+        return None
+
+    def merge_segments(self):
+        """
+        Merges segments until no size tier has `merge_factor` neighbouring segments.
+        It may be called while the background merger runs, merges take turns.
+        """
+        with self.merge_lock:
+            group = self.find_merge_group()
+            while group is not None:
+                self.merge(group)
+                group = self.find_merge_group()
+
+    def merge(self, group: list):
+        """
+        Merges neighbouring segments into one, dropping dead documents.
+
+        Parameters
+        ----------
+        group : list
+            The segments to merge, oldest first.
+        """
+        group = list(group)
+        with self.lock:
+            dead = set(self.dead)
+            is_oldest = self.segments[0] is group[0]
+
+        document_ids, global_ids, documents, remaps = [], [], [], []
+        for segment in group:
+            remap = np.full(len(segment), DEAD, dtype=np.int64)
+            segment_documents = None
+            for internal_id, global_id in enumerate(segment.global_ids.tolist()):
+                if global_id not in dead:
+                    if segment_documents is None:
+                        segment_documents = segment.get_documents()
+                    remap[internal_id] = len(document_ids)
+                    document_ids.append(segment.document_ids[internal_id])
+                    global_ids.append(global_id)
+                    documents.append(segment_documents[internal_id])
+            remaps.append(remap)
+
+        # tombstones only matter while there are older segments left
+        deleted = set() if is_oldest else set().union(*(segment.deleted for segment in group))
+        runs = {
+            field.value: [segment.get_run(field.value, remap) for segment, remap in zip(group, remaps)]
+            for field in INVERTED_INDEXES
+        }
+        with self.lock:
+            name = self.get_segment_name()
+        merged = Segment.write(os.path.join(self.path, name), document_ids, global_ids, deleted, documents, runs)
+
+        with self.lock:
+            position = self.segments.index(group[0])
+            self.segments[position:position + len(group)] = [merged]
+            dropped = set(global_id for segment in group for global_id in segment.global_ids.tolist()) - set(global_ids)
+            self.dead -= dropped
+            self.dead_array = np.array(sorted(self.dead), dtype=np.uint32)
+            self.store_manifest()
+            reclaimed = self.retire(group, dropped)
+        self.free(reclaimed)
+
+    def acquire_view(self):
+        """
+        Takes a view of the index. Its segments stay open, and the global IDs
+        it can return stay known, until `release_view` is called.
+
+        Returns
+        -------
+        tuple
+            (live segments, sorted global IDs of the dead documents, epoch
+            of the view to release it with).
+        """
+        with self.lock:
+            self.readers[self.epoch] = self.readers.get(self.epoch, 0) + 1
+            return list(self.segments), self.dead_array, self.epoch
+
+    def release_view(self, epoch: int):
+        """
+        Releases a view taken by `acquire_view`.
+        """
+        with self.lock:
+            self.readers[epoch] -= 1
+            if not self.readers[epoch]:
+                del self.readers[epoch]
+            reclaimed = self.reclaim()
+        self.free(reclaimed)
+
+    @contextmanager
+    def pin(self):
+        """
+        Holds a view while a search runs, so the global IDs it finds can still
+        be turned into IMDb IDs when a merge drops their versions meanwhile.
+        """
+        segments, dead, epoch = self.acquire_view()
+        try:
+            yield segments, dead
+        finally:
+            self.release_view(epoch)
+
+    def retire(self, segments: list, global_ids) -> list:
+        """
+        Schedules the segments a merge replaced and the global IDs of dropped
+        versions to be freed once the views taken before are released.
+        Called with the lock held, see `reclaim` for the result.
+        """
+        self.retired.append((self.epoch, list(segments), list(global_ids)))
+        self.epoch += 1
+        return self.reclaim()
+
+    def reclaim(self) -> list:
+        """
+        Takes the retired entries no view can read anymore, forgetting their
+        global IDs. Called with the lock held, the segments are freed by `free`.
+        """
+        oldest_view = min(self.readers, default=self.epoch)
+        reclaimed = []
+        while self.retired and self.retired[0][0] < oldest_view:
+            _, segments, global_ids = self.retired.pop(0)
+            for global_id in global_ids:
+                self.document_ids.pop(global_id, None)
+            reclaimed.extend(segments)
+        return reclaimed
+
+    @staticmethod
+    def free(segments: list):
+        """
+        Closes retired segments and deletes their directories.
+        """
+        for segment in segments:
+            segment.close()
+            shutil.rmtree(segment.directory)
+
+    def get_memtable_postings(self, field: str, term: str):
+        """
+        Returns a copy of the (global IDs, tfs) of a term in the memtable, or None.
+        """
+        with self.lock:
+            postings = self.memtable.index[field].get_posting_list(term)
+            if not postings:
+                return None
+            global_ids = np.frombuffer(self.memtable_global_ids, dtype=np.uint32)
+            return global_ids[np.frombuffer(postings.doc_ids, dtype=np.uint32)], \
+                np.frombuffer(postings.tfs, dtype=np.uint32).copy()
+
+    def get_field_indexes(self):
+        """
+        Returns {field: SegmentedFieldIndex} for the stars, genres and summaries indexes.
+        """
+        return {field.value: SegmentedFieldIndex(self, field.value) for field in INVERTED_INDEXES}
+
+    def get_document_id(self, global_id: int) -> str:
+        """
+        Returns the IMDb ID of the document version with the given global ID.
+        """
+        return self.document_ids[global_id]
+
+    def get_document_count(self) -> int:
+        """
+        Returns the number of live documents.
+        """
+        return len(self.live_documents)
+
+    def close(self):
+        """
+        Flushes the memtable, stops the background merger, closes the
+        segments and frees the retired ones views still hold.
+        """
+        self.flush()
+        if self.merger is not None:
+            self.merger.stop()
+            self.merger.join()
+        with self.lock:
+            retired = [segment for _, segments, _ in self.retired for segment in segments]
+            self.retired = []
+        for segment in self.segments:
+            segment.close()
+        self.free(retired)
+
+
+class SegmentMerger(threading.Thread):
+    def __init__(self, segmented_index):
+        """
+        A daemon thread that merges the segments of a SegmentedIndex after flushes.
+        """
+        super().__init__(daemon=True)
+        self.segmented_index = segmented_index
+        self.event = threading.Event()
+        self.stopped = False
+
+    def run(self):
+        while True:
+            self.event.wait()
+            self.event.clear()
+            if self.stopped:
+                return
+            self.segmented_index.merge_segments()
+
+    def notify(self):
+        self.event.set()
+
+    def stop(self):
+        self.stopped = True
+        self.event.set()
@@ -0,0 +1,72 @@
+import json
+import os
+import tempfile
+
+from .document_lengths_index import DocumentLengthsIndex
+from .document_norms_index import DocumentNormsIndex
+from .index import Index, INVERTED_INDEXES
+from .indexes_enum import Indexes, Index_formats
+from .metadata_index import Metadata_index
+from .tiered_index import Tiered_index
+
+# tmpfs backed on Linux, files there are shared memory
+SHARED_MEMORY_PATH = '/dev/shm'
+
+
+def get_shared_index_path(name: str = 'mir_indexes') -> str:
+    """
+    Returns the directory to publish the shared indexes in: a directory in
+    shared memory if the host has one, in the temporary directory otherwise.
+
+    Parameters
+    ----------
+    name : str
+        The name of the directory.
+    """
+    root = SHARED_MEMORY_PATH if os.path.isdir(SHARED_MEMORY_PATH) else tempfile.gettempdir()
+    return os.path.join(root, name, '')
+
+
+def publish_indexes(index: Index, path: str, index_format: Index_formats = Index_formats.BINARY):
+    """
+    Writes everything a worker `SearchEngine` reads, in formats it can
+    memory-map instead of loading.
+
+    The loader process calls this once. Workers then create
+    `SearchEngine(path, index_format)` and map the same files read-only: the
+    field indexes, the doc table, the document lengths and norms are shared through
+    the page cache, so adding a worker does not add a copy of them. Only the
+    metadata, and the tiered indexes if unsafe ranking is used, are
+    still parsed by each worker. The score bounds top-k searches prune with
+    are written with the norms.
+
+    Parameters
+    ----------
+    index : Index
+        The index to publish.
+    path : str
+        The directory to write the indexes in, e.g. `get_shared_index_path()`.
+    index_format : Index_formats
+        The format of the stars, genres and summaries indexes, BINARY or COMPRESSED.
+    """
+    if index_format not in (Index_formats.BINARY, Index_formats.COMPRESSED):
+        raise ValueError(f'The {index_format.name.lower()} format can not be memory-mapped')
+    if not os.path.exists(path):
+        os.makedirs(path)
+
+    for field in INVERTED_INDEXES:
+        index.store_index(path, field.value, index_format)
+    for field in index.positional_fields:
+        index.store_index(path, field, Index_formats.POSITIONAL)
+    DocumentLengthsIndex(path, index, Index_formats.BINARY)
+    DocumentNormsIndex(path, index, Index_formats.BINARY)
+    Metadata_index(path, index).store_metadata_index(path)
+    Tiered_index(path, index)
+
+
+if __name__ == '__main__':
+    with open('../IMDB_crawledP.json') as f:
+        data = json.load(f)
+    shared_index_path = get_shared_index_path()
+    publish_indexes(Index(list(data.values()), [Indexes.SUMMARIES]), shared_index_path)
+    print(f'Indexes published in {shared_index_path}')
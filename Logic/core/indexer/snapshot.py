@@ -0,0 +1,97 @@
+import json
+import os
+import shutil
+
+from .index import Index
+from .indexes_enum import Index_formats
+from .shared_index import publish_indexes
+
+MANIFEST = 'manifest.json'
+
+
+def read_manifest(root: str) -> dict:
+    """
+    Reads the manifest of a versioned index directory.
+
+    Returns
+    -------
+    dict
+        {'current': name of the current snapshot or None, 'snapshots': {name:
+        {'index_format': ..., 'positional': ...}}, 'next_version': int}
+    """
+    manifest_path = os.path.join(root, MANIFEST)
+    if not os.path.exists(manifest_path):
+        return {'current': None, 'snapshots': {}, 'next_version': 0}
+    with open(manifest_path) as file:
+        return json.load(file)
+
+
+def store_manifest(root: str, manifest: dict):
+    """
+    Atomically replaces the manifest, so readers see either the old or the new one.
+    """
+    temporary_path = os.path.join(root, MANIFEST + '.tmp')
+    with open(temporary_path, 'w') as file:
+        json.dump(manifest, file)
+    os.replace(temporary_path, os.path.join(root, MANIFEST))
+
+
+def get_snapshot_path(root: str, name: str) -> str:
+    return os.path.join(root, name, '')
+
+
+def publish_snapshot(root: str, index: Index, index_format: Index_formats = Index_formats.BINARY) -> str:
+    """
+    Writes an index as a new snapshot of a versioned index directory and
+    makes it the current one.
+
+    The snapshot is written in its own directory with `publish_indexes`, and
+    only then the manifest is switched to it, so a reader never sees a half
+    written snapshot. Snapshots are immutable once published.
+
+    Parameters
+    ----------
+    root : str
+        The versioned index directory.
+    index : Index
+        The index to publish.
+    index_format : Index_formats
+        The format of the stars, genres and summaries indexes, BINARY or COMPRESSED.
+
+    Returns
+    -------
+    str
+        The name of the new snapshot.
+    """
+    if not os.path.exists(root):
+        os.makedirs(root)
+    manifest = read_manifest(root)
+    name = f'v{manifest["next_version"]:06d}'
+    publish_indexes(index, get_snapshot_path(root, name), index_format)
+
+    manifest['snapshots'][name] = {
+        'index_format': index_format.value,
+        'positional': bool(index.positional_fields),
+    }
+    manifest['current'] = name
+    manifest['next_version'] += 1
+    store_manifest(root, manifest)
+    return name
+
+
+def prune_snapshots(root: str, keep: int = 2):
+    """
+    Deletes all but the `keep` newest snapshots, the current one being always kept.
+
+    Processes still reading a deleted snapshot keep their mapped files on
+    POSIX systems, but can not open new files of it, so keep enough
+    snapshots for the readers to switch first.
+    """
+    manifest = read_manifest(root)
+    names = sorted(manifest['snapshots'])
+    removed = [name for name in names[:max(len(names) - keep, 0)] if name != manifest['current']]
+    for name in removed:
+        del manifest['snapshots'][name]
+    store_manifest(root, manifest)
+    for name in removed:
+        shutil.rmtree(get_snapshot_path(root, name), ignore_errors=True)
@@ -0,0 +1,305 @@
+from array import array
+from bisect import bisect_left
+from collections.abc import Mapping
+
+# terms per front-coded block, the first term of a block is stored whole
+BLOCK_SIZE = 16
+
+
+def write_varint(buffer: bytearray, value: int):
+    """
+    Appends a variable-byte encoded unsigned int, in the layout of `encode_varbyte`.
+    """
+    while value >= 0x80:
+        buffer.append(value & 0x7f)
+        value >>= 7
+    buffer.append(value | 0x80)
+
+
+def read_varint(buffer, position: int):
+    """
+    Reads a variable-byte encoded unsigned int.
+
+    Returns
+    -------
+    tuple
+        (value, position after the value)
+    """
+    value, shift = 0, 0
+    while True:
+        byte = buffer[position]
+        position += 1
+        value |= (byte & 0x7f) << shift
+        if byte & 0x80:
+            return value, position
+        shift += 7
+
+
+class TermDictionary:
+    def __init__(self, block_offsets, blob, number_of_terms: int):
+        """
+        A sorted, front-coded term dictionary.
+
+        The terms, in ascending UTF-8 byte order, are split into blocks of
+        BLOCK_SIZE. The first term of a block is stored whole, the others as
+        the length of the prefix they share with the previous term and the
+        rest of their bytes. A term is found by binary searching the first
+        terms of the blocks and decoding one block. The ordinal of a term,
+        its position in the dictionary, indexes the posting storage.
+
+        Parameters
+        ----------
+        block_offsets : array
+            The byte offset of every block in the blob, and the end of the blob.
+        blob : buffer
+            The front-coded blocks.
+        number_of_terms : int
+            The number of terms.
+        """
+        self.block_offsets = block_offsets
+        self.blob = blob
+        self.number_of_terms = number_of_terms
+        self.number_of_blocks = self.get_number_of_blocks(number_of_terms)
+
+    @staticmethod
+    def get_number_of_blocks(number_of_terms: int) -> int:
+        return (number_of_terms + BLOCK_SIZE - 1) // BLOCK_SIZE
+
+    @staticmethod
+    def encode(encoded_terms: list):
+        """
+        Front codes UTF-8 encoded terms given in ascending order.
+
+        Returns
+        -------
+        tuple
+            (block offsets, blob) as bytes.
+        """
+        block_offsets = array('Q')
+        blob = bytearray()
+        previous = b''
+        for ordinal, term in enumerate(encoded_terms):
+            if ordinal % BLOCK_SIZE == 0:
+                block_offsets.append(len(blob))
+                write_varint(blob, len(term))
+                blob += term
+            else:
+                shared = 0
+                limit = min(len(term), len(previous))
+                while shared < limit and term[shared] == previous[shared]:
+                    shared += 1
+                write_varint(blob, shared)
+                write_varint(blob, len(term) - shared)
+                blob += term[shared:]
+            previous = term
+        block_offsets.append(len(blob))
+        return block_offsets.tobytes(), bytes(blob)
+
+    @classmethod
+    def from_terms(cls, terms):
+        """
+        Builds a term dictionary in memory from terms in any order.
+        """
+        encoded_terms = sorted(term.encode('utf-8') for term in terms)
+        block_offsets, blob = cls.encode(encoded_terms)
+        return cls(memoryview(block_offsets).cast('Q'), blob, len(encoded_terms))
+
+    def get_first_term(self, block: int) -> bytes:
+        position = self.block_offsets[block]
+        length, position = read_varint(self.blob, position)
+        return bytes(self.blob[position:position + length])
+
+    def decode_block(self, block: int) -> list:
+        """
+        Returns the UTF-8 encoded terms of a block.
+        """
+        position, end = self.block_offsets[block], self.block_offsets[block + 1]
+        length, position = read_varint(self.blob, position)
+        term = bytes(self.blob[position:position + length])
+        position += length
+        terms = [term]
+        while position < end and len(terms) < BLOCK_SIZE:
+            shared, position = read_varint(self.blob, position)
+            length, position = read_varint(self.blob, position)
+            term = term[:shared] + bytes(self.blob[position:position + length])
+            position += length
+            terms.append(term)
+        return terms
+
+    def find_block(self, encoded_term: bytes) -> int:
+        """
+        Returns the last block whose first term is not greater than a UTF-8
+        encoded term, 0 if there is none.
+        """
+        low, high = 0, self.number_of_blocks
+        while low < high:
+            middle = (low + high) // 2
+            if self.get_first_term(middle) <= encoded_term:
+                low = middle + 1
+            else:
+                high = middle
+        return max(low - 1, 0)
+
+    def lower_bound(self, encoded_term: bytes) -> int:
+        """
+        Returns the ordinal of the first term not smaller than a UTF-8 encoded term.
+        """
+        if not self.number_of_terms:
+            return 0
+        block = self.find_block(encoded_term)
+        return block * BLOCK_SIZE + bisect_left(self.decode_block(block), encoded_term)
+
+    def find(self, term: str) -> int:
+        """
+        Returns the ordinal of a term, or -1 if it is not in the dictionary.
+        """
+        if not self.number_of_terms:
+            return -1
+        encoded_term = term.encode('utf-8')
+        block = self.find_block(encoded_term)
+        terms = self.decode_block(block)
+        offset = bisect_left(terms, encoded_term)
+        if offset < len(terms) and terms[offset] == encoded_term:
+            return block * BLOCK_SIZE + offset
+        return -1
+
+    def find_prefix(self, prefix: str) -> range:
+        """
+        Returns the ordinals of the terms starting with a prefix.
+        """
+        encoded_prefix = prefix.encode('utf-8')
+        start = self.lower_bound(encoded_prefix)
+        # the smallest byte string greater than every string with the prefix
+        successor = encoded_prefix.rstrip(b'\xff')
+        if not successor:
+            return range(start, self.number_of_terms)
+        successor = successor[:-1] + bytes([successor[-1] + 1])
+        return range(start, self.lower_bound(successor))
+
+    def find_range(self, low: str = None, high: str = None) -> range:
+        """
+        Returns the ordinals of the terms t with low <= t < high, a missing bound being open.
+        """
+        start = 0 if low is None else self.lower_bound(low.encode('utf-8'))
+        end = self.number_of_terms if high is None else self.lower_bound(high.encode('utf-8'))
+        return range(start, max(start, end))
+
+    def get_encoded_term(self, ordinal: int) -> bytes:
+        block, offset = divmod(ordinal, BLOCK_SIZE)
+        return self.decode_block(block)[offset]
+
+    def get_term(self, ordinal: int) -> str:
+        """
+        Returns the term with the given ordinal.
+        """
+        return str(self.get_encoded_term(ordinal), 'utf-8')
+
+    def get_terms(self, ordinals: range) -> list:
+        """
+        Returns the terms of a range of ordinals, decoding each block once.
+        """
+        terms = []
+        for block in range(ordinals.start // BLOCK_SIZE, (ordinals.stop + BLOCK_SIZE - 1) // BLOCK_SIZE):
+            first_ordinal = block * BLOCK_SIZE
+            for offset, term in enumerate(self.decode_block(block)):
+                if ordinals.start <= first_ordinal + offset < ordinals.stop:
+                    terms.append(str(term, 'utf-8'))
+        return terms
+
+    def __iter__(self):
+        for block in range(self.number_of_blocks):
+            for term in self.decode_block(block):
+                yield str(term, 'utf-8')
+
+    def __len__(self):
+        return self.number_of_terms
+
+
+class TermDictionaryIndex(Mapping):
+    def __init__(self, term_dictionary: TermDictionary, posting_lists: list):
+        """
+        A read-only inverted index of one field whose vocabulary is a
+        front-coded `TermDictionary` instead of the keys of a dict.
+
+        It has the lookup API of `FieldIndex`, plus prefix and range lookups.
+
+        Parameters
+        ----------
+        term_dictionary : TermDictionary
+            The terms of the index.
+        posting_lists : list
+            The posting list of every term, indexed by the term ordinals.
+        """
+        self.term_dictionary = term_dictionary
+        self.posting_lists = posting_lists
+
+    @classmethod
+    def from_field_index(cls, field_index: dict):
+        """
+        Freezes a {term: PostingList} index.
+        """
+        terms = sorted(field_index, key=lambda term: term.encode('utf-8'))
+        return cls(TermDictionary.from_terms(terms), [field_index[term] for term in terms])
+
+    def find_term(self, term: str) -> int:
+        """
+        Returns the ordinal of a term, or -1 if it is not in the index.
+        """
+        return self.term_dictionary.find(term)
+
+    def get_posting_list(self, term: str):
+        """
+        Returns the posting list of a term, or None if it is not in the index.
+        """
+        ordinal = self.term_dictionary.find(term)
+        return self.posting_lists[ordinal] if ordinal >= 0 else None
+
+    def get_posting_lists(self, terms) -> dict:
+        """
+        Looks up many terms at once.
+
+        Returns
+        -------
+        dict
+            {term: PostingList} for the terms that are in the index.
+        """
+        posting_lists = {}
+        for term in terms:
+            postings = self.get_posting_list(term)
+            if postings is not None:
+                posting_lists[term] = postings
+        return posting_lists
+
+    def get_document_frequency(self, term: str) -> int:
+        """
+        Returns the number of documents containing a term.
+        """
+        postings = self.get_posting_list(term)
+        return 0 if postings is None else len(postings)
+
+    def get_terms_with_prefix(self, prefix: str) -> list:
+        """
+        Returns the terms starting with a prefix, in ascending order.
+        """
+        return self.term_dictionary.get_terms(self.term_dictionary.find_prefix(prefix))
+
+    def get_terms_in_range(self, low: str = None, high: str = None) -> list:
+        """
+        Returns the terms t with low <= t < high in ascending order, a missing bound being open.
+        """
+        return self.term_dictionary.get_terms(self.term_dictionary.find_range(low, high))
+
+    def __getitem__(self, term):
+        postings = self.get_posting_list(term)
+        if postings is None:
+            raise KeyError(term)
+        return postings
+
+    def __contains__(self, term):
+        return isinstance(term, str) and self.term_dictionary.find(term) >= 0
+
+    def __iter__(self):
+        return iter(self.term_dictionary)
+
+    def __len__(self):
+        return len(self.term_dictionary)
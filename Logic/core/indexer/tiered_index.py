@@ -1,46 +1,121 @@
-from indexes_enum import Indexes, Index_types
-from index_reader import Index_reader
+from array import array
+from functools import partial
+
+from .indexes_enum import Indexes, Index_types
+from .index_reader import Index_reader
+from .posting_list import PostingList
 import json
 
+TIERS = ("first_tier", "second_tier", "third_tier")
+
+
+def split_into_tiers(postings, get_document_length, first_tier_size: int, second_tier_size: int):
+    """
+    Splits the postings of a term into tiers by impact.
+
+    The impact of a posting is its tf divided by the length of the field in
+    the document, the length normalized tf that the vector space model and
+    BM25 both favour. The first tier holds the first_tier_size postings
+    with the highest impact, the champion list of the term, the second
+    tier the next second_tier_size ones and the third tier the rest. Ties
+    go to the smaller document ID.
+
+    Parameters
+    ----------
+    postings : iterable
+        The (document, tf) pairs of the term.
+    get_document_length : callable
+        Returns the length of the field in a document.
+    first_tier_size : int
+        The number of postings of the first tier.
+    second_tier_size : int
+        The number of postings of the second tier.
+
+    Returns
+    -------
+    tuple
+        The (document, tf) pairs of every tier, sorted by document.
+    """
+    ranked = sorted(postings, key=lambda posting: (-posting[1] / max(get_document_length(posting[0]), 1), posting[0]))
+    second_tier_end = first_tier_size + second_tier_size
+    bounds = (0, first_tier_size, second_tier_end, max(len(ranked), second_tier_end))
+    return tuple(sorted(ranked[start:end]) for start, end in zip(bounds, bounds[1:]))
+
 
 class Tiered_index:
-    def __init__(self, path="./indexer/"):
+    def __init__(self, path="./indexer/", index=None):
         """
         Initializes the Tiered_index.
 
+        Every term keeps its postings in three tiers by impact, see
+        `split_into_tiers`, so that unsafe ranking can take its documents
+        from the champion postings of the query terms first and only go
+        down the tiers while it has too few of them.
+
+        The thresholds are tier sizes: the number of postings of every term
+        in the first and second tiers, ranked by the impact tf / field length.
+        They used to be cut-offs on the document frequency that put the whole
+        posting list of a term in a single tier, so thresholds tuned for the
+        old tiers have to be revisited.
+
         Parameters
         ----------
         path : str
             The path to the indexes.
+        index : Index
+            An index built in this process. The tiers are then built from its
+            posting lists and document lengths, and the index keeps the tiers
+            up to date when documents are added or removed.
         """
 
-        self.index = {
-            Indexes.STARS: Index_reader(path, index_name=Indexes.STARS).index,
-            Indexes.GENRES: Index_reader(path, index_name=Indexes.GENRES).index,
-            Indexes.SUMMARIES: Index_reader(path, index_name=Indexes.SUMMARIES).index,
+        if index is not None:
+            self.index = {
+                Indexes.STARS: index.index[Indexes.STARS.value],
+                Indexes.GENRES: index.index[Indexes.GENRES.value],
+                Indexes.SUMMARIES: index.index[Indexes.SUMMARIES.value],
+            }
+            self.document_lengths = {index_name: index.document_lengths[index_name.value] for index_name in self.index}
+            self.doc_id_map = index.doc_id_map
+            index.tiered_index = self
+        else:
+            self.index = {
+                Indexes.STARS: Index_reader(path, index_name=Indexes.STARS).index,
+                Indexes.GENRES: Index_reader(path, index_name=Indexes.GENRES).index,
+                Indexes.SUMMARIES: Index_reader(path, index_name=Indexes.SUMMARIES).index,
+            }
+            self.document_lengths = {index_name: Index_reader(path, index_name, Index_types.DOCUMENT_LENGTH).index
+                                     for index_name in self.index}
+            self.doc_id_map = None
+        # the number of postings of every term in the first and second
+        # tiers, feel free to change the thresholds
+        self.thresholds = {
+            Indexes.STARS: (10, 50),
+            Indexes.SUMMARIES: (50, 250),
+            Indexes.GENRES: (100, 1000),
         }
-        # feel free to change the thresholds
+        # {index_name: {term: postings}} of the terms whose postings changed
+        # since their tiers were last split
+        self.changed_terms = {index_name: {} for index_name in self.thresholds}
         self.tiered_index = {
-            Indexes.STARS: self.convert_to_tiered_index(3, 2, Indexes.STARS),
-            Indexes.SUMMARIES: self.convert_to_tiered_index(10, 5, Indexes.SUMMARIES),
-            Indexes.GENRES: self.convert_to_tiered_index(1, 0, Indexes.GENRES)
+            index_name: self.convert_to_tiered_index(*thresholds, index_name)
+            for index_name, thresholds in self.thresholds.items()
         }
         self.store_tiered_index(path, Indexes.STARS)
         self.store_tiered_index(path, Indexes.SUMMARIES)
         self.store_tiered_index(path, Indexes.GENRES)
 
     def convert_to_tiered_index(
-            self, first_tier_threshold: int, second_tier_threshold: int, index_name
+            self, first_tier_size: int, second_tier_size: int, index_name
     ):
         """
         Convert the current index to a tiered index.
 
         Parameters
         ----------
-        first_tier_threshold : int
-            The threshold for the first tier
-        second_tier_threshold : int
-            The threshold for the second tier
+        first_tier_size : int
+            The number of postings of every term in the first tier
+        second_tier_size : int
+            The number of postings of every term in the second tier
         index_name : Indexes
             The name of the index to read.
 
@@ -53,36 +128,89 @@ class Tiered_index:
                 "second_tier": dict,
                 "third_tier": dict
             }
+            each mapping the terms to their postings in the tier. A term
+            with no postings in a tier is left out of it.
         """
         if index_name not in self.index:
             raise ValueError("Invalid index type")
 
-        current_index = self.index[index_name]
-        first_tier = {}
-        second_tier = {}
-        third_tier = {}
+        tiered_index = {tier: {} for tier in TIERS}
+        for term, postings in self.index[index_name].items():
+            self.add_term(tiered_index, index_name, term, postings, first_tier_size, second_tier_size)
+        return tiered_index
+
+    def get_document_length(self, index_name, document):
+        """
+        Returns the length of a field in a document, given by internal ID if the tiers are built from an index.
+        """
+        if self.doc_id_map is not None:
+            document = self.doc_id_map.get_document_id(document)
+        return self.document_lengths[index_name].get(document, 0)
 
-        for term, postings in current_index.items():
-            if len(postings) >= first_tier_threshold:
-                first_tier[term] = postings
-            elif len(postings) >= second_tier_threshold:
-                second_tier[term] = postings
+    def add_term(self, tiered_index, index_name, term, postings, first_tier_size, second_tier_size):
+        """
+        Splits the postings of a term into the tiers of tiered_index.
+        """
+        tiers = split_into_tiers(postings.items(), partial(self.get_document_length, index_name),
+                                 first_tier_size, second_tier_size)
+        for tier, tier_postings in zip(TIERS, tiers):
+            if not tier_postings:
+                continue
+            if isinstance(postings, PostingList):
+                tier_postings = PostingList(array('I', [doc for doc, _ in tier_postings]),
+                                            array('I', [tf for _, tf in tier_postings]))
             else:
-                third_tier[term] = postings
+                tier_postings = dict(tier_postings)
+            tiered_index[tier][term] = tier_postings
 
-        return {
-            "first_tier": first_tier,
-            "second_tier": second_tier,
-            "third_tier": third_tier,
-        }
+    def update_term(self, index_name, term, postings):
+        """
+        Marks a term whose posting list changed, so that its postings are
+        split again the next time the tiers are used. Splitting is deferred
+        as a frequent term changes with many of the documents added.
+
+        Parameters
+        ----------
+        index_name : Indexes
+            The name of the index of the term.
+        term : str
+            The term.
+        postings : PostingList
+            The current posting list of the term, or None if it was removed.
+        """
+        self.changed_terms[index_name][term] = postings
+
+    def get_tiers(self, index_name):
+        """
+        Returns the tiers of an index, after splitting the postings of the terms that changed.
+
+        Returns
+        -------
+        dict
+            {tier: {term: postings}}, see `convert_to_tiered_index`.
+        """
+        tiered_index = self.tiered_index[index_name]
+        changed_terms, self.changed_terms[index_name] = self.changed_terms[index_name], {}
+        for term, postings in changed_terms.items():
+            for tier in tiered_index.values():
+                tier.pop(term, None)
+            if postings:
+                self.add_term(tiered_index, index_name, term, postings, *self.thresholds[index_name])
+        return tiered_index
 
     def store_tiered_index(self, path, index_name):
         """
         Stores the tiered index to a file.
         """
+        tiered_index = self.get_tiers(index_name)
+        if self.doc_id_map is not None:
+            tiered_index = {
+                tier: {term: postings.to_dict(self.doc_id_map) for term, postings in terms.items()}
+                for tier, terms in tiered_index.items()
+            }
         path = path + index_name.value + "_" + Index_types.TIERED.value + ".json"
         with open(path, "w") as file:
-            json.dump(self.tiered_index[index_name], file, indent=4)
+            json.dump(tiered_index, file, indent=4)
 
 
 if __name__ == "__main__":
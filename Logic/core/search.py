@@ -1,44 +1,460 @@
-from indexer.index_reader import Index_reader
-from indexer.indexes_enum import Indexes, Index_types
-from scorer import Scorer
+import os
+import threading
+from contextlib import contextmanager, nullcontext
+from functools import partial
+
+import numpy as np
+
+from .indexer.index import INVERTED_INDEXES
+from .indexer.index_reader import Index_reader
+from .indexer.lazy_index import LazyIndexes
+from .indexer.metadata_index import read_metadata_index
+from .indexer.indexes_enum import Indexes, Index_types, Index_formats
+from .indexer.collection_statistics import DEFAULT_IDF_VARIANT, FieldStatistics, get_statistics_path
+from .indexer.binary_index import DocumentLengths
+from .indexer.doc_id_map import DocIdMap, MappedDocIdMap
+from .indexer.impact_index import IMPACT_WEIGHTINGS, ImpactIndex
+from .indexer.posting_list import posting_lists_from_json
+from .indexer.positional_index import match_phrase
+from .indexer.score_bounds import ScoreBounds, get_score_bounds_path
+from .indexer.snapshot import read_manifest, get_snapshot_path
+from .indexer.term_dictionary import TermDictionaryIndex
+from .indexer.tiered_index import TIERS
+from .utility.query_cache import QueryCache
+from .utility.scorer import Scorer
+from .utility.top_k import FieldScores
 from nltk.stem import WordNetLemmatizer, PorterStemmer
 from nltk.tokenize import word_tokenize
 
 
 class SearchEngine:
-    def __init__(self):
+    def __init__(self, path='./indexer/indexes/', index_format=Index_formats.JSON, segmented_index=None,
+                 positional=False, bm25_parameters=None, query_cache=None, posting_cache=None):
         """
         Initializes the search engine.
 
+        Parameters
+        ----------
+        path : str
+            The path to the indexes.
+        index_format : Index_formats
+            The format of the stars, genres and summaries indexes. With the
+            binary format they are memory-mapped instead of parsed on startup,
+            the compressed format additionally gap encodes their posting lists.
+        segmented_index : SegmentedIndex
+            If given, the stars, genres and summaries indexes are searched
+            across its live segments and memtable instead of being read from
+            `path`, so newly added documents are found without a rebuild.
+            Only the safe vector space ranking is available then.
+        positional : bool
+            If True, the summaries index is read from its positional file, so
+            phrase and proximity queries can be answered.
+        bm25_parameters : dict
+            {field: (k1, b)} of the OkapiBM25 and BM25F methods, keyed by the
+            field names. The other fields use `Scorer.K1` and `Scorer.B`.
+        query_cache : QueryCache
+            If given, the results of searches with max_results are cached in
+            it, see `get_cache_version`. Several search engines can share it.
+        posting_cache : PostingCache
+            If given, the term lookups and decoded posting lists of binary,
+            compressed and positional indexes are cached in it, see `CachedIndex`.
+
+        No index is read here. The index, tiered index and document lengths
+        of a field are read the first time a query gives the field a
+        non-zero weight, or ahead of time through `warmup`.
+        """
+
+        self.path = path
+        self.index_format = index_format
+        self.segmented_index = segmented_index
+        self.positional = positional
+        self.bm25_parameters = {} if bm25_parameters is None else bm25_parameters
+        self.query_cache = query_cache
+        self.posting_cache = posting_cache
+        # every index is loaded the first time a query needs it, the load
+        # times of the components are collected in load_times
+        self.lock = threading.RLock()
+        self.load_times = {}
+        # every group of lazily loaded indexes, which close unmaps
+        self.lazy_indexes = []
+        if segmented_index is not None:
+            self.document_indexes = segmented_index.get_field_indexes()
+            self.components = self.create_lazy_indexes('engine', {'doc_id_map': lambda: segmented_index,
+                                                                  'metadata': lambda: None})
+            self.tiered_index = self.document_lengths_index = self.document_norms_index = None
+            self.statistics = self.score_bounds = self.impact_indexes = None
+            return
+
+        self.document_indexes = self.create_lazy_indexes(
+            'index', {field.value: partial(self.load_field_index, field) for field in INVERTED_INDEXES})
+        self.tiered_index = self.create_lazy_indexes(
+            'tiered', {field: partial(self.read_tiered_index, field) for field in INVERTED_INDEXES})
+        self.document_lengths_index = self.create_lazy_indexes(
+            'document_length', {field: partial(self.read_document_lengths, field) for field in INVERTED_INDEXES})
+        self.document_norms_index = self.create_lazy_indexes(
+            'document_norm', {field: partial(self.read_document_norms, field) for field in INVERTED_INDEXES})
+        self.statistics = self.create_lazy_indexes(
+            'statistics', {field: partial(self.read_statistics, field) for field in INVERTED_INDEXES})
+        self.score_bounds = self.create_lazy_indexes(
+            'score_bounds', {field: partial(self.read_score_bounds, field) for field in INVERTED_INDEXES})
+        # {weighting: impact-ordered postings of every field}, only built for score-at-a-time search
+        self.impact_indexes = {weighting: self.create_lazy_indexes(
+            f'impact_{weighting}', {field: partial(self.read_impact_index, field, weighting)
+                                    for field in INVERTED_INDEXES}) for weighting in IMPACT_WEIGHTINGS}
+        self.components = self.create_lazy_indexes('engine', {
+            'doc_id_map': self.load_doc_id_map,
+            'metadata': partial(read_metadata_index, self.path),
+        })
+
+    @property
+    def doc_id_map(self):
+        return self.components['doc_id_map']
+
+    @property
+    def metadata_index(self):
+        return self.components['metadata']
+
+    def create_lazy_indexes(self, name, loaders):
+        lazy_indexes = LazyIndexes(loaders, name, self.lock, self.load_times)
+        self.lazy_indexes.append(lazy_indexes)
+        return lazy_indexes
+
+    def read_index(self, index_name, index_type):
+        return Index_reader(self.path, index_name, index_type).index
+
+    def map_to_internal_ids(self, field, values):
+        """
+        Turns the {IMDb ID: value} of a JSON index of a field into an array by
+        internal ID. The field index is read first, as reading it interns the
+        IMDb IDs of the documents of the field.
+        """
+        self.document_indexes[field.value]
+        array = np.zeros(len(self.doc_id_map))
+        for document_id, value in values.items():
+            internal_id = self.doc_id_map.get_internal_id(document_id)
+            if internal_id is not None:
+                array[internal_id] = value
+        return array
+
+    def read_document_lengths(self, field):
         """
-        path = './indexer/indexes/'
+        Reads the document lengths of a field as an array by internal ID,
+        memory-mapping them if the indexes are binary and the lengths were
+        stored in the binary format too.
+        """
+        if self.index_format != Index_formats.JSON and os.path.exists(
+                f'{self.path}{field.value}_{Index_types.DOCUMENT_LENGTH.value}.{Index_formats.BINARY.value}'):
+            return Index_reader(self.path, field, Index_types.DOCUMENT_LENGTH, Index_formats.BINARY).index
+        return self.map_to_internal_ids(field, self.read_index(field, Index_types.DOCUMENT_LENGTH))
+
+    def read_document_norms(self, field):
+        """
+        Reads the document norms of a field as {scheme: array of norms by
+        internal ID}, memory-mapping them if they were stored in the binary
+        format. Returns None for indexes stored without norms.
+        """
+        file_path = f'{self.path}{field.value}_{Index_types.DOCUMENT_NORM.value}.'
+        if self.index_format != Index_formats.JSON and os.path.exists(file_path + Index_formats.BINARY.value):
+            return Index_reader(self.path, field, Index_types.DOCUMENT_NORM, Index_formats.BINARY).index
+        if not os.path.exists(file_path + Index_formats.JSON.value):
+            return None
+        return {scheme: self.map_to_internal_ids(field, norms)
+                for scheme, norms in self.read_index(field, Index_types.DOCUMENT_NORM).items()}
+
+    def read_tiered_index(self, field):
+        """
+        Reads the tiers of a field, see `Tiered_index`, with the postings
+        keyed by internal ID. The field index is read first, as reading it
+        interns the IMDb IDs of the documents of the field.
+
+        Returns
+        -------
+        dict
+            {tier: TermDictionaryIndex}
+        """
+        self.document_indexes[field.value]
+        tiered_index = self.read_index(field, Index_types.TIERED)
+        return {tier: TermDictionaryIndex.from_field_index(
+            posting_lists_from_json(tiered_index.get(tier, {}), self.doc_id_map)) for tier in TIERS}
+
+    def read_statistics(self, field):
+        """
+        Reads the collection statistics of a field, see `FieldStatistics`.
+        The statistics of binary indexes are looked up by the term ordinals
+        of the field index. Returns None for indexes stored without statistics.
+        """
+        if not os.path.exists(get_statistics_path(self.path, field.value, self.index_format)):
+            return None
+        if self.index_format == Index_formats.JSON:
+            return FieldStatistics.read(self.path, field.value)
+        return FieldStatistics.read(self.path, field.value, self.index_format,
+                                    self.document_indexes[field.value].find_term)
 
-        self.document_indexes = {
-            Indexes.STARS.value: Index_reader(path, Indexes.STARS).get_index(),
-            Indexes.GENRES.value: Index_reader(path, Indexes.GENRES).get_index(),
-            Indexes.SUMMARIES.value: Index_reader(path, Indexes.SUMMARIES).get_index()
-        }
-        self.tiered_index = {
-            Indexes.STARS: Index_reader(path, Indexes.STARS, Index_types.TIERED).get_index(),
-            Indexes.GENRES: Index_reader(path, Indexes.GENRES, Index_types.TIERED).get_index(),
-            Indexes.SUMMARIES: Index_reader(path, Indexes.SUMMARIES, Index_types.TIERED).get_index()
-        }
-        self.document_lengths_index = {
-            Indexes.STARS: Index_reader(path, Indexes.STARS, Index_types.DOCUMENT_LENGTH).get_index(),
-            Indexes.GENRES: Index_reader(path, Indexes.GENRES, Index_types.DOCUMENT_LENGTH).get_index(),
-            Indexes.SUMMARIES: Index_reader(path, Indexes.SUMMARIES, Index_types.DOCUMENT_LENGTH).get_index()
-        }
-        self.metadata_index = Index_reader(path, Indexes.DOCUMENTS, Index_types.METADATA).get_index()
+    def read_score_bounds(self, field):
+        """
+        Reads the score bounds of a field stored with the document norms, see
+        `ScoreBounds`. Returns None for indexes stored without them, which
+        are then scored without pruning.
+        """
+        file_path = get_score_bounds_path(self.path, field.value)
+        if not os.path.exists(file_path):
+            return None
+        if self.index_format == Index_formats.JSON and 'document_ids' not in self.metadata_index:
+            # the internal IDs of the bounds are not known
+            return None
+        return ScoreBounds.read(file_path, self.document_indexes[field.value].find_term)
 
-    def search(self, query, method, weights, safe_ranking=True, max_results=10):
+    def read_impact_index(self, field, weighting):
+        """
+        Builds the impact-ordered postings of a field, see `ImpactIndex`.
+        The impacts are the contributions of the postings to the scores of a
+        single term query: the Okapi BM25 scores with the (k1, b) of the
+        field, or the ltc document weights, normalized by the stored
+        document norms if there are any.
+
+        Parameters
+        ----------
+        field : Indexes
+            The field.
+        weighting : str
+            One of IMPACT_WEIGHTINGS.
+        """
+        field_index = self.document_indexes[field.value]
+        weights = {field: 1}
+        scorer = Scorer(self.get_field_indexes(weights), self.get_document_count(), self.get_field_statistics(weights),
+                        self.get_idf_variant())
+        scorer.where = field.value
+        query_tfs = dict.fromkeys(field_index, 1)
+        if weighting == 'OkapiBM25':
+            average_document_field_length, document_lengths = self.get_field_lengths(weights)
+            k1, b = self.bm25_parameters.get(field.value, (Scorer.K1, Scorer.B))
+            term_weighers = scorer.get_okapi_bm25_weighers(query_tfs, average_document_field_length[field.value],
+                                                           document_lengths[field.value], k1, b)
+        else:
+            term_weighers = scorer.get_vector_space_model_weighers(query_tfs, 'ltc', 'nnn',
+                                                                   self.get_document_norms(weights).get(field.value))
+        impacts = {term: (doc_ids, weigh(0, len(doc_ids))) for term, doc_ids, weigh, _ in term_weighers}
+        no_impacts = (np.zeros(0, dtype=np.int64), np.zeros(0))
+        return ImpactIndex.from_impacts((impacts.get(term, no_impacts) for term in query_tfs),
+                                        field_index.find_term)
+
+    def load_field_index(self, field):
+        """
+        Reads the stars, genres or summaries index.
+        """
+        index_format = self.index_format
+        if field == Indexes.SUMMARIES and self.positional:
+            index_format = Index_formats.POSITIONAL
+        field_index = Index_reader(self.path, field, index_format=index_format,
+                                   posting_cache=self.posting_cache).index
+        if isinstance(field_index, dict):
+            field_index = TermDictionaryIndex.from_field_index(posting_lists_from_json(field_index, self.doc_id_map))
+        return field_index
+
+    def load_doc_id_map(self):
+        """
+        Creates the map between the IMDb IDs and the internal IDs the indexes use.
+
+        Documents are scored by their internal integer IDs and only mapped
+        back to IMDb IDs when the results are returned. The binary formats
+        store the map in every file and it is used from the mapped file. JSON
+        indexes start from the IDs the norms and score bounds were stored by,
+        kept in the metadata, and add the documents they lack while they are read.
+        """
+        if self.positional:
+            return MappedDocIdMap(self.document_indexes[Indexes.SUMMARIES.value])
+        if self.index_format in (Index_formats.BINARY, Index_formats.COMPRESSED):
+            # all the files have the same doc table, prefer one that is mapped already
+            loaded_fields = [field for field in self.document_indexes if self.document_indexes.is_loaded(field)]
+            field = loaded_fields[0] if loaded_fields else Indexes.GENRES.value
+            return MappedDocIdMap(self.document_indexes[field])
+        return DocIdMap(self.metadata_index.get('document_ids', ()))
+
+    def warmup(self, fields=None, background=True, impact_weightings=()):
+        """
+        Loads the indexes of some fields before the first query needs them.
+
+        Parameters
+        ----------
+        fields : List[Indexes]
+            The fields to load the index, tiered index and document lengths
+            of, all of them by default. The document ID map and the metadata
+            are loaded as well. A segmented index has nothing to load.
+        impact_weightings : tuple
+            The weightings of IMPACT_WEIGHTINGS to build the impact-ordered
+            postings of the fields for, none by default.
+        background : bool
+            If True, the indexes are loaded in a daemon thread, which is
+            returned so that it can be joined.
+
+        Returns
+        -------
+        threading.Thread
+            The loading thread, None if background is False.
+        """
+        fields = INVERTED_INDEXES if fields is None else fields
+
+        def load():
+            self.components.load()
+            if self.segmented_index is None:
+                self.document_indexes.load([field.value for field in fields])
+                self.tiered_index.load(fields)
+                self.document_lengths_index.load(fields)
+                self.document_norms_index.load(fields)
+                self.statistics.load(fields)
+                self.score_bounds.load(fields)
+                for weighting in impact_weightings:
+                    self.impact_indexes[weighting].load(fields)
+
+        if not background:
+            load()
+            return None
+        thread = threading.Thread(target=load, daemon=True)
+        thread.start()
+        return thread
+
+    def close(self):
+        """
+        Unmaps the loaded indexes. The search engine must not be used afterwards.
+        A segmented index is left open, it belongs to the caller.
+        """
+        if self.segmented_index is None:
+            for lazy_indexes in self.lazy_indexes:
+                lazy_indexes.close()
+
+    def get_load_times(self):
+        """
+        Returns how long each loaded component took to load, in seconds.
+
+        Returns
+        -------
+        dict
+            {component: seconds}, e.g. {'index:summaries': 0.8, 'tiered:stars': 0.1}.
+            A component that needs another one includes its load time.
+        """
+        return dict(self.load_times)
+
+    def get_field_indexes(self, weights):
+        """
+        Returns the indexes of the fields with non-zero weight, loading them if needed.
+
+        Returns
+        -------
+        dict
+            {field: index} keyed by the field names.
+        """
+        return {field.value: self.document_indexes[field.value] for field, weight in weights.items() if weight}
+
+    def get_field_statistics(self, weights):
+        """
+        Returns the collection statistics of the fields with non-zero weight.
+
+        Returns
+        -------
+        dict
+            {field: FieldStatistics} keyed by the field names. Fields without
+            stored statistics, and the fields of a segmented index, are left out.
+        """
+        if self.segmented_index is not None:
+            return {}
+        statistics = {field.value: self.statistics[field] for field, weight in weights.items() if weight}
+        return {field: field_statistics for field, field_statistics in statistics.items() if field_statistics is not None}
+
+    def get_field_lengths(self, weights):
+        """
+        Returns the average and document lengths of the fields with non-zero weight, which BM25 needs.
+
+        Returns
+        -------
+        tuple
+            ({field: average length}, {field: array of lengths by internal ID})
+            keyed by the field names.
+        """
+        if self.segmented_index is not None:
+            raise ValueError('BM25 needs the document lengths of stored indexes')
+        fields = [field for field, weight in weights.items() if weight]
+        average_lengths = self.metadata_index['average_document_length']
+        document_lengths = {}
+        for field in fields:
+            lengths = self.document_lengths_index[field]
+            document_lengths[field.value] = lengths.as_array() if isinstance(lengths, DocumentLengths) else lengths
+        return {field.value: average_lengths[field.value] for field in fields}, document_lengths
+
+    def get_idf_variant(self):
+        """
+        Returns the idf of the SMART t weighting the indexes were built with,
+        see `Index`. Segmented indexes, and indexes stored before the
+        variant was recorded, use DEFAULT_IDF_VARIANT.
+        """
+        if self.segmented_index is not None:
+            return DEFAULT_IDF_VARIANT
+        return self.metadata_index.get('idf_variant', DEFAULT_IDF_VARIANT)
+
+    def get_document_norms(self, weights):
+        """
+        Returns the document norms of the fields with non-zero weight, see `read_document_norms`.
+
+        Returns
+        -------
+        dict
+            {field: {scheme: array of norms}} keyed by the field names, empty
+            for a segmented index, whose norms change with every update.
+        """
+        if self.segmented_index is not None:
+            return {}
+        document_norms = {field.value: self.document_norms_index[field] for field, weight in weights.items() if weight}
+        return {field: norms for field, norms in document_norms.items() if norms is not None}
+
+    def get_score_bounds(self, weights):
+        """
+        Returns the score bounds of the fields with non-zero weight, see `read_score_bounds`.
+
+        Returns
+        -------
+        dict
+            {field: ScoreBounds} keyed by the field names.
+        """
+        return {field.value: self.score_bounds[field] for field, weight in weights.items() if weight}
+
+    def get_cache_namespace(self):
+        """
+        Returns what cached results depend on besides the search: the indexes
+        read and the settings of the search engine, so that search engines
+        sharing a query cache, e.g. over several snapshots or with other BM25
+        parameters, do not serve each other's results.
+        """
+        indexes = self.path if self.segmented_index is None else self.segmented_index.path
+        bm25_parameters = tuple(sorted((getattr(field, 'value', field), tuple(parameters))
+                                       for field, parameters in self.bm25_parameters.items()))
+        posting_cache = None if self.posting_cache is None else (self.posting_cache.max_bytes,
+                                                                 self.posting_cache.max_protected_bytes)
+        return indexes, self.index_format.value, self.positional, bm25_parameters, posting_cache
+
+    def get_cache_version(self):
+        """
+        Returns the version of the indexes cached results are valid for: the
+        modification time of the metadata index, which every store of the
+        indexes rewrites, or the generation of a segmented index, which every
+        update increments.
+        """
+        if self.segmented_index is not None:
+            return self.segmented_index.generation
+        try:
+            return os.stat(f'{self.path}{Indexes.DOCUMENTS.value}_{Index_types.METADATA.value}.json').st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def search(self, query, method, weights, safe_ranking=True, max_results=10, phrase=None, slop=0,
+               conjunctive=False, required=None, excluded=None, pruning=None, postings_budget=None):
         """
         searches for the query in the indexes.
 
         Parameters
         ----------
         query : str
-            The query to search for.
-        method : str ((n|l)(n|t)(n|c).(n|l)(n|t)(n|c)) | OkapiBM25
+            The query to search for. A term ending with '*' (e.g. spide*)
+            matches every term with that prefix.
+        method : str ((n|l)(n|t)(n|c).(n|l)(n|t)(n|c)) | OkapiBM25 | BM25F
             The method to use for searching.
         weights: dict
             The weights of the fields.
@@ -47,50 +463,353 @@ class SearchEngine:
             If False, the search engine will search in tiered index.
         max_results : int
             The maximum number of results to return. If None, all results are returned.
+        phrase : List[str]
+            If given, only the documents whose summaries contain these terms as
+            a phrase are returned. Needs a positional search engine.
+        slop : int
+            0 for an exact phrase, otherwise the terms of the phrase may occur
+            in any order within len(phrase) + slop tokens.
+        conjunctive : bool
+            If True, only the documents containing every query term are
+            returned (AND), otherwise any of them (OR). Wildcard terms stay
+            optional.
+        required : List[str]
+            Terms every returned document has to contain, on top of the query.
+            They are scored like query terms.
+        excluded : List[str]
+            Terms no returned document may contain.
+        pruning : str
+            Experimental. maxscore, wand or bmw (Block-Max WAND): with safe
+            ranking and max_results, the best documents are found document
+            at a time, skipping the ones that can not make it, see
+            `find_scores_with_pruning`. The results are the ones of
+            exhaustive scoring. None, the default, scores every matching
+            document with array operations, which is much faster on the
+            collections measured so far, as the pruned methods visit the
+            documents, and skip the blocks, one at a time in Python.
+        postings_budget : int
+            If given, the documents are scored score at a time from
+            impact-ordered postings instead, processing at most this many
+            postings, see `find_scores_with_impacts`. The scores are
+            approximate, safe_ranking and pruning are then ignored.
 
         Returns
         -------
         list
-            A list of tuples containing the document IDs and their scores sorted by their scores.
+            (document ID, score) of the best documents, best first. Documents
+            with the same score are ordered by IMDb ID. With a query
+            cache, the results of a search with max_results are cached.
+        """
+        if self.query_cache is None or max_results is None:
+            with self.pin_segments():
+                return self.find_results(query, method, weights, safe_ranking, max_results, phrase, slop,
+                                         conjunctive, required, excluded, pruning, postings_budget)
+        # the version is read first, results computed during an update are then not served after it
+        version = self.get_cache_version()
+        key = QueryCache.get_key(query, method, weights, safe_ranking, max_results, self.get_cache_namespace(),
+                                 phrase=phrase, slop=slop, conjunctive=conjunctive, required=required,
+                                 excluded=excluded, pruning=pruning, postings_budget=postings_budget)
+        results = self.query_cache.get(key, version)
+        if results is None:
+            with self.pin_segments():
+                results = self.find_results(query, method, weights, safe_ranking, max_results, phrase, slop,
+                                            conjunctive, required, excluded, pruning, postings_budget)
+            self.query_cache.put(key, results, version)
+        return results
+
+    def pin_segments(self):
+        """
+        Holds a view of the segmented index while a search runs, so that the
+        documents it finds keep their IMDb IDs when a merge drops them meanwhile.
         """
+        if self.segmented_index is None:
+            return nullcontext()
+        return self.segmented_index.pin()
 
-        scores = {}
-        if safe_ranking:
-            self.find_scores_with_safe_ranking(query, method, weights, scores)
+    def find_results(self, query, method, weights, safe_ranking=True, max_results=10, phrase=None, slop=0,
+                     conjunctive=False, required=None, excluded=None, pruning=None, postings_budget=None):
+        """
+        Searches without the query cache, see `search`. Searches of a segmented
+        index racing merges have to run within `pin_segments`.
+        """
+        required = list(required or [])
+        if conjunctive:
+            required += [term for term in query if not term.endswith('*')]
+        query = self.expand_wildcards(query, weights)
+        documents = None
+        if required or excluded:
+            query = query + [term for term in required if term not in query]
+            documents = self.find_boolean_documents(query, required, excluded or [], weights)
+
+        if postings_budget is not None:
+            # boolean and phrase filters need the scores of every scored document
+            scores = self.find_scores_with_impacts(query, method, weights, postings_budget,
+                                                   None if documents is not None or phrase else max_results)
+            if documents is not None:
+                scores = scores.keep(documents)
+        elif safe_ranking:
+            scores = None
+            # boolean and phrase filters need the scores of every matching document
+            if pruning and max_results is not None and documents is None and not phrase:
+                scores = self.find_scores_with_pruning(query, method, weights, max_results, pruning)
+            if scores is None:
+                scores = self.find_scores_with_safe_ranking(query, method, weights, documents)
         else:
-            self.find_scores_with_unsafe_ranking(query, method, weights, max_results, scores)
+            scores = self.find_scores_with_unsafe_ranking(query, method, weights, max_results)
+            if documents is not None:
+                scores = scores.keep(documents)
 
-        
+        if phrase:
+            scores = scores.keep(self.find_phrase(phrase, slop))
 
-        
+        # the weights of BM25F are applied to the tfs of the fields
+        final_scores = self.aggregate_scores({'bm25f': 1} if method == "BM25F" else weights, scores)
+        return self.select_top_k(scores.documents, final_scores, max_results)
 
-        result = sorted(scores, key=lambda x: x[1], reverse=True)
-        if max_results is not None:
-            result = result[:max_results]
+    def expand_wildcards(self, query, weights=None):
+        """
+        Replaces the query terms ending with '*' by the terms of any field
+        that start with the rest of them, found with prefix lookups in the
+        term dictionaries.
 
-        return result
+        Parameters
+        ----------
+        query : List[str]
+            The query terms.
+        weights : dict
+            If given, only the fields with non-zero weight are searched.
 
-    def aggregate_scores(self, weights, scores, final_scores):
+        Returns
+        -------
+        List[str]
+            The query without wildcards.
+        """
+        expanded_query = []
+        for term in query:
+            if not term.endswith('*'):
+                expanded_query.append(term)
+                continue
+            expansions = set()
+            field_indexes = self.document_indexes if weights is None else self.get_field_indexes(weights)
+            for field_index in field_indexes.values():
+                expansions.update(field_index.get_terms_with_prefix(term[:-1]))
+            expanded_query.extend(sorted(expansions))
+        return expanded_query
+
+    def find_boolean_documents(self, query, required, excluded, weights=None):
+        """
+        Finds the documents matching a boolean query, see `Scorer.get_boolean_list_of_documents`.
+        If weights are given, only the fields with non-zero weight are searched.
+
+        Returns
+        -------
+        list
+            The sorted internal IDs of the matching documents.
+        """
+        field_indexes = self.document_indexes if weights is None else self.get_field_indexes(weights)
+        scorer = Scorer(field_indexes, self.get_document_count())
+        return scorer.get_boolean_list_of_documents(query, required, excluded)
+
+    def find_phrase(self, phrase, slop=0):
+        """
+        Finds the documents whose summaries contain a phrase.
+
+        Parameters
+        ----------
+        phrase : List[str]
+            The preprocessed terms of the phrase, in order.
+        slop : int
+            See `match_phrase`.
+
+        Returns
+        -------
+        numpy.ndarray
+            The sorted internal IDs of the matching documents.
+        """
+        if not self.positional:
+            raise ValueError('Phrase queries need the positional summaries index')
+        summaries_index = self.document_indexes[Indexes.SUMMARIES.value]
+        return match_phrase([summaries_index.get_posting_list(term) for term in phrase], slop)
+
+    def get_term_positions(self, document_id, terms):
+        """
+        Returns the token offsets of terms in the summaries of a document,
+        which the snippet generator can use instead of scanning the text.
+
+        Parameters
+        ----------
+        document_id : str
+            The IMDb ID of the document.
+        terms : List[str]
+            The preprocessed terms.
+
+        Returns
+        -------
+        dict
+            {term: list of token offsets} for the terms in the summaries.
+        """
+        if not self.positional:
+            raise ValueError('Term positions need the positional summaries index')
+        internal_id = self.doc_id_map.get_internal_id(document_id)
+        term_positions = {}
+        if internal_id is None:
+            return term_positions
+        for term, postings in self.document_indexes[Indexes.SUMMARIES.value].get_posting_lists(terms).items():
+            positions = postings.get_positions(internal_id)
+            if positions is not None:
+                term_positions[term] = [int(position) for position in positions]
+        return term_positions
+
+    def get_document_count(self):
+        """
+        Returns the number of documents in the index.
+        """
+        if self.segmented_index is not None:
+            return self.segmented_index.get_document_count()
+        return self.metadata_index["document_count"]
+
+    def aggregate_scores(self, weights, scores):
         """
         Aggregates the scores of the fields.
 
+        The weighted field scores are summed in the order of the weights,
+        as `Scorer.compute_top_k` sums them, so pruned and exhaustive
+        searches give the same scores.
+
         Parameters
         ----------
         weights : dict
+            The weights of the fields, keyed by Indexes or by the field names.
+        scores : FieldScores
+            The scores of the documents in every field.
+
+        Returns
+        -------
+        numpy.ndarray
+            The final score of every document, in the order of scores.documents.
+        """
+        return scores.aggregate({getattr(field, 'value', field): weight for field, weight in weights.items()})
+
+    def select_top_k(self, doc_ids, values, max_results=None):
+        """
+        Selects the best documents without sorting all of them.
+
+        The score of the max_results-th document is found with a partial
+        sort, and only the documents scoring at least as much are sorted,
+        by score and then by IMDb ID. Ties are thus broken the same way by
+        every search engine: the internal IDs of JSON indexes depend on
+        the order the fields were loaded in.
+
+        Parameters
+        ----------
+        doc_ids : numpy.ndarray
+            The internal IDs of the documents.
+        values : numpy.ndarray
+            Their final scores, see `aggregate_scores`.
+        max_results : int
+            The number of documents to return, all of them if None.
+
+        Returns
+        -------
+        list
+            (IMDb ID, score) of the best documents, best first.
+        """
+        if max_results is not None and max_results < len(values):
+            if max_results <= 0:
+                return []
+            threshold = -np.partition(-values, max_results - 1)[max_results - 1]
+            candidates = np.flatnonzero(values >= threshold)
+            doc_ids, values = doc_ids[candidates], values[candidates]
+        document_ids = np.array([self.doc_id_map.get_document_id(doc_id) for doc_id in doc_ids.tolist()], dtype=str)
+        order = np.lexsort((document_ids, -values))[:max_results]
+        return list(zip(document_ids[order].tolist(), values[order].tolist()))
+
+    def find_scores_with_unsafe_ranking(self, query, method, weights, max_results):
+        """
+        Finds the scores of the documents using the unsafe ranking method using the tiered index.
+
+        The candidate documents are taken from the tiers of the query terms
+        one tier at a time, starting with their champion postings, and the
+        next tier is only read while there are fewer than max_results
+        candidates. Only the candidates are scored, as in safe ranking, so
+        their scores are exact but a document outside the tiers that were
+        read is never found.
+
+        Parameters
+        ----------
+        query: List[str]
+            The query to be scored
+        method : str ((n|l)(n|t)(n|c).(n|l)(n|t)(n|c)) | OkapiBM25 | BM25F
+            The method to use for searching.
+        weights: dict
             The weights of the fields.
-        scores : dict
-            The scores of the fields.
-        final_scores : dict
-            The final scores of the documents.
+        max_results : int
+            The maximum number of results to return.
+
+        Returns
+        -------
+        FieldScores
+            The scores of the candidates in every field.
         """
-        for doc_id in scores:
-            final_scores[doc_id] = 0  # Initialize the final score for the document
+        if self.tiered_index is None:
+            raise ValueError('Unsafe ranking needs the tiered indexes of stored indexes')
+        documents = set()
+        for tier in TIERS:
             for field, weight in weights.items():
-                final_scores[doc_id] += scores[doc_id][field] * weight  # Aggregate the weighted scores
+                if not weight:
+                    continue
+                for postings in self.tiered_index[field][tier].get_posting_lists(query).values():
+                    documents.update(postings.keys())
+            if max_results is not None and len(documents) >= max_results:
+                break
+        return self.find_scores_with_safe_ranking(query, method, weights, sorted(documents))
 
-    def find_scores_with_unsafe_ranking(self, query, method, weights, max_results, scores):
+    def find_scores_with_impacts(self, query, method, weights, postings_budget, max_results=None):
         """
-        Finds the scores of the documents using the unsafe ranking method using the tiered index.
+        Finds approximate scores of the documents score at a time, see
+        `Scorer.compute_scores_at_a_time`. The segments of postings with the
+        highest weighted impacts are processed first, and scoring stops
+        after postings_budget postings, so the cost of a query is bounded
+        whatever the lengths of its posting lists.
+
+        Parameters
+        ----------
+        query: List[str]
+            The query to be scored
+        method : str ltc.(n|l)(n|t)(n|c) | OkapiBM25
+            The method to use for searching, whose document weighting must be
+            one of IMPACT_WEIGHTINGS.
+        weights: dict
+            The weights of the fields.
+        postings_budget : int
+            The number of postings to process.
+        max_results : int
+            If given, only the scores of the best documents are kept, see
+            `Scorer.compute_scores_at_a_time`.
+
+        Returns
+        -------
+        FieldScores
+            The scores of the scored documents in every field.
+        """
+        if self.impact_indexes is None:
+            raise ValueError('Impact-ordered search needs the posting lists of stored indexes')
+        weighting = method if method == 'OkapiBM25' else method.split('.')[0]
+        if weighting not in IMPACT_WEIGHTINGS:
+            raise ValueError(f'Impact-ordered search supports the weightings {IMPACT_WEIGHTINGS}, not {method}')
+        field_weights = {field.value: weight for field, weight in weights.items() if weight}
+        impact_indexes = {field.value: self.impact_indexes[weighting][field] for field, weight in weights.items()
+                          if weight}
+        scorer = Scorer(self.get_field_indexes(weights), self.get_document_count(),
+                        self.get_field_statistics(weights), self.get_idf_variant())
+        return scorer.compute_scores_at_a_time(query, method, field_weights, impact_indexes, postings_budget,
+                                               max_results)
+
+    def find_scores_with_pruning(self, query, method, weights, max_results, pruning='maxscore'):
+        """
+        Finds the scores of the max_results best documents with dynamic
+        pruning, see `Scorer.compute_top_k`. Pruning is experimental, the
+        evaluators are not vectorized, see `search`.
 
         Parameters
         ----------
@@ -101,19 +820,34 @@ class SearchEngine:
         weights: dict
             The weights of the fields.
         max_results : int
-            The maximum number of results to return.
-        scores : dict
-            The scores of the documents.
+            The number of documents to score.
+        pruning : str
+            maxscore, wand or bmw.
+
+        Returns
+        -------
+        FieldScores
+            The scores of the best documents in every field, or None if the
+            query can not be evaluated with pruning: BM25F, which does not
+            add up per term scores, a segmented index, which has no score
+            bounds, negative weights and cosine normalization without stored
+            document norms.
         """
-        for field in weights:
-            for tier in ["first_tier", "second_tier", "third_tier"]:
-                # Retrieve scores for each tier and update the scores dictionary
-                tier_scores = self.tiered_index[field][tier]
-                for doc_id, score in tier_scores.items():
-                    scores.setdefault(doc_id, {}).setdefault(field, 0)
-                    scores[doc_id][field] += score
+        if method == "BM25F" or self.segmented_index is not None or any(weight < 0 for weight in weights.values()):
+            return None
+        field_weights = {field.value: weight for field, weight in weights.items() if weight}
+        scorer = Scorer(self.get_field_indexes(weights), self.get_document_count(),
+                        self.get_field_statistics(weights), self.get_idf_variant())
+        average_document_field_length, document_lengths = (self.get_field_lengths(weights)
+                                                           if method == "OkapiBM25" else (None, None))
+        top_k = scorer.compute_top_k(query, method, field_weights, max_results, self.get_score_bounds(weights),
+                                     pruning, self.get_document_norms(weights), average_document_field_length,
+                                     document_lengths, self.bm25_parameters)
+        if top_k is None:
+            return None
+        return FieldScores.from_documents(top_k)
 
-    def find_scores_with_safe_ranking(self, query, method, weights, scores):
+    def find_scores_with_safe_ranking(self, query, method, weights, documents=None):
         """
         Finds the scores of the documents using the safe ranking method.
 
@@ -121,31 +855,207 @@ class SearchEngine:
         ----------
         query: List[str]
             The query to be scored
-        method : str ((n|l)(n|t)(n|c).(n|l)(n|t)(n|c)) | OkapiBM25
+        method : str ((n|l)(n|t)(n|c).(n|l)(n|t)(n|c)) | OkapiBM25 | BM25F
             The method to use for searching.
         weights: dict
             The weights of the fields.
-        scores : dict
-            The scores of the documents.
+        documents : list
+            The internal IDs of the documents to score, by default the ones
+            containing any of the query terms.
+
+        Returns
+        -------
+        FieldScores
+            The scores of the documents in every field, which `aggregate_scores` weighs.
         """
 
-        scorer = Scorer(self.document_indexes, self.metadata_index["document_count"])
+        # only the fields with non-zero weight are read and scored
+        scorer = Scorer(self.get_field_indexes(weights), self.get_document_count(),
+                        self.get_field_statistics(weights), self.get_idf_variant())
 
         # Compute scores for each document based on the method
+        if method == "BM25F":
+            # the weights are applied to the tfs of the fields, not to the scores
+            average_document_field_length, document_lengths = self.get_field_lengths(weights)
+            field_weights = {field.value: weight for field, weight in weights.items() if weight}
+            return scorer.compute_scores_with_bm25f(query, field_weights, average_document_field_length,
+                                                    document_lengths, documents, self.bm25_parameters)
         if method == "OkapiBM25":
             # Use Okapi BM25 scoring method
-            average_document_field_length = self.calculate_average_document_field_length()
-            document_lengths = self.document_lengths_index
-            scores.update(scorer.compute_scores_with_okapi_bm25(query, average_document_field_length, document_lengths))
-        else:
-            # Use Vector Space Model scoring method
-            scores.update(scorer.compute_scores_with_vector_space_model(query, method))
+            average_document_field_length, document_lengths = self.get_field_lengths(weights)
+            return scorer.compute_scores_with_okapi_bm25(query, average_document_field_length, document_lengths,
+                                                         documents, self.bm25_parameters)
+        # Use Vector Space Model scoring method
+        return scorer.compute_scores_with_vector_space_model(query, method, documents,
+                                                             self.get_document_norms(weights))
 
-        # Apply weights to the scores
 
-        for doc_id in scores:
-            for field, weight in weights.items():
-                scores[doc_id][field.value] *= weight
+class Snapshot:
+    def __init__(self, version, engine):
+        """
+        A search engine over one snapshot of a versioned index directory,
+        with a count of the queries reading it.
+
+        Once retired, i.e. replaced by a newer snapshot, its indexes are
+        closed as soon as its last reader releases it.
+
+        Parameters
+        ----------
+        version : str
+            The name of the snapshot in the manifest.
+        engine : SearchEngine
+            The search engine reading the snapshot.
+        """
+        self.version = version
+        self.engine = engine
+        self.readers = 0
+        self.retired = False
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        with self.lock:
+            if self.retired and not self.readers:
+                raise RuntimeError(f'Snapshot {self.version} is closed')
+            self.readers += 1
+
+    def release(self):
+        with self.lock:
+            self.readers -= 1
+            close = self.retired and not self.readers
+        if close:
+            self.engine.close()
+
+    def retire(self):
+        with self.lock:
+            self.retired = True
+            close = not self.readers
+        if close:
+            self.engine.close()
+
+
+class SnapshotSearchEngine:
+    def __init__(self, root, warmup_fields=None, query_cache=None):
+        """
+        A search engine over a versioned index directory, see `publish_snapshot`,
+        that can switch to a newly published snapshot without a restart.
+
+        Every query reads the snapshot that was current when it started.
+        `reload` loads and warms up the new snapshot next to the current
+        one, then swaps them atomically: queries already running finish on
+        the old snapshot, which is closed when the last of them is done, and
+        the next ones read the new snapshot.
+
+        Parameters
+        ----------
+        root : str
+            The versioned index directory.
+        warmup_fields : List[Indexes]
+            The fields whose indexes are loaded before a snapshot is switched
+            to, all of them by default. The other fields are loaded by the
+            first query needing them.
+        query_cache : QueryCache
+            If given, the search engines of the snapshots cache their results
+            in it. It is invalidated whenever the snapshot is switched.
+        """
+        self.root = root
+        self.warmup_fields = warmup_fields
+        self.query_cache = query_cache
+        self.lock = threading.Lock()
+        self.reload_lock = threading.Lock()
+        self.snapshot = None
+        self.reload(background=False)
+        if self.snapshot is None:
+            raise FileNotFoundError(f'No snapshot published in {root}')
+
+    def load_snapshot(self, version, description):
+        """
+        Creates the search engine of a snapshot and loads its indexes.
+        """
+        engine = SearchEngine(get_snapshot_path(self.root, version), Index_formats(description['index_format']),
+                              positional=description['positional'], query_cache=self.query_cache)
+        engine.warmup(self.warmup_fields, background=False)
+        return Snapshot(version, engine)
+
+    def reload(self, background=True):
+        """
+        Switches to the current snapshot of the manifest if it is not the one being read.
+
+        Parameters
+        ----------
+        background : bool
+            If True, the snapshot is loaded in a daemon thread, which is
+            returned so that it can be joined, and queries keep reading the
+            previous snapshot in the meantime.
+
+        Returns
+        -------
+        threading.Thread
+            The loading thread, None if background is False.
+        """
+
+        def load():
+            # a single reload at a time, so that snapshots are switched in order
+            with self.reload_lock:
+                manifest = read_manifest(self.root)
+                version = manifest['current']
+                if version is None or (self.snapshot is not None and self.snapshot.version == version):
+                    return
+                snapshot = self.load_snapshot(version, manifest['snapshots'][version])
+                with self.lock:
+                    previous, self.snapshot = self.snapshot, snapshot
+                if self.query_cache is not None:
+                    # the results of the previous snapshot can not be served anymore, free them
+                    self.query_cache.invalidate()
+                if previous is not None:
+                    previous.retire()
+
+        if not background:
+            load()
+            return None
+        thread = threading.Thread(target=load, daemon=True)
+        thread.start()
+        return thread
+
+    def get_version(self):
+        """
+        Returns the name of the snapshot new queries read.
+        """
+        return self.snapshot.version
+
+    @contextmanager
+    def acquire(self):
+        """
+        Pins the current snapshot for the duration of a with block, e.g. to
+        search and then read term positions from the same snapshot.
+
+        Yields
+        ------
+        SearchEngine
+            The search engine of the snapshot.
+        """
+        with self.lock:
+            snapshot = self.snapshot
+            snapshot.acquire()
+        try:
+            yield snapshot.engine
+        finally:
+            snapshot.release()
+
+    def search(self, *args, **kwargs):
+        """
+        Searches the current snapshot, see `SearchEngine.search`.
+        """
+        with self.acquire() as engine:
+            return engine.search(*args, **kwargs)
+
+    def close(self):
+        """
+        Closes the current snapshot once its last query is done.
+        """
+        with self.lock:
+            snapshot, self.snapshot = self.snapshot, None
+        if snapshot is not None:
+            snapshot.retire()
 
 
 def merge_scores(self, scores1, scores2):
@@ -0,0 +1,103 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class QueryCache:
+    def __init__(self, max_entries: int = 1024, ttl: float = 300.0, clock=time.monotonic):
+        """
+        A cache of search results with LRU eviction and a time to live.
+
+        Every entry is stored with the version of the index it was computed
+        on, see `SearchEngine.get_cache_version`, and is only returned to a
+        lookup of the same version, so results of a replaced snapshot or of
+        a segmented index that changed since are never served.
+
+        Parameters
+        ----------
+        max_entries : int
+            The number of results kept, the least recently used ones are
+            evicted beyond it.
+        ttl : float
+            The number of seconds results are kept for, None to keep them
+            until they are evicted.
+        clock : callable
+            Returns the current time in seconds.
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.clock = clock
+        # key -> (expiry time, version, results), least recently used first
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @staticmethod
+    def get_key(query, method, weights, safe_ranking, max_results, namespace=(), **options) -> tuple:
+        """
+        Returns the key of a search, see `SearchEngine.search` for the parameters.
+
+        The query terms and the field weights are kept in their order, which
+        is the order their scores are summed in. The namespace tells apart
+        the search engines sharing the cache, see `SearchEngine.get_cache_namespace`.
+        """
+        field_weights = tuple((getattr(field, 'value', field), weight) for field, weight in weights.items())
+        return (namespace, tuple(query), method, field_weights, bool(safe_ranking), max_results,
+                tuple(sorted((name, tuple(value) if isinstance(value, list) else value)
+                             for name, value in options.items())))
+
+    def get(self, key, version=None):
+        """
+        Returns the cached results of a search, None if they are not cached,
+        expired or were computed on another version of the index.
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                expiry, entry_version, results = entry
+                if entry_version == version and (expiry is None or self.clock() < expiry):
+                    self.entries.move_to_end(key)
+                    self.hits += 1
+                    return list(results)
+                del self.entries[key]
+                self.expirations += 1
+            self.misses += 1
+            return None
+
+    def put(self, key, results: list, version=None):
+        """
+        Caches the results of a search, evicting the least recently used ones if the cache is full.
+        """
+        with self.lock:
+            expiry = None if self.ttl is None else self.clock() + self.ttl
+            self.entries[key] = (expiry, version, tuple(results))
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self):
+        """
+        Drops every cached result, keeping the counters.
+        """
+        with self.lock:
+            self.entries.clear()
+
+    def get_stats(self) -> dict:
+        """
+        Returns the counters of the cache.
+
+        Returns
+        -------
+        dict
+            The hits, misses, evictions (by LRU), expirations (by TTL or
+            version), number of entries and hit rate.
+        """
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions,
+                    'expirations': self.expirations, 'entries': len(self.entries),
+                    'hit_rate': self.hits / lookups if lookups else 0.0}
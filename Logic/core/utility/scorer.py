@@ -1,23 +1,43 @@
 import math
 
+import numpy as np
+
+from ..indexer.collection_statistics import DEFAULT_IDF_VARIANT, compute_idfs
+from .top_k import FieldScores, TermCursor, get_top_k, score_at_a_time
+
 
 class Scorer:
+    # the default Okapi BM25 parameters of every field
+    K1 = 1.5
+    B = 0.75
 
-    def __init__(self, index, number_of_documents):
+    def __init__(self, index, number_of_documents, statistics=None, idf_variant=DEFAULT_IDF_VARIANT):
         """
         Initializes the Scorer.
 
         Parameters
         ----------
         index : dict
-            The index to score the documents with.
+            The index to score the documents with, {field: {term: PostingList}}.
+            Documents are identified by their internal integer IDs. Only the
+            fields in the index are scored.
         number_of_documents : int
             The number of documents in the index.
+        statistics : dict
+            {field: FieldStatistics} to read the idfs from. The idfs of the
+            other fields are computed from the document frequencies of the index.
+        idf_variant : str
+            The idf of the SMART t weighting, see `compute_idfs`. It has to be
+            the one the document norms were computed with, see `Index`.
         """
 
         self.index = index
         self.N = number_of_documents
-        self.wheres = ["summaries", "genres", "stars"]
+        self.statistics = {} if statistics is None else statistics
+        self.idf_variant = idf_variant
+        self.wheres = [where for where in ["summaries", "genres", "stars"] if where in index]
+        # any other field, e.g. directors or title, is scored after them
+        self.wheres += [where for where in index if where not in self.wheres]
         self.where = ""
 
     def get_list_of_documents(self, query):
@@ -31,36 +51,105 @@ class Scorer:
 
         Returns
         -------
-        list
-            A list of documents that contain at least one of the terms in the query.
+        numpy.ndarray
+            The sorted internal IDs of the documents that contain at least one of the terms in the query.
         """
-        list_of_documents = set()
+        list_of_documents = []
+
+        for where in self.wheres:
+            self.where = where
+            for postings in self.index[self.where].get_posting_lists(query).values():
+                if len(postings):
+                    list_of_documents.append(np.asarray(postings.doc_ids, dtype=np.int64))
+        if not list_of_documents:
+            return np.zeros(0, dtype=np.int64)
+        # the doc ids of a posting list are sorted, the last one is the largest
+        found = np.zeros(max(int(doc_ids[-1]) for doc_ids in list_of_documents) + 1, dtype=bool)
+        for doc_ids in list_of_documents:
+            found[doc_ids] = True
+        return np.flatnonzero(found)
+
+    def get_boolean_list_of_documents(self, query, required=(), excluded=()):
+        """
+        Returns the documents matching a boolean query.
 
-        for term in query:
-            for where in self.wheres:
-                self.where = where
-                if term in self.index[self.where]:
-                    list_of_documents.update(self.index[self.where][term].keys())
-        return list(list_of_documents)
+        A document contains a term if any of the fields has it. The required
+        terms are intersected smallest first: the documents of the rarest
+        one are the candidates, which are then looked up in the posting
+        lists of the others with galloping search, so common terms only
+        have a few of their postings touched.
 
-    def get_idf(self, term):
+        Parameters
+        ----------
+        query: List[str]
+            The optional terms. Without required terms a document has to
+            contain at least one of them.
+        required: List[str]
+            The terms every document has to contain.
+        excluded: List[str]
+            The terms no document may contain.
+
+        Returns
+        -------
+        list
+            The sorted internal IDs of the matching documents.
+        """
+        if not required:
+            candidates = self.get_list_of_documents(query).tolist()
+        else:
+            term_postings = sorted((self.get_field_posting_lists(term) for term in set(required)),
+                                   key=lambda posting_lists: sum(len(postings) for postings in posting_lists))
+            candidates = sorted(set().union(*(postings.keys() for postings in term_postings[0])))
+            for posting_lists in term_postings[1:]:
+                candidates = self.filter_documents(candidates, posting_lists, keep=True)
+
+        for term in set(excluded):
+            candidates = self.filter_documents(candidates, self.get_field_posting_lists(term), keep=False)
+        return candidates
+
+    def get_field_posting_lists(self, term):
+        """
+        Returns the posting lists of a term in the fields that have it.
+        """
+        posting_lists = []
+        for where in self.wheres:
+            postings = self.index[where].get_posting_list(term)
+            if postings is not None:
+                posting_lists.append(postings)
+        return posting_lists
+
+    @staticmethod
+    def filter_documents(documents, posting_lists, keep):
         """
-        Returns the inverse document frequency of a term.
+        Keeps (or drops, if keep is False) the sorted documents that are in any of the posting lists.
+        """
+        found = set()
+        for postings in posting_lists:
+            found.update(postings.intersect(documents))
+        return [document_id for document_id in documents if (document_id in found) == keep]
+
+    def get_idf(self, term, variant=None):
+        """
+        Returns the inverse document frequency of a term in the current field.
 
         Parameters
         ----------
         term : str
             The term to get the inverse document frequency for.
+        variant : str
+            The idf formula, see `compute_idfs`, the one of the t weighting by default.
 
         Returns
         -------
         float
             The inverse document frequency of the term.
         """
-        df = len(self.index[self.where][term])
-        if df == 0:
-            return 0
-        return self.N / df
+        variant = self.idf_variant if variant is None else variant
+        statistics = self.statistics.get(self.where)
+        if statistics is not None:
+            return statistics.get_idf(term, variant)
+        df = self.index[self.where].get_document_frequency(term)
+        return float(compute_idfs([df], self.N, variant)[0])
 
     def get_query_tfs(self, query):
         """
@@ -74,13 +163,12 @@ class Scorer:
         Returns
         -------
         dict
-            A dictionary of the term frequencies of the terms in the query.
+            A dictionary of the term frequencies of the terms in the query,
+            in the order the terms first occur.
         """
-
-
-        query_tfs[term] = 0
+        query_tfs = {}
         for term in query:
-            query_tfs[term] = query_tfs[term] + 1
+            query_tfs[term] = query_tfs.get(term, 0) + 1
         return query_tfs
 
     def calculate_tf_idf(self, term_freq, inverse_doc_freq):
@@ -101,7 +189,39 @@ class Scorer:
         """
         return term_freq * inverse_doc_freq
 
-    def compute_scores_with_vector_space_model(self, query, method):
+    @staticmethod
+    def parse_method(method):
+        """
+        Splits a SMART method into its document and query weighting schemes.
+
+        Parameters
+        ----------
+        method : str ((n|l)(n|t)(n|c).(n|l)(n|t)(n|c))
+            The method, e.g. 'lnc.ltc'.
+
+        Returns
+        -------
+        tuple
+            (document scheme, query scheme), e.g. ('lnc', 'ltc').
+        """
+        schemes = method.split('.')
+        if len(schemes) != 2 or any(len(scheme) != 3 or scheme[0] not in 'nl' or scheme[1] not in 'nt'
+                                    or scheme[2] not in 'nc' for scheme in schemes):
+            raise ValueError(f'Unknown method {method}, expected (n|l)(n|t)(n|c).(n|l)(n|t)(n|c)')
+        return schemes[0], schemes[1]
+
+    @staticmethod
+    def get_log_tfs(tfs):
+        """
+        Returns 1 + log(tf) of an array of term frequencies.
+
+        The logarithms are computed with `math.log` on the distinct values,
+        so that they are exactly the ones of the scalar formula.
+        """
+        log_tfs = np.array([0.0] + [1 + math.log(tf) for tf in range(1, int(tfs.max(initial=0)) + 1)])
+        return log_tfs[tfs]
+
+    def compute_scores_with_vector_space_model(self, query, method, documents=None, document_norms=None):
         """
         Compute scores with vector space model.
 
@@ -111,30 +231,356 @@ class Scorer:
             The query to be scored
         method : str ((n|l)(n|t)(n|c).(n|l)(n|t)(n|c))
             The method to use for searching.
+        documents : list
+            The internal IDs of the documents to score, by default the ones
+            containing any of the query terms.
+        document_norms : dict
+            {field: {scheme: array of norms by internal ID}}, see
+            `DocumentNormsIndex`. With them the document vectors are cosine
+            normalized by their full norms, otherwise only over the query terms.
+
+        Returns
+        -------
+        FieldScores
+            The scores of the documents in every field.
+        """
+        document_scheme, query_scheme = self.parse_method(method)
+        query_tfs = self.get_query_tfs(query)
+        if documents is None:
+            documents = self.get_list_of_documents(query)
+        documents = np.asarray(documents, dtype=np.int64)
+
+        field_scores = {}
+        for where in self.wheres:
+            self.where = where
+            field_norms = None if document_norms is None else document_norms.get(where)
+            field_scores[where] = self.get_vector_space_model_scores(query_tfs, documents, document_scheme,
+                                                                     query_scheme, field_norms)
+        return FieldScores(documents, field_scores)
+
+    def compute_top_k(self, query, method, weights, max_results, score_bounds, pruning='maxscore',
+                      document_norms=None, average_document_field_length=None, document_lengths=None,
+                      parameters=None):
+        """
+        Finds the best documents document at a time with dynamic pruning,
+        skipping the documents that can not enter the top max_results.
+
+        The contributions of the postings are the ones the term-at-a-time
+        methods add up, and they are summed in the same order, so the
+        documents and their scores are exactly the best max_results of
+        exhaustive scoring. The documents tying with the max_results-th
+        one are all returned, for the caller to break the ties.
+
+        Parameters
+        ----------
+        query: List[str]
+            The query to be scored
+        method : str ((n|l)(n|t)(n|c).(n|l)(n|t)(n|c)) | OkapiBM25
+            The method to use for searching.
+        weights : dict
+            {field: weight} of the fields, which must not be negative.
+        max_results : int
+            The number of documents to return.
+        score_bounds : dict
+            {field: ScoreBounds}
+        pruning : str
+            maxscore, wand or bmw (Block-Max WAND), see `top_k`.
+        document_norms : dict
+            {field: {scheme: array of norms by internal ID}}, needed for cosine normalization.
+        average_document_field_length, document_lengths, parameters : dict
+            The field lengths and (k1, b) of Okapi BM25, see `compute_scores_with_okapi_bm25`.
+
+        Returns
+        -------
+        list
+            [(internal document ID, {field: score})] of the best documents
+            and the ones tying with them, best first, or None if the method
+            can not be evaluated with
+            pruning: cosine normalization without document norms, and BM25
+            parameters for which the block bounds do not hold.
+        """
+        query_tfs = self.get_query_tfs(query)
+        document_norms = {} if document_norms is None else document_norms
+        parameters = {} if parameters is None else parameters
+        cursors = []
+        for where in self.wheres:
+            self.where = where
+            field_bounds = score_bounds.get(where)
+            if field_bounds is None or weights[where] < 0:
+                return None
+            if method == 'OkapiBM25':
+                k1, b = parameters.get(where, (self.K1, self.B))
+                if k1 < 0 or not 0 <= b <= 1:
+                    return None
+                term_weighers = self.get_okapi_bm25_weighers(query_tfs, average_document_field_length[where],
+                                                             document_lengths[where], k1, b)
+            else:
+                document_scheme, query_scheme = self.parse_method(method)
+                if document_scheme[2] == 'c' and document_norms.get(where) is None:
+                    return None
+                term_weighers = self.get_vector_space_model_weighers(query_tfs, document_scheme, query_scheme,
+                                                                     document_norms.get(where))
+            for term, doc_ids, weigh, bound in term_weighers:
+                blocks = field_bounds.get_blocks(term)
+                cursors.append(TermCursor(len(cursors), where, weights[where], doc_ids, weigh, field_bounds.block_size,
+                                          field_bounds.last_doc_ids[blocks].tolist(),
+                                          (weights[where] * bound(field_bounds, blocks)).tolist()))
+
+        if max_results <= 0:
+            return []
+        return [(document_id, field_scores)
+                for document_id, _, field_scores in get_top_k(cursors, max_results, weights, pruning)]
+
+    def compute_scores_at_a_time(self, query, method, weights, impact_indexes, postings_budget=None,
+                                 max_results=None):
+        """
+        Computes approximate scores score at a time over impact-ordered
+        postings, see `ImpactIndex` and `top_k.score_at_a_time`.
+
+        The contribution of a posting is its quantized impact times the
+        weight of the query term: the query tf for Okapi BM25, whose impacts
+        are the scores of a query tf of 1, and the query weight under the
+        query scheme for the ltc document scheme. Only the highest impact
+        postings are processed when the budget runs out.
+
+        Parameters
+        ----------
+        query: List[str]
+            The query to be scored
+        method : str ltc.(n|l)(n|t)(n|c) | OkapiBM25
+            The method the impacts were computed for.
+        weights : dict
+            {field: weight} of the fields, the order segments of the same
+            weighted contribution are processed in.
+        impact_indexes : dict
+            {field: ImpactIndex}
+        postings_budget : int
+            The number of postings to process, all of them if None.
+        max_results : int
+            If given, only the documents scoring at least as much as the
+            max_results-th best one are returned, all the scored ones otherwise.
+
+        Returns
+        -------
+        FieldScores
+            The scores of the scored documents in every field.
+        """
+        query_tfs = self.get_query_tfs(query)
+        segments = []
+        size = 0
+        for where in self.wheres:
+            self.where = where
+            impact_index = impact_indexes[where]
+            term_segments = {}
+            for term in query_tfs:
+                found = impact_index.get_segments(term)
+                if found:
+                    term_segments[term] = found
+            if method == 'OkapiBM25':
+                query_weights = {term: query_tfs[term] for term in term_segments}
+            else:
+                query_weights = self.get_query_weights(query_tfs, term_segments, self.parse_method(method)[1])
+            for term, found in term_segments.items():
+                for impact, doc_ids in found:
+                    contribution = query_weights[term] * impact
+                    segments.append((weights[where] * contribution, where, contribution, doc_ids))
+                    size = max(size, int(doc_ids.max()) + 1)
+
+        accumulators, scored = score_at_a_time(segments, size, postings_budget)
+        documents = np.flatnonzero(scored)
+        if max_results is not None and max_results < len(documents):
+            # the weighted sums of `aggregate`, to keep the documents that may make it only
+            final_scores = np.zeros(len(documents))
+            for where, weight in weights.items():
+                if where in accumulators:
+                    final_scores += accumulators[where][documents] * weight
+            threshold = -np.partition(-final_scores, max_results - 1)[max_results - 1] if max_results > 0 else np.inf
+            documents = documents[final_scores >= threshold]
+        return FieldScores(documents, {where: accumulator[documents] for where, accumulator in accumulators.items()})
+
+    def get_vector_space_model_scores(self, query_tfs, documents, document_scheme, query_scheme,
+                                      document_norms=None):
+        """
+        Returns the Vector Space Model scores of documents in the current field.
+
+        The scores are computed term at a time: the weights of the postings
+        of each query term are computed as arrays and added into a dense
+        accumulator indexed by internal document ID, see
+        `get_vector_space_model_weighers`.
+
+        Parameters
+        ----------
+        query_tfs : dict
+            The term frequencies of the terms in the query.
+        documents : numpy.ndarray
+            The internal IDs of the documents to score.
+        document_scheme : str (n|l)(n|t)(n|c)
+            The weighting of the documents.
+        query_scheme : str (n|l)(n|t)(n|c)
+            The weighting of the query.
+        document_norms : dict
+            {scheme: array of the norms of the documents of the field by internal ID}
+
+        Returns
+        -------
+        numpy.ndarray
+            The score of every document, in the order of `documents`.
+        """
+        if not len(documents):
+            return np.zeros(0)
+        term_weighers = self.get_vector_space_model_weighers(query_tfs, document_scheme, query_scheme, document_norms)
+        return self.accumulate(term_weighers, documents)
+
+    @staticmethod
+    def accumulate(term_weighers, documents, size=0):
+        """
+        Adds up the contributions of the postings of the query terms, term at a time.
+
+        Parameters
+        ----------
+        term_weighers : list
+            The (term, doc_ids, weigh, bound) of the query terms, see
+            `get_vector_space_model_weighers`.
+        documents : numpy.ndarray
+            The internal IDs of the documents to score.
+        size : int
+            The smallest size of the accumulator.
+
+        Returns
+        -------
+        numpy.ndarray
+            The score of every document, in the order of `documents`.
+        """
+        if not term_weighers or not len(documents):
+            return np.zeros(len(documents))
+        size = max([size, int(documents.max()) + 1]
+                   + [int(doc_ids[-1]) + 1 for _, doc_ids, _, _ in term_weighers if len(doc_ids)])
+        accumulator = np.zeros(size)
+        for _, doc_ids, weigh, _ in term_weighers:
+            accumulator[doc_ids] += weigh(0, len(doc_ids))
+        return accumulator[documents]
+
+    @classmethod
+    def get_document_weights(cls, tfs, idf, document_scheme):
+        """
+        Returns the weights of an array of tfs under a document scheme, before normalization.
+        """
+        document_weights = tfs.astype(np.float64) if document_scheme[0] == 'n' else cls.get_log_tfs(tfs)
+        if document_scheme[1] == 't':
+            document_weights = document_weights * idf
+        return document_weights
+
+    def get_vector_space_model_weighers(self, query_tfs, document_scheme, query_scheme, document_norms=None):
+        """
+        Returns how the postings of the query terms contribute to the Vector
+        Space Model scores in the current field.
+
+        The same contributions are added up term at a time by
+        `get_vector_space_model_scores` and document at a time by
+        `compute_top_k`, so both give the same scores. With precomputed
+        document norms, cosine normalization divides each posting weight by
+        the norm of its document. Without them, the document weights are
+        normalized over the query terms only.
+
+        Parameters
+        ----------
+        query_tfs : dict
+            The term frequencies of the terms in the query.
+        document_scheme : str (n|l)(n|t)(n|c)
+            The weighting of the documents.
+        query_scheme : str (n|l)(n|t)(n|c)
+            The weighting of the query.
+        document_norms : dict
+            {scheme: array of the norms of the documents of the field by internal ID}
+
+        Returns
+        -------
+        list
+            (term, doc_ids, weigh, bound) of every query term in the field.
+            weigh(start, end) returns the contributions of the postings
+            [start, end) of the term, and bound(score_bounds, blocks) the
+            upper bounds of the contributions of blocks of its postings, see
+            `ScoreBounds`.
+        """
+        term_postings = []
+        posting_lists = self.index[self.where].get_posting_lists(query_tfs)
+        query_weights = self.get_query_weights(query_tfs, posting_lists, query_scheme)
+        for term, postings in posting_lists.items():
+            doc_ids = np.asarray(postings.doc_ids, dtype=np.int64)
+            tfs = np.asarray(postings.tfs, dtype=np.int64)
+            idf = self.get_idf(term) if document_scheme[1] == 't' else 1
+            term_postings.append((term, doc_ids, tfs, idf, query_weights[term]))
+
+        norms = None
+        if document_scheme[2] == 'c' and document_norms is not None:
+            norms = document_norms[document_scheme]
+        elif document_scheme[2] == 'c' and term_postings:
+            size = max([int(doc_ids[-1]) + 1 for _, doc_ids, _, _, _ in term_postings if len(doc_ids)], default=0)
+            squares = np.zeros(size)
+            for _, doc_ids, tfs, idf, _ in term_postings:
+                squares[doc_ids] += self.get_document_weights(tfs, idf, document_scheme) ** 2
+            norms = np.sqrt(squares)
+
+        return [(term, doc_ids) + self.get_vector_space_model_weigher(doc_ids, tfs, idf, query_weight,
+                                                                     document_scheme, norms)
+                for term, doc_ids, tfs, idf, query_weight in term_postings]
+
+    def get_query_weights(self, query_tfs, terms, query_scheme):
+        """
+        Returns the weights of query terms in the current field under a query
+        scheme, cosine normalized over these terms for the c schemes.
+
+        Parameters
+        ----------
+        query_tfs : dict
+            The term frequencies of the terms in the query.
+        terms : iterable
+            The query terms the field has.
+        query_scheme : str (n|l)(n|t)(n|c)
+            The weighting of the query.
 
         Returns
         -------
         dict
-            A dictionary of the document IDs and their scores.
+            {term: weight}
         """
-        scores = {}
-        
-        # Create term frequencies for the query
-        query_tfs = {}
-        for term in query:
-            query_tfs[term] = query.count(term)
-            
-        # Iterate through all documents and compute scores
-        for document_id in self.get_list_of_documents(query):
-            scores[document_id] = {}
-           
-            for where in self.wheres:
-                self.where = where
-                score = self.get_vector_space_model_score(query, query_tfs, document_id, method)
-                
-                scores[document_id][self.where] = score
+        query_weights = {}
+        for term in terms:
+            query_weight = query_tfs[term] if query_scheme[0] == 'n' else 1 + math.log(query_tfs[term])
+            if query_scheme[1] == 't':
+                query_weight = query_weight * self.get_idf(term)
+            query_weights[term] = query_weight
+        query_norm = math.sqrt(sum([query_weight ** 2 for query_weight in query_weights.values()]))
+        if query_scheme[2] == 'c' and query_norm:
+            query_weights = {term: query_weight / query_norm for term, query_weight in query_weights.items()}
+        return query_weights
+
+    def get_vector_space_model_weigher(self, doc_ids, tfs, idf, query_weight, document_scheme, norms=None):
+        """
+        Returns the weigh and bound functions of one posting list, see `get_vector_space_model_weighers`.
+        """
+        document_idf = idf if document_scheme[1] == 't' else 1
 
-        return scores
+        def weigh(start, end):
+            document_weights = self.get_document_weights(tfs[start:end], idf, document_scheme)
+            if norms is not None:
+                document_weights = self.normalize(document_weights, norms[doc_ids[start:end]])
+            return query_weight * document_weights
+
+        def bound(score_bounds, blocks):
+            if norms is not None:
+                return query_weight * document_idf * score_bounds.max_weights[document_scheme][blocks]
+            max_tfs = score_bounds.max_tfs[blocks].astype(np.float64)
+            return query_weight * document_idf * (max_tfs if document_scheme[0] == 'n' else 1 + np.log(max_tfs))
+
+        return weigh, bound
+
+    @staticmethod
+    def normalize(weights, norms):
+        """
+        Divides weights by norms, leaving the weights with a zero norm at 0.
+        """
+        return np.divide(weights, norms, out=np.zeros_like(weights), where=norms > 0)
 
     def get_vector_space_model_score(self, query, query_tfs, document_id, method):
         """
@@ -146,8 +592,8 @@ class Scorer:
             The query to be scored
         query_tfs : dict
             The term frequencies of the terms in the query.
-        document_id : str
-            The document to calculate the score for.
+        document_id : int
+            The internal ID of the document to calculate the score for.
         method : str ((n|l)(n|t)(n|c).(n|l)(n|t)(n|c))
             The method to use for the document and query.
 
@@ -156,147 +602,211 @@ class Scorer:
         float
             The Vector Space Model score of the document for the query.
         """
-        
-        # Parse the method and compute the score
-        score = 0
-        # Parse the method for document
-        doc_tf = method[0:1]
-        doc_idf = method[1:2]
-        doc_normalization = method[2:3]
-        # Parse the method for query
-        query_tf = method[3:4]
-        query_idf = method[4:5]
-        query_normalization = method[4:5]
-        tf_q = {}
-        idf_q = {}
-        tf_d = {}
-        idf_d = {}
-        score_d = {}
-        score_q = {}
-        for term in query_tfs:
-           
-            if term in self.index[self.where].keys():
-                    
-                    # Compute the score based on the method
-                    if query_tf == 'n':
-                        
-                        tf_q[term] = query_tfs[term]
-                        
-                    else :
-                        
-                        tf_q[term] = 1+math.log(int(query_tfs[term]))
-                        
-
-                    if query_idf == 'n':
-                        # no idf
-                        idf_q[term] = 1
-                    else:
-                        idf_q[term] = self.get_idf(term)
-                    
-                    score_q[term] = tf_q[term] * idf_q[term]
-                   
-                    # Compute the score based on the method
-                    #first check if term in doc
-                    if document_id in self.index[self.where][term]:
-                        #if term in doc
-                        # Compute the score based on the method
-
-                        if doc_tf == 'n':
-                          tf_d[term] = self.index[self.where][term][document_id]
-                        else:
-                        
-                           tf_d[term] = 1+math.log(self.index[self.where][term][document_id])
-                        
-                        if doc_idf == 'n':
-                          # no idf
-                          idf_d[term] = 1
-                        else:
-                          idf_d[term] = self.get_idf(term)
-                        
-                        score_d[term] = tf_d[term] * idf_d[term]
-                        
-                    else:
-                        score_d[term] = 0 
-            else:
-                score_q[term] = 0
-                score_d[term] = 0 
-        # Compute the score based on the method
-                    
-        if query_normalization == 'c':
-            score_all = math.sqrt(sum([i ** 2 for i in score_q.values()]))
-            for term in query_tfs:
-                score_q[term] = score_q[term] / score_all
-        if doc_normalization == 'c':
-            
-            score_all = math.sqrt(sum([i ** 2 for i in score_d.values()]))
-            if score_all != 0:
-             for term in query_tfs:
-                
-                score_d[term] = score_d[term] / score_all
-        for term in query_tfs:
-            
-            score += score_q[term] * score_d[term]
-
-        return score
+        document_scheme, query_scheme = self.parse_method(method)
+        documents = np.array([document_id], dtype=np.int64)
+        return float(self.get_vector_space_model_scores(query_tfs, documents, document_scheme, query_scheme)[0])
 
-    def compute_scores_with_okapi_bm25(self, query, average_document_field_length, document_lengths):
+    def compute_scores_with_okapi_bm25(self, query, average_document_field_length, document_lengths,
+                                       documents=None, parameters=None):
         """
-        Compute scores with Okapi BM25.
+        Compute scores with Okapi BM25, each field being scored on its own.
 
         Parameters
         ----------
         query: List[str]
             The query to be scored
-        average_document_field_length : float
-            The average length of the documents in the index.
+        average_document_field_length : dict
+            {field: the average length of the field in all documents}, as in
+            the metadata index.
         document_lengths : dict
-            A dictionary of the document lengths. The keys are the document IDs, and the values are
-            the document's length in that field.
+            {field: array of the length of the field in every document by
+            internal ID}, see `DocumentLengthsIndex`.
+        documents : list
+            The internal IDs of the documents to score, by default the ones
+            containing any of the query terms.
+        parameters : dict
+            {field: (k1, b)}, by default (K1, B) for every field.
 
         Returns
         -------
-        dict
-            A dictionary of the document IDs and their scores.
+        FieldScores
+            The scores of the documents in every field.
         """
-        scores = {}
-        for document_id in self.get_list_of_documents(query):
-            score = self.get_okapi_bm25_score(query, document_id, average_document_field_length, document_lengths)
-            scores[document_id] = score
-        return scores
+        query_tfs = self.get_query_tfs(query)
+        if documents is None:
+            documents = self.get_list_of_documents(query)
+        documents = np.asarray(documents, dtype=np.int64)
+        parameters = {} if parameters is None else parameters
+
+        field_scores = {}
+        for where in self.wheres:
+            self.where = where
+            k1, b = parameters.get(where, (self.K1, self.B))
+            field_scores[where] = self.get_okapi_bm25_scores(query_tfs, documents, average_document_field_length[where],
+                                                             document_lengths[where], k1, b)
+        return FieldScores(documents, field_scores)
+
+    def get_okapi_bm25_scores(self, query_tfs, documents, average_document_field_length, document_lengths,
+                              k1=K1, b=B):
+        """
+        Returns the Okapi BM25 scores of documents in the current field.
+
+        Like the vector space model, the scores are accumulated term at a
+        time over the posting arrays of the query terms.
+
+        Parameters
+        ----------
+        query_tfs : dict
+            The term frequencies of the terms in the query.
+        documents : numpy.ndarray
+            The internal IDs of the documents to score.
+        average_document_field_length : float
+            The average length of the field.
+        document_lengths : array
+            The length of the field in every document by internal ID.
+        k1 : float
+            The tf saturation of the field.
+        b : float
+            How much the tf is normalized by the length of the field.
+
+        Returns
+        -------
+        numpy.ndarray
+            The score of every document, in the order of `documents`.
+        """
+        term_weighers = self.get_okapi_bm25_weighers(query_tfs, average_document_field_length, document_lengths, k1, b)
+        return self.accumulate(term_weighers, documents, len(document_lengths))
+
+    def get_okapi_bm25_weighers(self, query_tfs, average_document_field_length, document_lengths, k1=K1, b=B):
+        """
+        Returns how the postings of the query terms contribute to the Okapi
+        BM25 scores in the current field, see `get_vector_space_model_weighers`.
+
+        The bound of a block takes its largest tf and its shortest field,
+        as the score grows with the tf and shrinks with the length for
+        k1 >= 0 and 0 <= b <= 1.
+        """
+        document_lengths = np.asarray(document_lengths, dtype=np.float64)
+        term_weighers = []
+        for term, postings in self.index[self.where].get_posting_lists(query_tfs).items():
+            doc_ids = np.asarray(postings.doc_ids, dtype=np.int64)
+            tfs = np.asarray(postings.tfs, dtype=np.float64)
+            term_weighers.append((term, doc_ids) + self.get_okapi_bm25_weigher(
+                doc_ids, tfs, query_tfs[term] * self.get_idf(term, 'bm25'), average_document_field_length,
+                document_lengths, k1, b))
+        return term_weighers
+
+    def get_okapi_bm25_weigher(self, doc_ids, tfs, query_weight, average_document_field_length, document_lengths,
+                               k1, b):
+        """
+        Returns the weigh and bound functions of one posting list, query_weight being the query tf times the idf.
+        """
+
+        def saturate(tfs, lengths):
+            length_norms = self.get_length_norms(lengths, average_document_field_length, b)
+            return query_weight * tfs * (k1 + 1) / (tfs + k1 * length_norms)
+
+        def weigh(start, end):
+            return saturate(tfs[start:end], document_lengths[doc_ids[start:end]])
+
+        def bound(score_bounds, blocks):
+            return saturate(score_bounds.max_tfs[blocks].astype(np.float64),
+                            score_bounds.min_lengths[blocks].astype(np.float64))
+
+        return weigh, bound
+
+    @staticmethod
+    def get_length_norms(lengths, average_length, b):
+        """
+        Returns 1 - b + b * length / average length of an array of field lengths.
+        """
+        if not average_length:
+            return np.ones(len(lengths))
+        return 1 - b + b * lengths / average_length
 
     def get_okapi_bm25_score(self, query, document_id, average_document_field_length, document_lengths):
         """
-        Returns the Okapi BM25 score of a document for a query.
+        Returns the Okapi BM25 score of a document for a query in the current field.
 
         Parameters
         ----------
         query: List[str]
             The query to be scored
-        document_id : str
-            The document to calculate the score for.
+        document_id : int
+            The internal ID of the document to calculate the score for.
         average_document_field_length : float
-            The average length of the documents in the index.
-        document_lengths : dict
-            A dictionary of the document lengths. The keys are the document IDs, and the values are
-            the document's length in that field.
+            The average length of the field.
+        document_lengths : array
+            The length of the field in every document by internal ID.
 
         Returns
         -------
         float
             The Okapi BM25 score of the document for the query.
         """
-        # TODO: Implement Okapi BM25 scoring logic
-        k1 = 1.5
-        b = 0.75
-        score = 0.0
+        documents = np.array([document_id], dtype=np.int64)
+        return float(self.get_okapi_bm25_scores(self.get_query_tfs(query), documents, average_document_field_length,
+                                                document_lengths)[0])
 
-        for term in query:
-            if term in self.index and document_id in self.index[term]:
-                tf = self.index[term][document_id]
-                df = len(self.index[term])
-                idf = self.get_idf(term)
-                doc_length = document_lengths.get(document_id, average_document_field_length)
-                score += idf * (
-                        (tf * (k1 + 1)) / (tf + k1 * (1 - b + b * (doc_length / average_document_field_length))))
-
-        return score
+    def compute_scores_with_bm25f(self, query, weights, average_document_field_length, document_lengths,
+                                  documents=None, parameters=None, k1=K1):
+        """
+        Compute scores with BM25F, which scores the fields as one document.
+
+        The tf of a term is the sum over the fields of its weighted, length
+        normalized tf in each of them, and it is saturated once with k1. The
+        idf counts the documents containing the term in any of the fields.
+
+        Parameters
+        ----------
+        query: List[str]
+            The query to be scored
+        weights : dict
+            {field: weight of the field's tfs}
+        average_document_field_length : dict
+            {field: the average length of the field in all documents}.
+        document_lengths : dict
+            {field: array of the length of the field in every document by internal ID}.
+        documents : list
+            The internal IDs of the documents to score, by default the ones
+            containing any of the query terms.
+        parameters : dict
+            {field: (k1, b)}, of which only b is used, by default B.
+        k1 : float
+            The tf saturation.
+
+        Returns
+        -------
+        FieldScores
+            The scores of the documents, as the scores of a single field 'bm25f'.
+        """
+        query_tfs = self.get_query_tfs(query)
+        if documents is None:
+            documents = self.get_list_of_documents(query)
+        documents = np.asarray(documents, dtype=np.int64)
+        parameters = {} if parameters is None else parameters
+        if not len(documents):
+            return FieldScores(documents, {})
+
+        field_postings = {where: self.index[where].get_posting_lists(query_tfs) for where in self.wheres}
+        lengths = {where: np.asarray(document_lengths[where], dtype=np.float64) for where in self.wheres}
+        size = max([int(documents.max()) + 1] + [len(field_lengths) for field_lengths in lengths.values()])
+        accumulator = np.zeros(size)
+        for term, query_tf in query_tfs.items():
+            pseudo_tfs = np.zeros(size)
+            term_documents = []
+            for where in self.wheres:
+                postings = field_postings[where].get(term)
+                if postings is None or not weights.get(where):
+                    continue
+                doc_ids = np.asarray(postings.doc_ids, dtype=np.int64)
+                length_norms = self.get_length_norms(lengths[where][doc_ids], average_document_field_length[where],
+                                                     parameters.get(where, (k1, self.B))[1])
+                pseudo_tfs[doc_ids] += weights[where] * np.asarray(postings.tfs, dtype=np.float64) / length_norms
+                term_documents.append(doc_ids)
+            if not term_documents:
+                continue
+            doc_ids = np.unique(np.concatenate(term_documents))
+            idf = float(compute_idfs([len(doc_ids)], self.N, 'bm25')[0])
+            accumulator[doc_ids] += query_tf * idf * pseudo_tfs[doc_ids] * (k1 + 1) / (k1 + pseudo_tfs[doc_ids])
+        return FieldScores(documents, {'bm25f': accumulator[documents]})
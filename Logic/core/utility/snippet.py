@@ -35,7 +35,7 @@ class Snippet:
         query_without_stopwords = [word for word in query_words if word.lower() not in stop_words]
         return ' '.join(query_without_stopwords)
 
-    def find_snippet(self, doc, query):
+    def find_snippet(self, doc, query, term_positions=None):
         """
         Find snippet in a doc based on a query.
 
@@ -45,6 +45,10 @@ class Snippet:
             The retrieved doc which the snippet should be extracted from that.
         query : str
             The query which the snippet should be extracted based on that.
+        term_positions : dict
+            The token offsets of the query words in the doc, as returned by
+            `SearchEngine.get_term_positions`. The doc is then the indexed
+            (preprocessed) summaries text and is not searched for the words.
 
         Returns
         -------
@@ -62,14 +66,21 @@ class Snippet:
 
         # Tokenize query and document
         query_tokens = query.split()
-        document_tokens = re.findall(r'\b\w+\b', doc.lower())
+        if term_positions is None:
+            document_tokens = re.findall(r'\b\w+\b', doc.lower())
+        else:
+            # the offsets of a positional index refer to whitespace tokens
+            document_tokens = doc.split()
 
         # Initialize snippet dictionary
         snippet_dict = defaultdict(list)
 
         # Find occurrences of query tokens in the document
         for token in query_tokens:
-            indices = [i for i, x in enumerate(document_tokens) if x == token]
+            if term_positions is None:
+                indices = [i for i, x in enumerate(document_tokens) if x == token]
+            else:
+                indices = term_positions.get(token, [])
             for idx in indices:
                 start_idx = max(0, idx - self.number_of_words_on_each_side)
                 end_idx = min(len(document_tokens), idx + self.number_of_words_on_each_side + 1)
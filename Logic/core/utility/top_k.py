@@ -0,0 +1,440 @@
+import heapq
+import math
+from bisect import bisect_left
+
+import numpy as np
+
+# the doc of an exhausted cursor
+END = math.inf
+# relative slack of the bounds, which are not computed with the same
+# floating point operations as the scores they bound
+BOUND_SLACK = 1e-9
+PRUNING_METHODS = ('maxscore', 'wand', 'bmw')
+
+
+def aggregate(field_scores: dict, weights: dict) -> float:
+    """
+    Returns the weighted sum of the scores of a document in the fields.
+
+    Parameters
+    ----------
+    field_scores : dict
+        {field: score}, a missing field scoring 0.
+    weights : dict
+        {field: weight}, summed in this order.
+    """
+    score = 0.0
+    for field, weight in weights.items():
+        score += field_scores.get(field, 0.0) * weight
+    return score
+
+
+class FieldScores:
+    def __init__(self, documents, field_scores: dict):
+        """
+        The scores of documents in the fields, kept as one array per field so
+        that they are filtered, aggregated and selected from with array
+        operations instead of a dict per document.
+
+        Parameters
+        ----------
+        documents : numpy.ndarray
+            The internal IDs of the documents, each once.
+        field_scores : dict
+            {field: array of the scores of the documents, in the order of
+            documents}, a missing field scoring 0.
+        """
+        self.documents = np.asarray(documents, dtype=np.int64)
+        self.field_scores = field_scores
+
+    @classmethod
+    def from_documents(cls, document_scores: list):
+        """
+        Gathers the scores of a few documents, e.g. the results of `get_top_k`.
+
+        Parameters
+        ----------
+        document_scores : list
+            [(internal ID, {field: score})]
+        """
+        fields = dict.fromkeys(field for _, field_scores in document_scores for field in field_scores)
+        return cls([document_id for document_id, _ in document_scores],
+                   {field: np.array([field_scores.get(field, 0.0) for _, field_scores in document_scores])
+                    for field in fields})
+
+    def __len__(self):
+        return len(self.documents)
+
+    def keep(self, documents):
+        """
+        Returns the scores of the documents that are also in documents, an array of internal IDs.
+        """
+        kept = np.isin(self.documents, np.asarray(documents, dtype=np.int64))
+        return FieldScores(self.documents[kept], {field: scores[kept] for field, scores in self.field_scores.items()})
+
+    def aggregate(self, weights: dict):
+        """
+        Returns the weighted sums of the field scores of the documents, summed
+        in the order of the weights as `aggregate` sums them.
+
+        Returns
+        -------
+        numpy.ndarray
+            The score of every document, in the order of documents.
+        """
+        final_scores = np.zeros(len(self.documents))
+        for field, weight in weights.items():
+            if field in self.field_scores:
+                final_scores += self.field_scores[field] * weight
+        return final_scores
+
+
+class TermCursor:
+    def __init__(self, order: int, field: str, weight: float, doc_ids, weigh, block_size: int,
+                 block_last_doc_ids, block_upper_bounds):
+        """
+        A cursor over the posting list of one query term in one field, for
+        document-at-a-time evaluation.
+
+        The posting list stays a NumPy array: the cursor reads the doc ids
+        of one block at a time, when it first stops in the block, and jumps
+        over the blocks it skips with the last doc of every block, so the
+        postings of the blocks it skips are never copied.
+
+        Parameters
+        ----------
+        order : int
+            The position of the term in the order the scores are summed in.
+        field : str
+            The field of the posting list.
+        weight : float
+            The weight of the field.
+        doc_ids : numpy.ndarray
+            The sorted internal IDs of the documents.
+        weigh : callable
+            weigh(start, end) returns the score contributions of the postings
+            [start, end), which are computed one block at a time when the
+            cursor first scores a document of the block.
+        block_size : int
+            The number of postings of a block.
+        block_last_doc_ids : list
+            The last doc of every block.
+        block_upper_bounds : list
+            The largest weighted contribution of every block.
+        """
+        self.order = order
+        self.field = field
+        self.weight = weight
+        self.doc_ids = doc_ids
+        self.weigh = weigh
+        self.block_size = block_size
+        self.block_last_doc_ids = block_last_doc_ids
+        self.block_upper_bounds = block_upper_bounds
+        self.upper_bound = max(block_upper_bounds, default=0.0)
+        # the block the cursor is in: its first posting, doc ids and contributions
+        self.block_start = -1
+        self.block_doc_ids = []
+        self.contributions = None
+        self.position = 0
+        # the block `get_block_bound` last looked at
+        self.block = 0
+        self.doc = END
+        self.move(0)
+
+    def read_block(self, block: int):
+        self.block_start = block * self.block_size
+        self.block_doc_ids = self.doc_ids[self.block_start:self.block_start + self.block_size].tolist()
+        self.contributions = None
+
+    def move(self, position: int):
+        self.position = position
+        if position >= len(self.doc_ids):
+            self.doc = END
+            return
+        if not 0 <= position - self.block_start < len(self.block_doc_ids):
+            self.read_block(position // self.block_size)
+        self.doc = self.block_doc_ids[position - self.block_start]
+
+    def next(self):
+        self.move(self.position + 1)
+
+    def advance(self, doc_id):
+        """
+        Moves to the first document not before doc_id.
+        """
+        if self.doc >= doc_id:
+            return
+        offset = self.position - self.block_start
+        if doc_id > self.block_doc_ids[-1]:
+            block = bisect_left(self.block_last_doc_ids, doc_id, self.position // self.block_size + 1)
+            if block == len(self.block_last_doc_ids):
+                self.move(len(self.doc_ids))
+                return
+            self.read_block(block)
+            offset = 0
+        self.move(self.block_start + bisect_left(self.block_doc_ids, doc_id, offset))
+
+    def get_contribution(self) -> float:
+        if self.contributions is None:
+            self.contributions = self.weigh(self.block_start, self.block_start + len(self.block_doc_ids)).tolist()
+        return self.contributions[self.position - self.block_start]
+
+    def get_block_bound(self, doc_id):
+        """
+        Returns the bound of the block that would hold doc_id and the last doc of the block.
+        """
+        self.block = bisect_left(self.block_last_doc_ids, doc_id, self.block)
+        if self.block == len(self.block_last_doc_ids):
+            return 0.0, END
+        return self.block_upper_bounds[self.block], self.block_last_doc_ids[self.block]
+
+
+class TopK:
+    def __init__(self, k: int):
+        """
+        The k best documents seen so far, in a min-heap, and the documents
+        tying with the k-th of them.
+
+        Ties at the k-th score are kept rather than broken by internal ID:
+        results are ordered by IMDb ID within a score, see
+        `SearchEngine.select_top_k`, which the internal IDs do not follow.
+        """
+        self.k = k
+        self.heap = []
+        self.ties = []
+
+    def can_enter(self, bound: float) -> bool:
+        """
+        Returns whether a document whose score is at most bound may enter the top k.
+        """
+        return len(self.heap) < self.k or bound * (1 + BOUND_SLACK) >= self.heap[0][0]
+
+    def push(self, doc_id: int, score: float, field_scores: dict):
+        entry = (score, doc_id, field_scores)
+        if len(self.heap) < self.k:
+            heapq.heappush(self.heap, entry)
+        elif score > self.heap[0][0]:
+            entry = heapq.heapreplace(self.heap, entry)
+            self.ties = [tie for tie in self.ties + [entry] if tie[0] == self.heap[0][0]]
+        elif score == self.heap[0][0]:
+            self.ties.append(entry)
+
+    def get_results(self) -> list:
+        """
+        Returns [(internal ID, score, {field: score})] of the top k and of
+        the documents tying with the k-th of them, best first.
+        """
+        return [(doc_id, score, field_scores)
+                for score, doc_id, field_scores in sorted(self.heap + self.ties, key=lambda entry: (-entry[0],
+                                                                                                    entry[1]))]
+
+
+def score_document(contributions: list, weights: dict):
+    """
+    Sums the contributions of the terms of a document in the order of the
+    cursors, so that the scores are the ones of term-at-a-time scoring.
+
+    Returns
+    -------
+    tuple
+        (score, {field: score})
+    """
+    field_scores = {}
+    for _, field, contribution in sorted(contributions, key=lambda item: item[0]):
+        field_scores[field] = field_scores.get(field, 0.0) + contribution
+    return aggregate(field_scores, weights), field_scores
+
+
+def max_score(cursors: list, k: int, weights: dict) -> list:
+    """
+    Top-k retrieval with MaxScore.
+
+    The cursors are sorted by upper bound. The ones whose bounds sum to less
+    than the score of the k-th document are non-essential: documents found
+    only in them can not enter the top k, so only the documents of the
+    essential cursors are visited, and the non-essential ones are looked up
+    while the document can still make it.
+
+    Parameters
+    ----------
+    cursors : List[TermCursor]
+        The cursors of the query terms.
+    k : int
+        The number of documents to return.
+    weights : dict
+        {field: weight} to aggregate the field scores with.
+
+    Returns
+    -------
+    list
+        [(internal ID, score, {field: score})] of the top k, and of the
+        documents tying with the k-th of them, best first.
+    """
+    top_k = TopK(k)
+    ordered = sorted(cursors, key=lambda cursor: cursor.upper_bound)
+    cumulative_bounds = []
+    for cursor in ordered:
+        cumulative_bounds.append(cursor.upper_bound + (cumulative_bounds[-1] if cumulative_bounds else 0.0))
+
+    first_essential = 0
+    while True:
+        while first_essential < len(ordered) and not top_k.can_enter(cumulative_bounds[first_essential]):
+            first_essential += 1
+        essential = ordered[first_essential:]
+        doc_id = min((cursor.doc for cursor in essential), default=END)
+        if doc_id == END:
+            break
+
+        contributions = []
+        score = 0.0
+        for cursor in essential:
+            if cursor.doc == doc_id:
+                contribution = cursor.get_contribution()
+                contributions.append((cursor.order, cursor.field, contribution))
+                score += cursor.weight * contribution
+                cursor.next()
+        for position in range(first_essential - 1, -1, -1):
+            if not top_k.can_enter(score + cumulative_bounds[position]):
+                break
+            cursor = ordered[position]
+            cursor.advance(doc_id)
+            if cursor.doc == doc_id:
+                contribution = cursor.get_contribution()
+                contributions.append((cursor.order, cursor.field, contribution))
+                score += cursor.weight * contribution
+        else:
+            top_k.push(doc_id, *score_document(contributions, weights))
+    return top_k.get_results()
+
+
+def wand(cursors: list, k: int, weights: dict, block_max: bool = False) -> list:
+    """
+    Top-k retrieval with WAND, or Block-Max WAND if block_max is True.
+
+    The cursors are kept sorted by their current document. The pivot is the
+    first document whose cursors, with all the ones before it, have bounds
+    adding up to the score of the k-th document: the documents before it
+    can not enter the top k and are skipped. Block-Max WAND also checks the
+    bounds of the blocks holding the pivot, and skips to the end of the
+    first of these blocks when they are too low.
+
+    Parameters
+    ----------
+    cursors : List[TermCursor]
+        The cursors of the query terms.
+    k : int
+        The number of documents to return.
+    weights : dict
+        {field: weight} to aggregate the field scores with.
+    block_max : bool
+        If True, the block bounds are used too.
+
+    Returns
+    -------
+    list
+        [(internal ID, score, {field: score})] of the top k, and of the
+        documents tying with the k-th of them, best first.
+    """
+    top_k = TopK(k)
+    cursors = list(cursors)
+    while True:
+        cursors.sort(key=lambda cursor: cursor.doc)
+        bound = 0.0
+        pivot = -1
+        for position, cursor in enumerate(cursors):
+            if cursor.doc == END:
+                break
+            bound += cursor.upper_bound
+            if top_k.can_enter(bound):
+                pivot = position
+                break
+        if pivot < 0:
+            break
+        pivot_doc_id = cursors[pivot].doc
+        while pivot + 1 < len(cursors) and cursors[pivot + 1].doc == pivot_doc_id:
+            pivot += 1
+
+        if block_max:
+            block_bound = 0.0
+            next_doc_id = cursors[pivot + 1].doc if pivot + 1 < len(cursors) else END
+            for cursor in cursors[:pivot + 1]:
+                cursor_bound, last_doc_id = cursor.get_block_bound(pivot_doc_id)
+                block_bound += cursor_bound
+                next_doc_id = min(next_doc_id, last_doc_id + 1)
+            if not top_k.can_enter(block_bound):
+                for cursor in cursors[:pivot + 1]:
+                    cursor.advance(next_doc_id)
+                continue
+
+        if cursors[0].doc == pivot_doc_id:
+            contributions = []
+            for cursor in cursors[:pivot + 1]:
+                contributions.append((cursor.order, cursor.field, cursor.get_contribution()))
+                cursor.next()
+            top_k.push(pivot_doc_id, *score_document(contributions, weights))
+        else:
+            for cursor in cursors[:pivot]:
+                cursor.advance(pivot_doc_id)
+    return top_k.get_results()
+
+
+def get_top_k(cursors: list, k: int, weights: dict, method: str = 'maxscore') -> list:
+    """
+    Returns the k best documents with one of PRUNING_METHODS, see `max_score` and `wand`.
+
+    The evaluators are experimental: the cursors move, and skip blocks, one
+    document at a time in Python, so scoring every posting with array
+    operations is still faster on the collections measured so far.
+    """
+    if method == 'maxscore':
+        return max_score(cursors, k, weights)
+    if method in ('wand', 'bmw'):
+        return wand(cursors, k, weights, block_max=method == 'bmw')
+    raise ValueError(f'Unknown pruning method {method}, expected one of {PRUNING_METHODS}')
+
+
+def score_at_a_time(segments: list, size: int, postings_budget: int = None) -> dict:
+    """
+    Score-at-a-time evaluation over impact-ordered postings, see `ImpactIndex`.
+
+    The segments of all the query terms are processed from the largest
+    weighted contribution down, adding their contributions to dense
+    accumulators, until postings_budget postings have been processed, the
+    last segment being cut short if needed. The time a query takes is thus
+    bounded by the budget, and the documents left out, or only partly
+    scored, are the ones with the smallest contributions.
+
+    Parameters
+    ----------
+    segments : list
+        (weighted contribution, field, contribution, doc_ids) of every
+        segment, contribution being what each of its documents gets in the
+        field and weighted contribution the same times the weight of the field.
+        Segments with the same weighted contribution are processed in the
+        order of the list.
+    size : int
+        The size of the accumulators, larger than any internal ID.
+    postings_budget : int
+        The number of postings to process, all of them if None.
+
+    Returns
+    -------
+    tuple
+        ({field: accumulator of the field scores by internal ID}, mask of
+        the documents that were scored).
+    """
+    accumulators = {}
+    scored = np.zeros(size, dtype=bool)
+    remaining = math.inf if postings_budget is None else postings_budget
+    for _, field, contribution, doc_ids in sorted(segments, key=lambda segment: -segment[0]):
+        if remaining <= 0:
+            break
+        if len(doc_ids) > remaining:
+            doc_ids = doc_ids[:remaining]
+        remaining -= len(doc_ids)
+        accumulator = accumulators.get(field)
+        if accumulator is None:
+            accumulator = accumulators[field] = np.zeros(size)
+        accumulator[doc_ids] += contribution
+        scored[doc_ids] = True
+    return accumulators, scored
@@ -0,0 +1,120 @@
+import os
+import random
+import sys
+
+import pytest
+
+# the tests import the Logic package from the repository root, wherever pytest is run from
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from Logic.core.indexer.document_lengths_index import DocumentLengthsIndex
+from Logic.core.indexer.document_norms_index import DocumentNormsIndex
+from Logic.core.indexer.index import Index, INVERTED_INDEXES
+from Logic.core.indexer.indexes_enum import Indexes, Index_formats
+from Logic.core.indexer.metadata_index import Metadata_index
+from Logic.core.indexer.shared_index import publish_indexes
+from Logic.core.indexer.tiered_index import Tiered_index
+from Logic.core.search import SearchEngine
+
+WORDS = [f'w{rank}' for rank in range(60)]
+STARS = ['tom hanks', 'meryl streep', 'denzel washington', 'w1', 'cate blanchett', 'al pacino']
+GENRES = ['drama', 'crime', 'comedy', 'w2']
+REMOVED_DOCUMENTS = 11
+# the stars are scored with their own BM25 parameters
+BM25_PARAMETERS = {Indexes.STARS.value: (1.2, 0.3)}
+ENGINE_FORMATS = ['json', 'binary', 'compressed', 'positional']
+
+
+def make_documents(count, seed=7):
+    """
+    Makes preprocessed documents from small vocabularies, so that many of
+    them have the same scores, in an order that is not the order of their IDs.
+    """
+    generator = random.Random(seed)
+    word_weights = [1 / (rank + 1) for rank in range(len(WORDS))]
+    documents = [{
+        'id': f'tt{number:07d}',
+        'stars': generator.sample(STARS, 2),
+        'genres': generator.sample(GENRES, generator.randint(1, 2)),
+        'summaries': [' '.join(generator.choices(WORDS, word_weights, k=generator.randint(1, 30)))],
+    } for number in range(count)]
+    generator.shuffle(documents)
+    return documents
+
+
+def store_json_indexes(index, path, document_norms=True):
+    """
+    Writes the JSON indexes a `SearchEngine` reads by default. Without the
+    document norms, cosine normalization only takes the query terms into account.
+    """
+    os.makedirs(path, exist_ok=True)
+    for field in INVERTED_INDEXES:
+        index.store_index(path, field.value)
+    Metadata_index(path, index).store_metadata_index(path)
+    DocumentLengthsIndex(path, index)
+    if document_norms:
+        DocumentNormsIndex(path, index)
+    Tiered_index(path, index)
+
+
+def store_indexes(index, path, index_format):
+    if index_format == Index_formats.JSON:
+        store_json_indexes(index, path)
+    else:
+        publish_indexes(index, path, index_format)
+
+
+@pytest.fixture(scope='session')
+def documents():
+    return make_documents(300)
+
+
+@pytest.fixture(scope='session')
+def live_documents(documents):
+    """
+    The documents left in the index, every REMOVED_DOCUMENTS-th one being removed.
+    """
+    return [document for position, document in enumerate(documents) if position % REMOVED_DOCUMENTS]
+
+
+@pytest.fixture(scope='session')
+def index(documents, live_documents):
+    index = Index(documents, [Indexes.SUMMARIES])
+    live_ids = {document['id'] for document in live_documents}
+    for document in documents:
+        if document['id'] not in live_ids:
+            index.remove_document_from_index(document['id'])
+    return index
+
+
+@pytest.fixture(scope='session')
+def index_paths(index, tmp_path_factory):
+    """
+    {Index_formats: directory} of the index stored in the JSON, binary and compressed formats.
+    """
+    root = tmp_path_factory.mktemp('indexes')
+    paths = {}
+    for index_format in (Index_formats.JSON, Index_formats.BINARY, Index_formats.COMPRESSED):
+        paths[index_format] = f'{root}/{index_format.value}/'
+        store_indexes(index, paths[index_format], index_format)
+    return paths
+
+
+@pytest.fixture(scope='session')
+def search_engines(index_paths):
+    """
+    {name: SearchEngine} over the stored indexes, named by ENGINE_FORMATS.
+    The positional engine reads the summaries from their positional index.
+    """
+    search_engines = {
+        'json': SearchEngine(index_paths[Index_formats.JSON], Index_formats.JSON, bm25_parameters=BM25_PARAMETERS),
+        'binary': SearchEngine(index_paths[Index_formats.BINARY], Index_formats.BINARY,
+                               bm25_parameters=BM25_PARAMETERS),
+        'compressed': SearchEngine(index_paths[Index_formats.COMPRESSED], Index_formats.COMPRESSED,
+                                   bm25_parameters=BM25_PARAMETERS),
+        'positional': SearchEngine(index_paths[Index_formats.BINARY], Index_formats.BINARY, positional=True,
+                                   bm25_parameters=BM25_PARAMETERS),
+    }
+    yield search_engines
+    for search_engine in search_engines.values():
+        search_engine.close()
@@ -0,0 +1,114 @@
+import math
+from collections import Counter
+
+import pytest
+
+from Logic.core.indexer.index import INVERTED_INDEXES, get_term_frequencies
+from Logic.core.indexer.indexes_enum import Indexes
+from Logic.core.utility.scorer import Scorer
+from conftest import BM25_PARAMETERS, ENGINE_FORMATS
+
+QUERIES = [['w1'], ['w3', 'w3', 'w20'], ['drama', 'w2', 'tom hanks'], ['w1', 'w2', 'comedy', 'not-a-term']]
+WEIGHTS = [
+    {Indexes.STARS: 1, Indexes.GENRES: 1, Indexes.SUMMARIES: 1},
+    {Indexes.STARS: 2, Indexes.GENRES: 0, Indexes.SUMMARIES: 0.5},
+    {Indexes.SUMMARIES: 1},
+]
+
+
+class Collection:
+    """
+    The tfs, lengths and dfs of the live documents, counted directly.
+    """
+    def __init__(self, live_documents):
+        self.count = len(live_documents)
+        self.tfs = {document['id']: {field.value: get_term_frequencies(document, field.value)
+                                     for field in INVERTED_INDEXES} for document in live_documents}
+        self.lengths = {document_id: {field: sum(tfs.values()) for field, tfs in field_tfs.items()}
+                        for document_id, field_tfs in self.tfs.items()}
+        self.average_lengths = {field.value: sum(lengths[field.value] for lengths in self.lengths.values()) / self.count
+                                for field in INVERTED_INDEXES}
+
+    def get_df(self, term, fields):
+        return sum(any(self.tfs[document_id][field].get(term) for field in fields) for document_id in self.tfs)
+
+    def get_idf(self, term, fields):
+        df = self.get_df(term, fields)
+        return math.log((self.count - df + 0.5) / (df + 0.5) + 1)
+
+    def get_length_norm(self, document_id, field, b):
+        return 1 - b + b * self.lengths[document_id][field] / self.average_lengths[field]
+
+    def okapi_bm25(self, query, weights):
+        scores = {}
+        for field, weight in weights.items():
+            if not weight:
+                continue
+            k1, b = BM25_PARAMETERS.get(field.value, (Scorer.K1, Scorer.B))
+            for term, query_tf in Counter(query).items():
+                idf = self.get_idf(term, [field.value])
+                for document_id, field_tfs in self.tfs.items():
+                    tf = field_tfs[field.value].get(term)
+                    if tf:
+                        length_norm = self.get_length_norm(document_id, field.value, b)
+                        score = query_tf * idf * tf * (k1 + 1) / (tf + k1 * length_norm)
+                        scores[document_id] = scores.get(document_id, 0) + weight * score
+        return scores
+
+    def bm25f(self, query, weights):
+        fields = [field.value for field, weight in weights.items() if weight]
+        k1 = Scorer.K1
+        scores = {}
+        for term, query_tf in Counter(query).items():
+            idf = self.get_idf(term, fields)
+            for document_id, field_tfs in self.tfs.items():
+                pseudo_tf = sum(weights[Indexes(field)] * field_tfs[field].get(term, 0) / self.get_length_norm(
+                    document_id, field, BM25_PARAMETERS.get(field, (Scorer.K1, Scorer.B))[1]) for field in fields)
+                if pseudo_tf:
+                    score = query_tf * idf * pseudo_tf * (k1 + 1) / (k1 + pseudo_tf)
+                    scores[document_id] = scores.get(document_id, 0) + score
+        return scores
+
+
+@pytest.fixture(scope='module')
+def collection(live_documents):
+    return Collection(live_documents)
+
+
+def search_scores(search_engine, query, method, weights):
+    """
+    {IMDb ID: score} of every document the search engine scores for the query.
+    """
+    return dict(search_engine.search(query, method, weights, max_results=None))
+
+
+@pytest.mark.parametrize('engine_format', ENGINE_FORMATS)
+@pytest.mark.parametrize('weights', WEIGHTS)
+@pytest.mark.parametrize('query', QUERIES)
+def test_okapi_bm25_matches_the_formula(search_engines, collection, engine_format, weights, query):
+    scores = search_scores(search_engines[engine_format], query, 'OkapiBM25', weights)
+
+    assert scores == pytest.approx(collection.okapi_bm25(query, weights))
+
+
+@pytest.mark.parametrize('engine_format', ENGINE_FORMATS)
+@pytest.mark.parametrize('weights', WEIGHTS)
+@pytest.mark.parametrize('query', QUERIES)
+def test_bm25f_matches_the_formula(search_engines, collection, engine_format, weights, query):
+    scores = search_scores(search_engines[engine_format], query, 'BM25F', weights)
+
+    assert scores == pytest.approx(collection.bm25f(query, weights))
+
+
+def test_bm25f_scores_the_fields_as_one_document(search_engines, collection):
+    """
+    A term in two fields is saturated once, so BM25F does not add up the per field scores.
+    """
+    weights = {Indexes.STARS: 1, Indexes.SUMMARIES: 1}
+    bm25f = search_scores(search_engines['binary'], ['w1'], 'BM25F', weights)
+    okapi_bm25 = search_scores(search_engines['binary'], ['w1'], 'OkapiBM25', weights)
+    in_both_fields = [document_id for document_id, field_tfs in collection.tfs.items()
+                      if field_tfs['stars'].get('w1') and field_tfs['summaries'].get('w1')]
+
+    assert in_both_fields
+    assert all(bm25f[document_id] != pytest.approx(okapi_bm25[document_id]) for document_id in in_both_fields)
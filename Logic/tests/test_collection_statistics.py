@@ -0,0 +1,134 @@
+import math
+from collections import Counter
+
+import numpy as np
+import pytest
+
+from Logic.core.indexer.collection_statistics import DEFAULT_IDF_VARIANT, IDF_VARIANTS, FieldStatistics, compute_idfs
+from Logic.core.indexer.index import INVERTED_INDEXES, Index, get_term_frequencies
+from Logic.core.indexer.index_reader import Index_reader
+from Logic.core.indexer.indexes_enum import Indexes, Index_formats
+from Logic.core.search import SearchEngine
+from conftest import store_indexes
+
+IDF_FORMULAS = {
+    'raw': lambda df, n: n / df,
+    'log': lambda df, n: math.log(n / df),
+    'smoothed': lambda df, n: math.log((n + 1) / (df + 1)) + 1,
+    'bm25': lambda df, n: math.log((n - df + 0.5) / (df + 0.5) + 1),
+}
+
+
+def count_field(live_documents, field):
+    """
+    Returns the df and cf of every term of a field, and its number of tokens, counted from the documents.
+    """
+    df, cf = Counter(), Counter()
+    for document in live_documents:
+        term_frequencies = get_term_frequencies(document, field)
+        df.update(term_frequencies.keys())
+        cf.update(term_frequencies)
+    return df, cf, sum(cf.values())
+
+
+@pytest.mark.parametrize('variant', IDF_VARIANTS)
+def test_compute_idfs(variant):
+    document_frequencies = [0, 1, 2, 5, 10]
+    idfs = compute_idfs(document_frequencies, 10, variant)
+
+    assert idfs[0] == 0
+    assert idfs[1:] == pytest.approx([IDF_FORMULAS[variant](df, 10) for df in document_frequencies[1:]])
+    if variant in ('smoothed', 'bm25'):
+        assert (idfs[1:] > 0).all()
+
+
+def test_unknown_idf_variant():
+    with pytest.raises(ValueError):
+        compute_idfs([1], 10, 'probabilistic')
+
+
+@pytest.mark.parametrize('field', INVERTED_INDEXES)
+def test_statistics_follow_additions_and_removals(index, live_documents, field):
+    statistics = index.collection_statistics[field.value]
+    df, cf, total_tokens = count_field(live_documents, field.value)
+
+    assert statistics.number_of_documents == len(live_documents)
+    assert statistics.total_tokens == total_tokens
+    assert statistics.get_average_length() == pytest.approx(total_tokens / len(live_documents))
+    assert sorted(statistics.get_terms()) == sorted(df)
+    for term in df:
+        assert statistics.get_document_frequency(term) == df[term]
+        assert statistics.get_collection_frequency(term) == cf[term]
+        for variant in IDF_VARIANTS:
+            assert statistics.get_idf(term, variant) == pytest.approx(IDF_FORMULAS[variant](df[term],
+                                                                                           len(live_documents)))
+    assert statistics.get_idf('not-a-term') == 0
+
+
+def test_idf_tables_are_recomputed_after_changes():
+    statistics = FieldStatistics()
+    statistics.add_document({'a': 2, 'b': 1})
+    statistics.add_document({'a': 1})
+    assert statistics.get_idf('b') == pytest.approx(math.log(2))
+    assert statistics.get_idf('a') == 0
+
+    statistics.add_document({'c': 1})
+    assert statistics.get_idf('b') == pytest.approx(math.log(3))
+    statistics.remove_document({'a': 1})
+    assert statistics.get_idf('b') == pytest.approx(math.log(2))
+    assert statistics.get_collection_frequency('a') == 2
+    assert sorted(statistics.get_terms()) == ['a', 'b', 'c']
+
+
+@pytest.mark.parametrize('index_format', [Index_formats.JSON, Index_formats.BINARY, Index_formats.COMPRESSED])
+@pytest.mark.parametrize('field', INVERTED_INDEXES)
+def test_stored_statistics_match_the_index(index, index_paths, index_format, field):
+    path = index_paths[index_format]
+    statistics = index.collection_statistics[field.value]
+    field_index = None
+    if index_format == Index_formats.JSON:
+        stored_statistics = FieldStatistics.read(path, field.value)
+    else:
+        field_index = Index_reader(path, field, index_format=index_format).index
+        stored_statistics = FieldStatistics.read(path, field.value, index_format, field_index.find_term)
+        with pytest.raises(TypeError):
+            stored_statistics.add_document({'w1': 1})
+
+    assert stored_statistics.number_of_documents == statistics.number_of_documents
+    assert stored_statistics.total_tokens == statistics.total_tokens
+    for term in statistics.get_terms():
+        assert stored_statistics.get_document_frequency(term) == statistics.get_document_frequency(term)
+        assert stored_statistics.get_collection_frequency(term) == statistics.get_collection_frequency(term)
+    for variant in IDF_VARIANTS:
+        terms = statistics.get_terms()
+        assert np.array([stored_statistics.get_idf(term, variant) for term in terms]) == pytest.approx(
+            np.array([statistics.get_idf(term, variant) for term in terms]))
+    assert stored_statistics.get_idf('not-a-term') == 0
+    if field_index is not None:
+        field_index.close()
+
+
+@pytest.mark.parametrize('index_format', [Index_formats.JSON, Index_formats.BINARY])
+@pytest.mark.parametrize('idf_variant', [None, 'log'])
+def test_t_weighting_uses_the_idf_of_the_index(live_documents, tmp_path, index_format, idf_variant):
+    path = f'{tmp_path}/'
+    index = Index(live_documents) if idf_variant is None else Index(live_documents, idf_variant=idf_variant)
+    store_indexes(index, path, index_format)
+    search_engine = SearchEngine(path, index_format)
+    idf_variant = idf_variant or DEFAULT_IDF_VARIANT
+    assert DEFAULT_IDF_VARIANT == 'raw'
+    assert search_engine.get_idf_variant() == idf_variant
+
+    # ntc: the tfs times the idfs, divided by the norm of the whole document vector
+    df, _, _ = count_field(live_documents, Indexes.SUMMARIES.value)
+    idfs = {term: IDF_FORMULAS[idf_variant](df[term], len(live_documents)) for term in df}
+    query = ['w3', 'w20', 'w20']
+    expected = {}
+    for document in live_documents:
+        term_frequencies = get_term_frequencies(document, Indexes.SUMMARIES.value)
+        if any(term in term_frequencies for term in query):
+            norm = math.sqrt(sum((tf * idfs[term]) ** 2 for term, tf in term_frequencies.items()))
+            expected[document['id']] = sum(term_frequencies[term] * idfs[term] / norm for term in query) if norm else 0
+    results = search_engine.search(query, 'ntc.nnn', {Indexes.SUMMARIES: 1}, max_results=None)
+    assert dict(results) == pytest.approx(expected)
+    search_engine.close()
@@ -0,0 +1,94 @@
+from collections import Counter
+
+import numpy as np
+import pytest
+
+from Logic.core.indexer.impact_index import ImpactIndex
+from Logic.core.indexer.indexes_enum import Indexes
+from Logic.core.utility.top_k import score_at_a_time
+from conftest import ENGINE_FORMATS
+
+WEIGHTS = {Indexes.STARS: 1, Indexes.GENRES: 0.5, Indexes.SUMMARIES: 2}
+QUERIES = [['w0'], ['w0', 'w1', 'w1', 'drama'], ['w30', 'tom hanks', 'w59'], ['not-a-term']]
+
+
+@pytest.fixture
+def impact_index():
+    terms = ['a', 'b', 'c']
+    term_impacts = [
+        ([1, 4, 6, 9], [4.0, 1.0, 4.0, 2.1]),
+        ([2, 3], [0.0, 0.01]),
+        ([], []),
+    ]
+    return ImpactIndex.from_impacts(term_impacts, lambda term: terms.index(term) if term in terms else -1, levels=4)
+
+
+def test_postings_are_grouped_by_level(impact_index):
+    assert impact_index.scale == 1.0
+    segments = impact_index.get_segments('a')
+    assert [(impact, doc_ids.tolist()) for impact, doc_ids in segments] == [(4.0, [1, 6]), (2.0, [9]), (1.0, [4])]
+
+
+def test_positive_impacts_get_the_lowest_level_at_least(impact_index):
+    assert [(impact, doc_ids.tolist()) for impact, doc_ids in impact_index.get_segments('b')] == [(1.0, [3])]
+    assert impact_index.get_segments('c') == []
+    assert impact_index.get_segments('not-a-term') == []
+
+
+def test_score_at_a_time_spends_the_budget_on_the_largest_contributions():
+    segments = [
+        (1.0, 'stars', 1.0, np.array([0, 1, 2])),
+        (6.0, 'summaries', 3.0, np.array([2, 3])),
+        (2.0, 'summaries', 1.0, np.array([4, 5, 6])),
+    ]
+    accumulators, scored = score_at_a_time(segments, 8, postings_budget=4)
+
+    assert np.flatnonzero(scored).tolist() == [2, 3, 4, 5]
+    assert accumulators['summaries'].tolist() == [0, 0, 3, 3, 1, 1, 0, 0]
+    assert 'stars' not in accumulators
+    accumulators, scored = score_at_a_time(segments, 8)
+    assert scored.sum() == 7
+    assert accumulators['stars'].tolist() == [1, 1, 1, 0, 0, 0, 0, 0]
+
+
+def get_error_bound(search_engine, method, query):
+    """
+    Returns the largest error of quantized scores: half a level of every query term in every field.
+    """
+    if method == 'OkapiBM25':
+        weighting, query_weight = 'OkapiBM25', len(query)
+    else:
+        # the lnn query weights
+        weighting, query_weight = 'ltc', sum(1 + np.log(query_tf) for query_tf in Counter(query).values())
+    return sum(weight * query_weight * search_engine.impact_indexes[weighting][field].scale / 2
+               for field, weight in WEIGHTS.items()) + 1e-9
+
+
+@pytest.mark.parametrize('engine_format', ENGINE_FORMATS)
+@pytest.mark.parametrize('method', ['OkapiBM25', 'ltc.lnn'])
+def test_full_budget_approximates_exhaustive_scoring(search_engines, engine_format, method):
+    search_engine = search_engines[engine_format]
+    for query in QUERIES:
+        exhaustive = dict(search_engine.search(query, method, WEIGHTS, max_results=None))
+        results = dict(search_engine.search(query, method, WEIGHTS, max_results=None, postings_budget=10 ** 6))
+        assert results.keys() == exhaustive.keys()
+        error_bound = get_error_bound(search_engine, method, query)
+        assert all(abs(results[document_id] - score) <= error_bound for document_id, score in exhaustive.items())
+
+
+@pytest.mark.parametrize('engine_format', ENGINE_FORMATS)
+def test_budget_limits_the_scored_documents(search_engines, engine_format):
+    search_engine = search_engines[engine_format]
+    query = ['w0', 'w1', 'drama']
+    exhaustive = dict(search_engine.search(query, 'OkapiBM25', WEIGHTS, max_results=None))
+    for postings_budget in (0, 1, 10, 100):
+        results = search_engine.search(query, 'OkapiBM25', WEIGHTS, max_results=None, postings_budget=postings_budget)
+        assert len(results) <= postings_budget
+        assert {document_id for document_id, _ in results} <= exhaustive.keys()
+        top_results = search_engine.search(query, 'OkapiBM25', WEIGHTS, max_results=5, postings_budget=postings_budget)
+        assert top_results == results[:5]
+
+
+def test_unsupported_weighting(search_engines):
+    with pytest.raises(ValueError):
+        search_engines['binary'].search(['w0'], 'lnc.ltc', WEIGHTS, postings_budget=10)
@@ -0,0 +1,97 @@
+import json
+
+import pytest
+
+from Logic.core.indexer.document_lengths_index import DocumentLengthsIndex
+from Logic.core.indexer.index import FORMAT_VERSION, INVERTED_INDEXES, Index, get_term_frequencies
+from Logic.core.indexer.index_reader import Index_reader
+from Logic.core.indexer.indexes_enum import Indexes, Index_types
+from Logic.core.indexer.metadata_index import Metadata_index, read_metadata_index
+
+
+def test_lengths_are_counted_in_tokens(index, live_documents):
+    metadata_index = index.get_metadata_index()
+    assert metadata_index['document_count'] == len(live_documents)
+    assert metadata_index['format_version'] == FORMAT_VERSION
+    for field in INVERTED_INDEXES:
+        lengths = {document['id']: sum(get_term_frequencies(document, field.value).values())
+                   for document in live_documents}
+        assert index.document_lengths[field.value] == lengths
+        assert index.total_field_lengths[field.value] == sum(lengths.values())
+        assert metadata_index['average_document_length'][field.value] == pytest.approx(
+            sum(lengths.values()) / len(lengths))
+
+
+def test_a_summary_is_as_long_as_its_words():
+    document = {'id': 'tt0000001', 'stars': ['tom hanks'], 'genres': [], 'summaries': ['a man  runs', 'a dog']}
+    assert [sum(get_term_frequencies(document, field.value).values()) for field in INVERTED_INDEXES] == [1, 0, 5]
+
+
+def test_indexes_read_from_the_documents_file_match(index, tmp_path):
+    path = f'{tmp_path}/'
+    index.store_index(path, Indexes.DOCUMENTS.value)
+    DocumentLengthsIndex(path)
+    metadata_index = Metadata_index(path).metadata_index
+
+    for field in INVERTED_INDEXES:
+        assert Index_reader(path, field, Index_types.DOCUMENT_LENGTH).index == index.document_lengths[field.value]
+    expected = index.get_metadata_index()
+    # the documents file only has the live documents, numbered in its order
+    assert metadata_index.pop('document_ids') == list(index.index[Indexes.DOCUMENTS.value])
+    del expected['document_ids']
+    assert metadata_index.pop('average_document_length') == pytest.approx(expected.pop('average_document_length'))
+    assert metadata_index == expected
+
+
+def test_indexes_of_an_older_format_are_rejected(index, tmp_path):
+    path = f'{tmp_path}/'
+    Metadata_index(path, index).store_metadata_index(path)
+    assert read_metadata_index(path) == index.get_metadata_index()
+
+    metadata_path = f'{path}{Indexes.DOCUMENTS.value}_{Index_types.METADATA.value}.json'
+    with open(metadata_path) as file:
+        metadata_index = json.load(file)
+    # version 1 had no format version and counted the lengths in characters
+    del metadata_index['format_version']
+    with open(metadata_path, 'w') as file:
+        json.dump(metadata_index, file)
+    with pytest.raises(ValueError, match='format version 1'):
+        read_metadata_index(path)
+
+
+def test_updates_match_a_fresh_build(documents):
+    index = Index(documents[:200])
+    live_documents = {document['id']: document for document in documents[:200]}
+    for document in documents[200:250]:
+        index.add_document_to_index(document)
+        live_documents[document['id']] = document
+    for document in documents[:200:3]:
+        index.remove_document_from_index(document['id'])
+        del live_documents[document['id']]
+    for document in documents[1:200:7]:
+        replacement = {**documents[-1], 'id': document['id']}
+        index.add_document_to_index(replacement)
+        live_documents[document['id']] = replacement
+    fresh_index = Index(list(live_documents.values()))
+
+    for field in INVERTED_INDEXES:
+        assert index.get_index_as_dict(field.value) == fresh_index.get_index_as_dict(field.value)
+    assert index.index[Indexes.DOCUMENTS.value] == fresh_index.index[Indexes.DOCUMENTS.value]
+    assert index.document_lengths == fresh_index.document_lengths
+    assert index.total_field_lengths == fresh_index.total_field_lengths
+    # the forward index is keyed by internal IDs, which differ between the two indexes
+    assert {index.doc_id_map.get_document_id(internal_id): forward_postings
+            for internal_id, forward_postings in index.forward_index.items()} == \
+           {fresh_index.doc_id_map.get_document_id(internal_id): forward_postings
+            for internal_id, forward_postings in fresh_index.forward_index.items()}
+
+
+def test_check_add_remove_is_correct(documents, monkeypatch):
+    index = Index(documents[:50])
+    index_before = {field.value: index.get_index_as_dict(field.value) for field in INVERTED_INDEXES}
+    index.check_add_remove_is_correct()
+    assert {field.value: index.get_index_as_dict(field.value) for field in INVERTED_INDEXES} == index_before
+
+    monkeypatch.setattr(index, 'remove_document_from_index', lambda document_id: None)
+    with pytest.raises(AssertionError, match='Remove is incorrect'):
+        index.check_add_remove_is_correct()
@@ -0,0 +1,51 @@
+import os
+
+import pytest
+
+from Logic.core.indexer.index import INVERTED_INDEXES, Index
+from Logic.core.indexer.index_builder import IndexBuilder
+from Logic.core.indexer.indexes_enum import Indexes, Index_formats
+from Logic.core.indexer.shared_index import publish_indexes
+from Logic.core.search import SearchEngine
+
+
+@pytest.fixture(scope='module')
+def corpus(documents):
+    """
+    The documents with a few of them indexed twice, the last version of which is kept.
+    """
+    return documents + [{**document, 'summaries': ['w59 w58']} for document in documents[:300:25]]
+
+
+@pytest.mark.parametrize('index_format', [Index_formats.BINARY, Index_formats.COMPRESSED])
+def test_sharded_build_serves_the_same_results(corpus, tmp_path, index_format):
+    built_path, expected_path = f'{tmp_path}/built/', f'{tmp_path}/expected/'
+    built_index = IndexBuilder(corpus, number_of_workers=2, shard_size=40).build(built_path, index_format)
+    expected_index = Index(list({document['id']: document for document in corpus}.values()))
+    publish_indexes(expected_index, expected_path, index_format)
+    assert set(os.listdir(built_path)) == set(os.listdir(expected_path)) | {f'{Indexes.DOCUMENTS.value}.json'}
+
+    for field in INVERTED_INDEXES:
+        assert built_index.get_index_as_dict(field.value) == expected_index.get_index_as_dict(field.value)
+    assert built_index.get_metadata_index() == expected_index.get_metadata_index()
+    built_engine, expected_engine = SearchEngine(built_path, index_format), SearchEngine(expected_path, index_format)
+    weights = {Indexes.STARS: 1, Indexes.GENRES: 0.5, Indexes.SUMMARIES: 1}
+    for method in ('lnc.ltc', 'ltn.lnn', 'OkapiBM25', 'BM25F'):
+        for query in (['w0'], ['w1', 'w2', 'drama'], ['w7', 'tom hanks', 'not-a-term']):
+            assert dict(built_engine.search(query, method, weights, max_results=None)) == \
+                   pytest.approx(dict(expected_engine.search(query, method, weights, max_results=None)))
+    built_engine.close()
+    expected_engine.close()
+
+
+def test_built_index_can_be_updated(corpus, tmp_path):
+    index = IndexBuilder(corpus[:100], number_of_workers=2, shard_size=30).build(f'{tmp_path}/')
+    for document in corpus[:100:4]:
+        index.remove_document_from_index(document['id'])
+    index.add_document_to_index(corpus[150])
+    expected_index = Index([document for position, document in enumerate(corpus[:100]) if position % 4] +
+                           [corpus[150]])
+
+    for field in INVERTED_INDEXES:
+        assert index.get_index_as_dict(field.value) == expected_index.get_index_as_dict(field.value)
+    assert index.document_lengths == expected_index.document_lengths
@@ -0,0 +1,103 @@
+import pytest
+
+from Logic.core.indexer.binary_index import BinaryIndex, BinaryIndexWriter
+from Logic.core.indexer.compression_benchmark import benchmark, decode_all
+from Logic.core.indexer.doc_id_map import DocIdMap
+from Logic.core.indexer.index import INVERTED_INDEXES, get_field_tokens
+from Logic.core.indexer.index_reader import Index_reader
+from Logic.core.indexer.indexes_enum import Indexes, Index_formats
+from Logic.core.indexer.positional_index import get_term_positions
+
+
+@pytest.mark.parametrize('index_format', [Index_formats.BINARY, Index_formats.COMPRESSED])
+@pytest.mark.parametrize('field', INVERTED_INDEXES)
+def test_stored_index_reads_like_the_json_index(index, index_paths, index_format, field):
+    binary_index = Index_reader(index_paths[index_format], field, index_format=index_format).index
+    json_index = Index_reader(index_paths[Index_formats.JSON], field).index
+    doc_id_map = DocIdMap(binary_index.get_document_ids())
+
+    assert json_index == index.get_index_as_dict(field.value)
+    # every field shares the numbering of the index
+    assert doc_id_map.document_ids == index.doc_id_map.document_ids
+    assert {term: postings.to_dict(doc_id_map) for term, postings in binary_index.items()} == json_index
+    # the terms are kept in UTF-8 byte order for the binary search
+    assert list(binary_index) == sorted(json_index, key=lambda term: term.encode('utf-8'))
+    for term in json_index:
+        doc_ids = list(binary_index.get_posting_arrays(term)[0])
+        assert doc_ids == sorted(doc_ids)
+    assert 'not-a-term' not in binary_index
+    assert binary_index.get_posting_arrays('not-a-term') is None
+    binary_index.close()
+
+
+def test_terms_are_looked_up_by_byte_order(tmp_path):
+    path = str(tmp_path / 'terms.bin')
+    writer = BinaryIndexWriter(path, ['tt0000002', 'tt0000001'])
+    for term in ('Zeta', 'alpha', 'été'):
+        writer.add(term, [0, 1], [3, 1])
+    writer.close()
+
+    binary_index = BinaryIndex(path)
+    assert [binary_index.find_term(term) for term in ('Zeta', 'alpha', 'été', 'beta')] == [0, 1, 2, -1]
+    # postings refer to documents by their position in the doc table
+    assert binary_index['été'].to_dict(DocIdMap(binary_index.get_document_ids())) == {'tt0000002': 3, 'tt0000001': 1}
+    binary_index.close()
+
+
+def test_terms_out_of_order_are_rejected(tmp_path):
+    writer = BinaryIndexWriter(str(tmp_path / 'terms.bin'), ['tt0000001'])
+    writer.add('b', [0], [1])
+    with pytest.raises(ValueError, match='ascending order'):
+        writer.add('a', [0], [1])
+    with pytest.raises(ValueError, match='different lengths'):
+        writer.add('c', [0], [1, 2])
+
+
+def test_documents_can_not_be_stored_in_the_binary_format(index, tmp_path):
+    with pytest.raises(ValueError):
+        index.store_index(f'{tmp_path}/', Indexes.DOCUMENTS.value, Index_formats.BINARY)
+
+
+def test_compressed_posting_lists_look_up_documents(index_paths):
+    compressed_index = Index_reader(index_paths[Index_formats.COMPRESSED], Indexes.SUMMARIES,
+                                    index_format=Index_formats.COMPRESSED).index
+    # the most frequent terms span several blocks
+    for term in ('w0', 'w1', 'w59'):
+        postings = compressed_index[term]
+        doc_ids, tfs = list(postings.doc_ids), list(postings.tfs)
+        for position, (doc_id, tf) in enumerate(zip(doc_ids, tfs)):
+            assert postings.find(doc_id) == position
+            assert postings[doc_id] == tf
+            assert postings.get(doc_id + 1) == (tfs[position + 1] if doc_id + 1 in doc_ids else None)
+        assert len(postings) == len(doc_ids)
+    del postings
+    compressed_index.close()
+
+
+def test_positional_index_keeps_the_token_offsets(live_documents, index_paths):
+    positional_index = Index_reader(index_paths[Index_formats.BINARY], Indexes.SUMMARIES,
+                                    index_format=Index_formats.POSITIONAL).index
+    doc_id_map = DocIdMap(positional_index.get_document_ids())
+    for document in live_documents:
+        internal_id = doc_id_map.get_internal_id(document['id'])
+        for term, positions in get_term_positions(get_field_tokens(document, Indexes.SUMMARIES.value)).items():
+            postings = positional_index.get_posting_list(term)
+            assert postings[internal_id] == len(positions)
+            assert list(postings.get_positions(internal_id)) == list(positions)
+    assert positional_index.get_posting_list('not-a-term') is None
+    del postings
+    positional_index.close()
+
+
+def test_compression_benchmark_reads_every_posting(index, tmp_path):
+    results = benchmark(index, str(tmp_path), repeats=1)
+
+    assert set(results) == {field.value for field in INVERTED_INDEXES}
+    for field, formats in results.items():
+        binary, compressed = formats[Index_formats.BINARY.value], formats[Index_formats.COMPRESSED.value]
+        assert set(formats) == {Index_formats.JSON.value, Index_formats.BINARY.value, Index_formats.COMPRESSED.value}
+        json_index = Index_reader(f'{tmp_path}/', Indexes(field), index_format=Index_formats.JSON).index
+        assert decode_all(json_index) == sum(len(postings) for postings in index.index[field].values())
+        # the blocks of doc ID gaps take less room than the raw arrays
+        assert compressed['bytes_per_posting'] < binary['bytes_per_posting']
+        assert all(result['postings_per_second'] > 0 for result in formats.values())
@@ -0,0 +1,76 @@
+import os
+
+import pytest
+
+from Logic.core.indexer.index import INVERTED_INDEXES
+from Logic.core.indexer.indexes_enum import Indexes, Index_formats
+from Logic.core.search import SearchEngine
+from conftest import store_indexes
+
+
+@pytest.fixture
+def engine_path(index, tmp_path):
+    """
+    A copy of the binary indexes of its own, so that the files mapped by other tests do not count.
+    """
+    path = f'{tmp_path}/'
+    store_indexes(index, path, Index_formats.BINARY)
+    return path
+
+
+def get_mapped_files(path):
+    """
+    The files of a directory that are memory-mapped by this process.
+    """
+    with open('/proc/self/maps') as maps:
+        return {os.path.basename(line.split()[-1]) for line in maps if line.rstrip().endswith('.bin') and path in line}
+
+
+def test_field_indexes_are_mapped_on_first_use(engine_path):
+    search_engine = SearchEngine(engine_path, Index_formats.BINARY)
+    assert search_engine.get_load_times() == {}
+    assert not any(search_engine.document_indexes.is_loaded(field.value) for field in INVERTED_INDEXES)
+    if os.path.exists('/proc/self/maps'):
+        assert get_mapped_files(engine_path) == set()
+
+    search_engine.search(['tom hanks'], 'lnc.ltc', {Indexes.STARS: 1})
+    assert search_engine.document_indexes.is_loaded(Indexes.STARS.value)
+    assert not search_engine.document_indexes.is_loaded(Indexes.SUMMARIES.value)
+    assert 'index:stars' in search_engine.get_load_times()
+    assert 'index:summaries' not in search_engine.get_load_times()
+    if os.path.exists('/proc/self/maps'):
+        assert f'{Indexes.STARS.value}.bin' in get_mapped_files(engine_path)
+        assert f'{Indexes.SUMMARIES.value}.bin' not in get_mapped_files(engine_path)
+
+
+@pytest.mark.parametrize('background', [False, True])
+def test_warmup_loads_every_field(engine_path, background):
+    search_engine = SearchEngine(engine_path, Index_formats.BINARY)
+    thread = search_engine.warmup(background=background)
+    if background:
+        thread.join()
+
+    for field in INVERTED_INDEXES:
+        assert search_engine.document_indexes.is_loaded(field.value)
+        for lazy_indexes in (search_engine.tiered_index, search_engine.document_lengths_index):
+            assert lazy_indexes.is_loaded(field)
+    assert search_engine.components.is_loaded('doc_id_map')
+    if os.path.exists('/proc/self/maps'):
+        assert {f'{field.value}.bin' for field in INVERTED_INDEXES} <= get_mapped_files(engine_path)
+
+    # the searches afterwards have nothing left to load
+    load_times = search_engine.get_load_times()
+    weights = {field: 1 for field in INVERTED_INDEXES}
+    search_engine.search(['w1', 'drama'], 'ltn.lnn', weights)
+    search_engine.search(['w1*', 'drama'], 'lnc.ltc', weights, required=['w1'])
+    assert search_engine.get_load_times() == load_times
+
+
+def test_warmup_of_some_fields(engine_path):
+    search_engine = SearchEngine(engine_path, Index_formats.BINARY)
+    search_engine.warmup([Indexes.GENRES], background=False)
+
+    assert search_engine.document_indexes.is_loaded(Indexes.GENRES.value)
+    assert search_engine.tiered_index.is_loaded(Indexes.GENRES)
+    assert not search_engine.document_indexes.is_loaded(Indexes.SUMMARIES.value)
+    assert not search_engine.tiered_index.is_loaded(Indexes.SUMMARIES)
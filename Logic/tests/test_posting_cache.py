@@ -0,0 +1,113 @@
+import pytest
+
+from Logic.core.indexer.index_reader import Index_reader
+from Logic.core.indexer.indexes_enum import Indexes, Index_formats
+from Logic.core.indexer.posting_cache import ENTRY_OVERHEAD, PostingCache
+from Logic.core.search import SearchEngine
+
+WEIGHTS = {Indexes.STARS: 1, Indexes.GENRES: 0.5, Indexes.SUMMARIES: 1}
+QUERIES = [['w0', 'w1'], ['w3', 'drama', 'not-a-term'], ['w0', 'w1'], ['w1*', 'tom hanks'], ['w3', 'drama']]
+
+
+def get_segments(posting_cache):
+    return list(posting_cache.probation), list(posting_cache.protected)
+
+
+def test_entries_read_again_are_protected():
+    posting_cache = PostingCache(max_bytes=1000, protected_fraction=0.5)
+    for key in 'abc':
+        posting_cache.put(key, key.upper(), 100)
+    assert posting_cache.get('stars', 'a') == 'A'
+    for key in 'defghijk':
+        posting_cache.put(key, key.upper(), 100)
+
+    # the entries read once are evicted first
+    assert get_segments(posting_cache) == (list('cdefghijk'), ['a'])
+    assert posting_cache.get('stars', 'b') is None
+    assert posting_cache.get('stars', 'a') == 'A'
+    assert posting_cache.get_stats()['bytes'] <= 1000
+
+
+def test_protected_overflow_goes_back_to_probation():
+    posting_cache = PostingCache(max_bytes=1000, protected_fraction=0.3)
+    for key in 'abcd':
+        posting_cache.put(key, key, 100)
+        posting_cache.get('stars', key)
+
+    probation, protected = get_segments(posting_cache)
+    assert protected == ['b', 'c', 'd']
+    assert probation == ['a']
+    assert posting_cache.get_stats()['bytes'] == 400
+
+
+def test_entries_larger_than_probation_are_not_cached():
+    posting_cache = PostingCache(max_bytes=1000, protected_fraction=0.8)
+    posting_cache.put('a', 'A', 201)
+    posting_cache.put('b', 'B', 200)
+
+    assert posting_cache.get('stars', 'a') is None
+    assert posting_cache.get('stars', 'b') == 'B'
+
+
+@pytest.mark.parametrize('index_format', [Index_formats.BINARY, Index_formats.COMPRESSED, Index_formats.POSITIONAL])
+def test_cached_index_returns_the_stored_posting_lists(index_paths, index_format):
+    path = index_paths[Index_formats.COMPRESSED if index_format == Index_formats.COMPRESSED else Index_formats.BINARY]
+    posting_cache = PostingCache()
+    cached_index = Index_reader(path, Indexes.SUMMARIES, index_format=index_format, posting_cache=posting_cache).index
+    stored_index = Index_reader(path, Indexes.SUMMARIES, index_format=index_format).index
+
+    terms = list(stored_index)
+    for _ in range(2):
+        for term in terms:
+            postings, stored_postings = cached_index.get_posting_list(term), stored_index.get_posting_list(term)
+            assert list(postings.items()) == list(stored_postings.items())
+            assert cached_index.get_document_frequency(term) == stored_index.get_document_frequency(term)
+            if index_format == Index_formats.POSITIONAL:
+                document = stored_postings.doc_ids[0]
+                assert list(postings.get_positions(document)) == list(stored_postings.get_positions(document))
+    stats = posting_cache.get_stats()[Indexes.SUMMARIES.value]
+    # the posting list and the ordinal of every term miss once, the document frequency then reads the cached ordinal
+    assert (stats['hits'], stats['misses']) == (3 * len(terms), 2 * len(terms))
+
+    cached_index.close()
+    assert posting_cache.get_stats()['entries'] == 0
+    # released first, so that closing unmaps the file right away
+    del postings, stored_postings
+    stored_index.close()
+
+
+def test_absent_terms_are_cached(index_paths):
+    posting_cache = PostingCache()
+    cached_index = Index_reader(index_paths[Index_formats.BINARY], Indexes.GENRES, index_format=Index_formats.BINARY,
+                                posting_cache=posting_cache).index
+    for _ in range(3):
+        assert cached_index.get_posting_list('not-a-term') is None
+        assert 'not-a-term' not in cached_index
+    stats = posting_cache.get_stats()
+    assert (stats[Indexes.GENRES.value]['hits'], stats[Indexes.GENRES.value]['misses']) == (5, 2)
+    assert stats['bytes'] == 2 * (ENTRY_OVERHEAD + len('not-a-term'))
+    cached_index.close()
+
+
+@pytest.mark.parametrize('index_format', [Index_formats.BINARY, Index_formats.COMPRESSED])
+@pytest.mark.parametrize('positional', [False, True])
+@pytest.mark.parametrize('max_bytes', [2000, 64 * 1024 * 1024])
+def test_searches_with_a_posting_cache_are_the_same(search_engines, index_paths, index_format, positional, max_bytes):
+    posting_cache = PostingCache(max_bytes)
+    search_engine = SearchEngine(index_paths[index_format], index_format, positional=positional,
+                                 posting_cache=posting_cache)
+    expected_engine = search_engines['compressed' if index_format == Index_formats.COMPRESSED else 'binary']
+
+    for method in ('lnc.ltc', 'OkapiBM25', 'BM25F'):
+        for query in QUERIES:
+            for pruning in (None, 'maxscore', 'bmw'):
+                assert search_engine.search(query, method, WEIGHTS, max_results=10, pruning=pruning) == \
+                       expected_engine.search(query, method, WEIGHTS, max_results=10, pruning=pruning)
+    if positional:
+        assert search_engine.search(['w0', 'w1'], 'lnc.ltc', WEIGHTS, phrase=['w0', 'w1']) == \
+               search_engines['positional'].search(['w0', 'w1'], 'lnc.ltc', WEIGHTS, phrase=['w0', 'w1'])
+    stats = posting_cache.get_stats()
+    assert stats['bytes'] <= max_bytes
+    assert stats[Indexes.SUMMARIES.value]['hits'] > 0
+    search_engine.close()
+    assert posting_cache.get_stats()['entries'] == 0
@@ -0,0 +1,170 @@
+import pytest
+
+from Logic.core.indexer.index import Index, INVERTED_INDEXES
+from Logic.core.indexer.indexes_enum import Indexes, Index_formats
+from Logic.core.indexer.segment_index import SegmentedIndex
+from Logic.core.indexer.snapshot import publish_snapshot
+from Logic.core.search import SearchEngine, SnapshotSearchEngine
+from Logic.core.utility.query_cache import QueryCache
+from conftest import store_json_indexes
+
+WEIGHTS = {field: 1 for field in INVERTED_INDEXES}
+
+
+class FakeClock:
+    def __init__(self):
+        self.time = 0.0
+
+    def __call__(self):
+        return self.time
+
+
+def test_least_recently_used_results_are_evicted():
+    query_cache = QueryCache(max_entries=2, ttl=None)
+    query_cache.put('a', [('tt1', 1.0)])
+    query_cache.put('b', [('tt2', 1.0)])
+    assert query_cache.get('a') == [('tt1', 1.0)]
+    query_cache.put('c', [('tt3', 1.0)])
+
+    assert query_cache.get('b') is None
+    assert query_cache.get('a') == [('tt1', 1.0)]
+    assert query_cache.get('c') == [('tt3', 1.0)]
+    stats = query_cache.get_stats()
+    assert (stats['hits'], stats['misses'], stats['evictions'], stats['entries']) == (3, 1, 1, 2)
+    assert stats['hit_rate'] == 0.75
+
+
+def test_results_expire():
+    clock = FakeClock()
+    query_cache = QueryCache(ttl=10, clock=clock)
+    query_cache.put('a', [('tt1', 1.0)])
+    clock.time = 9.9
+    assert query_cache.get('a') == [('tt1', 1.0)]
+    clock.time = 10
+    assert query_cache.get('a') is None
+    assert query_cache.get_stats()['expirations'] == 1
+    assert query_cache.get_stats()['entries'] == 0
+
+
+def test_results_of_another_version_are_not_served():
+    query_cache = QueryCache()
+    query_cache.put('a', [('tt1', 1.0)], version=1)
+    assert query_cache.get('a', version=2) is None
+    # the stale entry is dropped
+    assert query_cache.get('a', version=1) is None
+    query_cache.put('a', [('tt1', 2.0)], version=2)
+    query_cache.invalidate()
+    assert query_cache.get('a', version=2) is None
+
+
+def test_cached_results_can_not_be_changed():
+    query_cache = QueryCache()
+    results = [('tt1', 1.0)]
+    query_cache.put('a', results)
+    results.append(('tt2', 0.5))
+    query_cache.get('a').append(('tt3', 0.1))
+    assert query_cache.get('a') == [('tt1', 1.0)]
+
+
+def test_keys():
+    key = QueryCache.get_key(['w1', 'w2'], 'lnc.ltc', WEIGHTS, True, 10, phrase=['w1', 'w2'], slop=0)
+
+    assert key == QueryCache.get_key(['w1', 'w2'], 'lnc.ltc', {field.value: 1 for field in INVERTED_INDEXES}, True,
+                                     10, slop=0, phrase=['w1', 'w2'])
+    # the order of the terms and fields is the order their scores are added in
+    assert key != QueryCache.get_key(['w2', 'w1'], 'lnc.ltc', WEIGHTS, True, 10, phrase=['w1', 'w2'], slop=0)
+    assert key != QueryCache.get_key(['w1', 'w2'], 'lnc.ltc', dict(reversed(WEIGHTS.items())), True, 10,
+                                     phrase=['w1', 'w2'], slop=0)
+    assert key != QueryCache.get_key(['w1', 'w2'], 'lnc.ltc', WEIGHTS, True, 10, phrase=['w1', 'w2'], slop=1)
+    assert key != QueryCache.get_key(['w1', 'w2'], 'lnc.ltc', WEIGHTS, True, 5, phrase=['w1', 'w2'], slop=0)
+    hash(key)
+
+
+def test_search_engine_serves_cached_results(index_paths):
+    query_cache = QueryCache()
+    search_engine = SearchEngine(index_paths[Index_formats.BINARY], Index_formats.BINARY, query_cache=query_cache)
+    expected = search_engine.find_results(['w1', 'drama'], 'lnc.ltc', WEIGHTS, max_results=10)
+
+    for _ in range(3):
+        assert search_engine.search(['w1', 'drama'], 'lnc.ltc', WEIGHTS, max_results=10) == expected
+    assert search_engine.search(['w1', 'drama'], 'lnc.ltc', WEIGHTS, max_results=5) == expected[:5]
+    search_engine.search(['w1', 'drama'], 'lnc.ltc', WEIGHTS, max_results=None)
+    stats = query_cache.get_stats()
+    assert (stats['hits'], stats['misses'], stats['entries']) == (2, 2, 2)
+    search_engine.close()
+
+
+def test_segment_updates_invalidate_cached_results(documents, tmp_path):
+    query_cache = QueryCache()
+    segmented_index = SegmentedIndex(str(tmp_path), memtable_size=20, background_merge=False)
+    for document in documents[:50]:
+        segmented_index.add_document(document)
+    search_engine = SearchEngine(segmented_index=segmented_index, query_cache=query_cache)
+    query = ['w5', 'crime']
+    results = search_engine.search(query, 'ltn.lnn', WEIGHTS, max_results=100)
+    assert search_engine.search(query, 'ltn.lnn', WEIGHTS, max_results=100) == results
+
+    added = {**documents[60], 'summaries': ['w5 w5 w5'], 'genres': ['crime']}
+    segmented_index.add_document(added)
+    results = search_engine.search(query, 'ltn.lnn', WEIGHTS, max_results=100)
+    assert added['id'] in dict(results)
+    assert results == search_engine.find_results(query, 'ltn.lnn', WEIGHTS, max_results=100)
+
+    segmented_index.remove_document(added['id'])
+    assert added['id'] not in dict(search_engine.search(query, 'ltn.lnn', WEIGHTS, max_results=100))
+    assert query_cache.get_stats()['hits'] == 1
+    segmented_index.close()
+
+
+def test_snapshot_swaps_invalidate_cached_results(documents, tmp_path):
+    query_cache = QueryCache()
+    root = str(tmp_path)
+    publish_snapshot(root, Index(documents[:150], [Indexes.SUMMARIES]))
+    search_engine = SnapshotSearchEngine(root, query_cache=query_cache)
+    first = search_engine.search(['w1'], 'lnc.ltc', WEIGHTS, max_results=10)
+    assert search_engine.search(['w1'], 'lnc.ltc', WEIGHTS, max_results=10) == first
+
+    publish_snapshot(root, Index(documents[150:], [Indexes.SUMMARIES]))
+    search_engine.reload(background=False)
+    assert query_cache.get_stats()['entries'] == 0
+    second = search_engine.search(['w1'], 'lnc.ltc', WEIGHTS, max_results=10)
+    with search_engine.acquire() as snapshot_engine:
+        assert second == snapshot_engine.find_results(['w1'], 'lnc.ltc', WEIGHTS, max_results=10)
+    assert second != first
+    search_engine.close()
+
+
+def test_search_engines_sharing_a_cache_keep_their_results(index_paths):
+    query_cache = QueryCache()
+    path = index_paths[Index_formats.BINARY]
+    search_engines = [
+        SearchEngine(path, Index_formats.BINARY, query_cache=query_cache),
+        SearchEngine(path, Index_formats.BINARY, query_cache=query_cache, bm25_parameters={'stars': (0.5, 0.1)}),
+        SearchEngine(index_paths[Index_formats.JSON], query_cache=query_cache, bm25_parameters={'stars': (0.5, 0.1)}),
+        SearchEngine(path, Index_formats.BINARY, query_cache=query_cache, positional=True),
+    ]
+    query = ['w1', 'tom hanks']
+    for _ in range(2):
+        for search_engine in search_engines:
+            assert search_engine.search(query, 'OkapiBM25', WEIGHTS, max_results=10) == \
+                   search_engine.find_results(query, 'OkapiBM25', WEIGHTS, max_results=10)
+    stats = query_cache.get_stats()
+    assert (stats['hits'], stats['misses'], stats['entries']) == (4, 4, 4)
+    for search_engine in search_engines:
+        search_engine.close()
+
+
+def test_indexes_stored_again_invalidate_cached_results(documents, tmp_path):
+    query_cache = QueryCache()
+    path = f'{tmp_path}/'
+    store_json_indexes(Index(documents[:100]), path)
+    search_engine = SearchEngine(path, query_cache=query_cache)
+    search_engine.search(['w1'], 'lnc.ltc', WEIGHTS)
+    version = search_engine.get_cache_version()
+
+    store_json_indexes(Index(documents[100:]), path)
+    assert search_engine.get_cache_version() != version
+    search_engine.search(['w1'], 'lnc.ltc', WEIGHTS)
+    stats = query_cache.get_stats()
+    assert (stats['hits'], stats['misses'], stats['expirations']) == (0, 2, 1)
+    search_engine.close()
@@ -0,0 +1,246 @@
+import filecmp
+import json
+import math
+import shutil
+from collections import Counter
+
+import pytest
+
+from Logic.core.indexer.index import INVERTED_INDEXES, get_field_tokens, get_term_frequencies
+from Logic.core.indexer.indexes_enum import Indexes, Index_formats, Index_types
+from Logic.core.indexer.positional_index import contains_phrase
+from Logic.core.indexer.posting_list import FieldIndex, PostingList
+from Logic.core.indexer.score_bounds import ScoreBounds, get_score_bounds_path
+from Logic.core.search import SearchEngine
+from Logic.core.utility.scorer import Scorer
+from conftest import BM25_PARAMETERS, ENGINE_FORMATS
+
+PRUNINGS = ['maxscore', 'wand', 'bmw']
+PRUNED_METHODS = ['lnc.ltc', 'ltn.lnn', 'nnn.nnn', 'ltc.lnc', 'OkapiBM25']
+PRUNED_QUERIES = [['w1'], ['w0', 'w2', 'w10', 'drama'], ['w3', 'w3', 'w45', 'w59', 'tom hanks'], ['comedy'],
+                  ['not-a-term', 'w7']]
+PRUNED_WEIGHTS = [{field: 1 for field in INVERTED_INDEXES},
+                  {Indexes.STARS: 2, Indexes.GENRES: 0, Indexes.SUMMARIES: 0.5}]
+
+
+def get_document_scores(search_engine, query, method, weights):
+    """
+    {IMDb ID: score} of every document matching the query.
+    """
+    return dict(search_engine.search(query, method, weights, max_results=None))
+
+
+def assert_ranked(results):
+    """
+    Checks that the results are sorted by score and then by IMDb ID.
+    """
+    assert results == sorted(results, key=lambda result: (-result[1], result[0]))
+
+
+@pytest.mark.parametrize('weights', [{field: 1 for field in INVERTED_INDEXES},
+                                     {Indexes.STARS: 2, Indexes.GENRES: 0, Indexes.SUMMARIES: 0.5}])
+def test_vector_space_scores_match_the_formula(search_engines, live_documents, weights):
+    """
+    With nnn.nnn, the score of a field is the dot product of the query and document tfs.
+    """
+    query = ['w1', 'w1', 'w4', 'drama', 'meryl streep']
+    expected = {}
+    for document in live_documents:
+        score = sum(weight * query_tf * get_term_frequencies(document, field.value).get(term, 0)
+                    for field, weight in weights.items() for term, query_tf in Counter(query).items())
+        if score:
+            expected[document['id']] = score
+
+    for search_engine in search_engines.values():
+        scores = get_document_scores(search_engine, query, 'nnn.nnn', weights)
+        assert {document_id: score for document_id, score in scores.items() if score} == pytest.approx(expected)
+
+
+def test_cosine_normalization_covers_every_document_term(search_engines, live_documents):
+    """
+    With lnc, a posting is weighted by 1 + log(tf) divided by the norm of the whole document vector.
+    """
+    weights = {field: 1 for field in INVERTED_INDEXES}
+    query = ['w0', 'w5', 'crime', 'tom hanks']
+    expected = {}
+    for document in live_documents:
+        score = 0
+        for field in INVERTED_INDEXES:
+            term_frequencies = get_term_frequencies(document, field.value)
+            norm = math.sqrt(sum((1 + math.log(tf)) ** 2 for tf in term_frequencies.values()))
+            score += sum(1 + math.log(term_frequencies[term]) for term in query if term in term_frequencies) / \
+                (norm or 1)
+        if score:
+            expected[document['id']] = score
+
+    for search_engine in search_engines.values():
+        scores = get_document_scores(search_engine, query, 'lnc.nnn', weights)
+        assert {document_id: score for document_id, score in scores.items() if score} == pytest.approx(expected)
+
+
+@pytest.mark.parametrize('method', ['lnc.ltc', 'ltn.lnn', 'ltc.lnc', 'nnc.nnc', 'lnn.ntn'])
+def test_formats_give_the_same_scores(search_engines, method):
+    weights = {field: 1 for field in INVERTED_INDEXES}
+    for query in (['w1'], ['w0', 'w2', 'w10', 'drama'], ['w3', 'w3', 'w45', 'tom hanks'], ['not-a-term']):
+        expected = get_document_scores(search_engines['json'], query, method, weights)
+        for name in ('binary', 'compressed'):
+            assert get_document_scores(search_engines[name], query, method, weights) == pytest.approx(expected)
+
+
+@pytest.mark.parametrize('engine_format', ENGINE_FORMATS)
+@pytest.mark.parametrize('method', PRUNED_METHODS)
+@pytest.mark.parametrize('pruning', PRUNINGS)
+def test_pruned_search_matches_exhaustive_scoring(search_engines, engine_format, method, pruning):
+    search_engine = search_engines[engine_format]
+    for weights in PRUNED_WEIGHTS:
+        for query in PRUNED_QUERIES:
+            exhaustive = search_engine.search(query, method, weights, max_results=None)
+            assert_ranked(exhaustive)
+            for max_results in (1, 3, 10, 50, 1000):
+                assert search_engine.search(query, method, weights, max_results=max_results, pruning=pruning) == \
+                       exhaustive[:max_results], (query, weights, max_results)
+
+
+def test_some_queries_are_not_pruned(search_engines):
+    search_engine = search_engines['binary']
+    weights = {field: 1 for field in INVERTED_INDEXES}
+    assert search_engine.find_scores_with_pruning(['w1'], 'BM25F', weights, 10, 'maxscore') is None
+    assert search_engine.find_scores_with_pruning(['w1'], 'lnc.ltc', {Indexes.STARS: -1}, 10, 'wand') is None
+    assert search_engine.find_scores_with_pruning(['w1'], 'lnc.ltc', weights, 10, 'bmw') is not None
+
+
+@pytest.mark.parametrize('engine_format', ENGINE_FORMATS)
+def test_ties_are_broken_by_imdb_id(search_engines, live_documents, engine_format):
+    search_engine = search_engines[engine_format]
+    weights = {Indexes.GENRES: 1}
+    dramas = sorted(document['id'] for document in live_documents if 'drama' in document['genres'])
+    for pruning in [None] + PRUNINGS:
+        # every drama has the same score
+        results = search_engine.search(['drama'], 'nnn.nnn', weights, max_results=5, pruning=pruning)
+        assert results == [(document_id, 1.0) for document_id in dramas[:5]]
+
+
+
+def test_every_indexed_field_is_scored():
+    index = {Indexes.SUMMARIES.value: FieldIndex({'w1': PostingList([0, 2], [1, 3])}),
+             'directors': FieldIndex({'nolan': PostingList([1, 2], [1, 1])})}
+    scores = Scorer(index, 3).compute_scores_with_vector_space_model(['w1', 'nolan'], 'nnn.nnn')
+
+    assert scores.documents.tolist() == [0, 1, 2]
+    assert {field: field_scores.tolist() for field, field_scores in scores.field_scores.items()} == \
+           {Indexes.SUMMARIES.value: [1, 0, 3], 'directors': [0, 1, 1]}
+
+def test_score_bounds_are_stored_in_every_format(index_paths, monkeypatch):
+    # nothing is computed when the indexes are loaded
+    monkeypatch.setattr(ScoreBounds, 'from_posting_lists', None)
+    for index_format, path in index_paths.items():
+        search_engine = SearchEngine(path, index_format)
+        score_bounds = search_engine.get_score_bounds({field: 1 for field in INVERTED_INDEXES})
+        assert all(isinstance(field_bounds, ScoreBounds) for field_bounds in score_bounds.values())
+        search_engine.close()
+        for field in INVERTED_INDEXES:
+            # the same internal IDs and term order in every format
+            assert filecmp.cmp(get_score_bounds_path(path, field.value),
+                               get_score_bounds_path(index_paths[Index_formats.BINARY], field.value), shallow=False)
+
+
+def test_json_indexes_keep_the_stored_internal_ids(index, index_paths):
+    search_engines = [SearchEngine(index_paths[Index_formats.JSON]), SearchEngine(index_paths[Index_formats.JSON])]
+    search_engines[0].warmup([Indexes.SUMMARIES], background=False)
+    search_engines[1].warmup([Indexes.GENRES], background=False)
+
+    # the internal IDs the norms and score bounds were stored by, whatever the load order
+    for search_engine in search_engines:
+        assert search_engine.doc_id_map.document_ids == index.doc_id_map.document_ids
+        search_engine.close()
+
+
+@pytest.mark.parametrize('method', PRUNED_METHODS)
+def test_indexes_without_the_internal_ids_are_not_pruned(search_engines, index_paths, tmp_path, method):
+    """
+    Without the stored internal IDs, the ones of JSON indexes are given in
+    the order the fields are loaded in, and the score bounds are not used.
+    """
+    path = f'{tmp_path}/'
+    shutil.copytree(index_paths[Index_formats.JSON], path, dirs_exist_ok=True)
+    metadata_path = f'{path}{Indexes.DOCUMENTS.value}_{Index_types.METADATA.value}.json'
+    with open(metadata_path) as file:
+        metadata_index = json.load(file)
+    del metadata_index['document_ids']
+    with open(metadata_path, 'w') as file:
+        json.dump(metadata_index, file)
+    engines = [SearchEngine(path, bm25_parameters=BM25_PARAMETERS) for _ in range(2)]
+    engines[0].warmup([Indexes.SUMMARIES], background=False)
+    engines[1].warmup([Indexes.GENRES], background=False)
+    assert [engines[0].doc_id_map.get_internal_id(f'tt{number:07d}') for number in range(300)] != \
+           [engines[1].doc_id_map.get_internal_id(f'tt{number:07d}') for number in range(300)]
+
+    for weights in PRUNED_WEIGHTS:
+        for query in PRUNED_QUERIES:
+            expected = get_document_scores(search_engines['json'], query, method, weights)
+            for search_engine in engines:
+                assert search_engine.find_scores_with_pruning(query, method, weights, 7, 'maxscore') is None
+                assert get_document_scores(search_engine, query, method, weights) == pytest.approx(expected)
+    for search_engine in engines:
+        search_engine.close()
+
+
+@pytest.mark.parametrize('phrase', [['w0', 'w1'], ['w0', 'w1', 'w0']])
+@pytest.mark.parametrize('slop', [0, 2])
+def test_phrase_queries(search_engines, live_documents, phrase, slop):
+    weights = {Indexes.SUMMARIES: 1}
+    expected = set()
+    for document in live_documents:
+        tokens = get_field_tokens(document, Indexes.SUMMARIES.value)
+        window = len(phrase) + slop
+        for start in range(len(tokens)):
+            if slop == 0 and tokens[start:start + len(phrase)] == phrase or \
+                    slop and not Counter(phrase) - Counter(tokens[start:start + window]):
+                expected.add(document['id'])
+
+    results = search_engines['positional'].search(phrase, 'lnc.ltc', weights, max_results=None, phrase=phrase,
+                                                  slop=slop)
+    assert set(dict(results)) == expected
+    with pytest.raises(ValueError):
+        search_engines['binary'].search(phrase, 'lnc.ltc', weights, phrase=phrase)
+
+
+def test_repeated_phrase_terms_need_their_own_occurrences():
+    # 'a b a' within a window of 5 tokens: a single 'a' can not fill both of its slots
+    assert not contains_phrase([[0], [1], [0]], slop=2)
+    assert contains_phrase([[0, 4], [1], [0, 4]], slop=2)
+    assert not contains_phrase([[0, 5], [1], [0, 5]], slop=2)
+
+
+@pytest.mark.parametrize('engine_format', ['json', 'binary', 'compressed', 'positional'])
+def test_boolean_queries(search_engines, live_documents, engine_format):
+    search_engine = search_engines[engine_format]
+    weights = {field: 1 for field in INVERTED_INDEXES}
+    term_sets = {document['id']: {term for field in INVERTED_INDEXES
+                                  for term in get_field_tokens(document, field.value)} for document in live_documents}
+
+    conjunctive = search_engine.search(['w1', 'w2'], 'ltn.lnn', weights, max_results=None, conjunctive=True)
+    assert set(dict(conjunctive)) == {document_id for document_id, terms in term_sets.items() if {'w1', 'w2'} <= terms}
+
+    filtered = search_engine.search(['w1', 'w2'], 'ltn.lnn', weights, max_results=None, required=['w3'],
+                                    excluded=['drama'])
+    assert set(dict(filtered)) == {document_id for document_id, terms in term_sets.items()
+                             if 'w3' in terms and 'drama' not in terms}
+
+
+def test_wildcards_match_the_terms_with_their_prefix(search_engines):
+    weights = {field: 1 for field in INVERTED_INDEXES}
+    search_engine = search_engines['compressed']
+    expanded = ['w1'] + [f'w{rank}' for rank in range(10, 20)]
+
+    assert search_engine.expand_wildcards(['drama', 'w1*', 'not-a-term*']) == ['drama'] + sorted(expanded)
+    assert search_engine.search(['w1*'], 'ltn.lnn', weights, max_results=None) == \
+           search_engine.search(expanded, 'ltn.lnn', weights, max_results=None)
+
+
+def test_cursors_gallop_to_the_next_document():
+    postings = PostingList(list(range(0, 1000, 3)), [1] * 334)
+    assert [postings.advance(doc_id) for doc_id in (0, 1, 3, 998, 1000)] == [0, 1, 1, 333, 334]
+    # searching from a position never goes back
+    assert postings.advance(30, position=20) == 20
+    assert postings.intersect([2, 3, 4, 300, 301, 999, 1200]) == [3, 300, 999]
@@ -0,0 +1,185 @@
+import os
+import random
+
+import pytest
+
+from Logic.core.indexer.index import Index, INVERTED_INDEXES
+from Logic.core.indexer.segment_index import SegmentedIndex
+from Logic.core.search import SearchEngine
+from conftest import store_json_indexes
+
+
+def apply_random_updates(segmented_index, documents, count, seed=13, live_documents=None):
+    """
+    Adds, replaces and removes random documents.
+
+    Returns
+    -------
+    dict
+        {document_id: document} of the live documents afterwards, starting from live_documents.
+    """
+    generator = random.Random(seed)
+    live_documents = {} if live_documents is None else dict(live_documents)
+    for step in range(count):
+        document = dict(generator.choice(documents))
+        if live_documents and generator.random() < 0.2:
+            document_id = generator.choice(sorted(live_documents))
+            segmented_index.remove_document(document_id)
+            del live_documents[document_id]
+            continue
+        if live_documents and generator.random() < 0.2:
+            # a new version with the contents of another document
+            document['id'] = generator.choice(sorted(live_documents))
+        segmented_index.add_document(document)
+        live_documents[document['id']] = document
+        if step % 40 == 39:
+            segmented_index.merge_segments()
+    return live_documents
+
+
+def assert_matches_documents(segmented_index, live_documents):
+    expected_index = Index(list(live_documents.values()))
+    assert segmented_index.get_document_count() == len(live_documents)
+    for field, field_index in segmented_index.get_field_indexes().items():
+        terms = set(expected_index.index[field]) | set(field_index.get_terms_in_range())
+        expected = expected_index.get_posting_lists(terms, field, with_tf=True)
+        for term in terms:
+            postings = field_index.get_posting_list(term)
+            if term not in expected:
+                # terms of dead documents only
+                assert postings is None
+                continue
+            assert list(postings.doc_ids) == sorted(postings.doc_ids)
+            assert {segmented_index.get_document_id(doc): tf for doc, tf in postings.items()} == expected[term]
+            assert field_index.get_document_frequency(term) == len(expected[term])
+        assert field_index.get_terms_with_prefix('w1') == sorted(
+            term for term in field_index.get_terms_in_range() if term.startswith('w1'))
+
+
+@pytest.mark.parametrize('memtable_size, merge_factor', [(7, 3), (1000, 4), (1, 2)])
+def test_updates_are_searchable(documents, tmp_path, memtable_size, merge_factor):
+    segmented_index = SegmentedIndex(str(tmp_path), memtable_size, merge_factor, background_merge=False)
+    live_documents = apply_random_updates(segmented_index, documents, 400)
+
+    assert_matches_documents(segmented_index, live_documents)
+    segmented_index.merge_segments()
+    assert_matches_documents(segmented_index, live_documents)
+    segmented_index.close()
+
+
+def test_merges_keep_the_index_consistent(documents, tmp_path):
+    segmented_index = SegmentedIndex(str(tmp_path), memtable_size=5, merge_factor=2, background_merge=False)
+    live_documents = apply_random_updates(segmented_index, documents, 300)
+    segmented_index.flush()
+    segmented_index.merge_segments()
+
+    assert len(segmented_index.segments) < 300 / 5
+    assert_matches_documents(segmented_index, live_documents)
+    segmented_index.close()
+
+
+def test_background_merges(documents, tmp_path):
+    segmented_index = SegmentedIndex(str(tmp_path), memtable_size=5, merge_factor=2, background_merge=True)
+    live_documents = apply_random_updates(segmented_index, documents, 300)
+    segmented_index.flush()
+    # waits for the merge running in the background
+    segmented_index.merge_segments()
+
+    assert_matches_documents(segmented_index, live_documents)
+    segmented_index.close()
+
+
+def get_referenced_ids(segmented_index):
+    return {int(global_id) for segment in segmented_index.segments for global_id in segment.global_ids} | \
+        set(segmented_index.memtable_global_ids)
+
+
+def test_merged_segments_are_freed_once_released(documents, tmp_path):
+    segmented_index = SegmentedIndex(str(tmp_path), memtable_size=5, merge_factor=2, background_merge=False)
+    live_documents = apply_random_updates(segmented_index, documents, 100)
+    segmented_index.flush()
+
+    with segmented_index.pin() as (segments, _):
+        document_ids = dict(segmented_index.document_ids)
+        postings = segmented_index.get_field_indexes()['summaries'].get_posting_list('w0')
+        live_documents = apply_random_updates(segmented_index, documents, 100, seed=17,
+                                              live_documents=live_documents)
+        segmented_index.flush()
+        segmented_index.merge_segments()
+        merged_segments = [segment for segment in segments if segment not in segmented_index.segments]
+        assert merged_segments
+        # the view still reads the merged segments and the IDs of the dropped versions
+        assert all(os.path.isdir(segment.directory) for segment in merged_segments)
+        assert all(segmented_index.get_document_id(doc) == document_ids[doc] for doc in postings.doc_ids)
+
+    assert not any(os.path.isdir(segment.directory) for segment in merged_segments)
+    assert set(segmented_index.document_ids) == get_referenced_ids(segmented_index)
+    assert_matches_documents(segmented_index, live_documents)
+    segmented_index.close()
+
+
+def test_document_ids_are_compacted(documents, tmp_path):
+    segmented_index = SegmentedIndex(str(tmp_path), memtable_size=5, merge_factor=2, background_merge=False)
+    live_documents = apply_random_updates(segmented_index, documents, 400)
+    segmented_index.flush()
+    segmented_index.merge_segments()
+
+    assert set(segmented_index.document_ids) == get_referenced_ids(segmented_index)
+    assert len(segmented_index.document_ids) < segmented_index.next_global_id
+    assert_matches_documents(segmented_index, live_documents)
+    segmented_index.close()
+
+
+def test_reopened_index_keeps_the_documents(documents, tmp_path):
+    segmented_index = SegmentedIndex(str(tmp_path), memtable_size=7, merge_factor=3, background_merge=False)
+    live_documents = apply_random_updates(segmented_index, documents, 200)
+    segmented_index.close()
+
+    reopened_index = SegmentedIndex(str(tmp_path), memtable_size=7, merge_factor=3, background_merge=False)
+    assert_matches_documents(reopened_index, live_documents)
+
+    # the versions added after reopening get new global IDs
+    live_documents = apply_random_updates(reopened_index, documents, 60, seed=17, live_documents=live_documents)
+    assert_matches_documents(reopened_index, live_documents)
+    reopened_index.close()
+
+
+def get_scores(search_engine, query, method, weights):
+    """
+    {(IMDb ID, field): score} of every document scored for the query.
+    """
+    scores = search_engine.find_scores_with_safe_ranking(query, method, weights)
+    return {(search_engine.doc_id_map.get_document_id(doc_id), field): score
+            for field, field_scores in scores.field_scores.items()
+            for doc_id, score in zip(scores.documents.tolist(), field_scores.tolist())}
+
+
+@pytest.mark.parametrize('method', ['ltn.lnn', 'lnc.ltc', 'nnn.nnn'])
+def test_scores_match_a_rebuilt_index(documents, tmp_path, method):
+    segmented_index = SegmentedIndex(str(tmp_path / 'segments'), memtable_size=9, merge_factor=3,
+                                     background_merge=False)
+    live_documents = apply_random_updates(segmented_index, documents, 250)
+    # a segmented index has no document norms, its cosine normalization is over the query terms
+    store_json_indexes(Index(list(live_documents.values())), f'{tmp_path}/json/', document_norms=False)
+    segmented_engine = SearchEngine(segmented_index=segmented_index)
+    json_engine = SearchEngine(f'{tmp_path}/json/')
+    weights = {field: 1 for field in INVERTED_INDEXES}
+
+    for query in (['w1', 'w2'], ['drama', 'w5', 'tom hanks'], ['w30', 'w30', 'w59'], ['not-a-term']):
+        assert get_scores(segmented_engine, query, method, weights) == \
+               pytest.approx(get_scores(json_engine, query, method, weights))
+    segmented_index.close()
+
+
+def test_only_the_vector_space_model_is_available(documents, tmp_path):
+    segmented_index = SegmentedIndex(str(tmp_path), background_merge=False)
+    apply_random_updates(segmented_index, documents, 20)
+    segmented_engine = SearchEngine(segmented_index=segmented_index)
+    weights = {field: 1 for field in INVERTED_INDEXES}
+
+    assert segmented_engine.search(['w1'], 'lnc.ltc', weights)
+    with pytest.raises(ValueError):
+        segmented_engine.search(['w1'], 'OkapiBM25', weights)
+    with pytest.raises(ValueError):
+        segmented_engine.search(['w1'], 'lnc.ltc', weights, safe_ranking=False)
+    segmented_index.close()
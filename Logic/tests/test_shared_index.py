@@ -0,0 +1,92 @@
+import gc
+import logging
+import os
+import shutil
+import uuid
+import weakref
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pytest
+
+from Logic.core.indexer import shared_index
+from Logic.core.indexer.binary_index import BinaryIndex
+from Logic.core.indexer.doc_id_map import MappedDocIdMap
+from Logic.core.indexer.indexes_enum import Indexes, Index_formats
+from Logic.core.indexer.shared_index import get_shared_index_path, publish_indexes
+from Logic.core.search import SearchEngine
+
+WEIGHTS = {Indexes.STARS: 1, Indexes.GENRES: 0.5, Indexes.SUMMARIES: 1}
+
+
+@pytest.fixture(scope='module')
+def shared_path(index):
+    """
+    The index published in shared memory, removed after the tests.
+    """
+    path = get_shared_index_path(f'mir_test_{uuid.uuid4().hex}')
+    publish_indexes(index, path)
+    yield path
+    shutil.rmtree(path)
+
+
+def search_in_worker(path, query):
+    search_engine = SearchEngine(path, Index_formats.BINARY)
+    results = search_engine.search(query, 'lnc.ltc', WEIGHTS, max_results=None)
+    search_engine.close()
+    return results
+
+
+def test_indexes_are_published_in_shared_memory(shared_path, monkeypatch, tmp_path):
+    if os.path.isdir('/dev/shm'):
+        assert shared_path.startswith('/dev/shm/')
+    assert os.path.exists(os.path.join(shared_path, f'{Indexes.SUMMARIES.value}.bin'))
+
+    monkeypatch.setattr(shared_index, 'SHARED_MEMORY_PATH', str(tmp_path / 'no-shm'))
+    assert get_shared_index_path('name').startswith(os.path.join(shared_index.tempfile.gettempdir(), 'name'))
+    with pytest.raises(ValueError):
+        publish_indexes(None, str(tmp_path), Index_formats.JSON)
+
+
+def test_workers_search_the_shared_files(shared_path, search_engines):
+    queries = [['w0', 'drama'], ['w3', 'w3', 'tom hanks'], ['not-a-term']]
+    with ProcessPoolExecutor(2) as executor:
+        worker_results = list(executor.map(search_in_worker, [shared_path] * len(queries), queries))
+    for query, results in zip(queries, worker_results):
+        assert set(results) == set(search_engines['binary'].search(query, 'lnc.ltc', WEIGHTS, max_results=None))
+
+
+def test_mapped_doc_id_map_reads_the_doc_table(index, shared_path):
+    binary_index = BinaryIndex(f'{shared_path}{Indexes.STARS.value}.bin')
+    doc_id_map = MappedDocIdMap(binary_index)
+
+    # removed documents keep their internal IDs
+    assert doc_id_map.document_ids == index.doc_id_map.document_ids
+    assert len(doc_id_map) == len(index.doc_id_map)
+    for internal_id, document_id in enumerate(index.doc_id_map.document_ids):
+        assert doc_id_map.get_document_id(internal_id) == document_id
+        assert doc_id_map.get_internal_id(document_id) == internal_id
+        assert doc_id_map.add(document_id) == internal_id
+        assert document_id in doc_id_map
+    assert doc_id_map.get_internal_id('tt9999999') is None
+    assert 'tt9999999' not in doc_id_map
+    with pytest.raises(ValueError):
+        doc_id_map.add('tt9999999')
+    binary_index.close()
+
+
+def test_referenced_files_stay_mapped_until_released(shared_path, caplog):
+    binary_index = BinaryIndex(f'{shared_path}{Indexes.SUMMARIES.value}.bin')
+    doc_ids, tfs = binary_index.get_posting_arrays('w0')
+    doc_ids = np.frombuffer(doc_ids, dtype=np.uint32)
+    expected = doc_ids.tolist()
+    mapping = weakref.ref(binary_index.mmap)
+
+    with caplog.at_level(logging.WARNING):
+        binary_index.close()
+    assert 'still referenced' in caplog.text
+    assert doc_ids.tolist() == expected
+
+    del binary_index, doc_ids, tfs
+    gc.collect()
+    assert mapping() is None
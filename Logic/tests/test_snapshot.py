@@ -0,0 +1,83 @@
+import os
+
+import pytest
+
+from Logic.core.indexer.index import Index, INVERTED_INDEXES
+from Logic.core.indexer.indexes_enum import Indexes, Index_formats
+from Logic.core.indexer.snapshot import get_snapshot_path, prune_snapshots, publish_snapshot, read_manifest
+from Logic.core.search import SearchEngine, SnapshotSearchEngine
+
+WEIGHTS = {field: 1 for field in INVERTED_INDEXES}
+QUERY = ['w1', 'drama']
+
+
+@pytest.fixture
+def indexes(documents):
+    """
+    Indexes of two different halves of the documents, the versions of the snapshots.
+    """
+    return Index(documents[:150], [Indexes.SUMMARIES]), Index(documents[150:], [Indexes.SUMMARIES])
+
+
+def search_snapshot(root, name, index_format=Index_formats.BINARY):
+    engine = SearchEngine(get_snapshot_path(root, name), index_format)
+    results = engine.search(QUERY, 'lnc.ltc', WEIGHTS, max_results=20)
+    engine.close()
+    return results
+
+
+def test_reload_switches_to_the_published_snapshot(tmp_path, indexes):
+    root = str(tmp_path)
+    first = publish_snapshot(root, indexes[0])
+    engine = SnapshotSearchEngine(root)
+    assert engine.get_version() == first
+    assert engine.search(QUERY, 'lnc.ltc', WEIGHTS, max_results=20) == search_snapshot(root, first)
+
+    second = publish_snapshot(root, indexes[1], Index_formats.COMPRESSED)
+    # queries keep reading the loaded snapshot until the reload
+    assert engine.search(QUERY, 'lnc.ltc', WEIGHTS, max_results=20) == search_snapshot(root, first)
+    engine.reload(background=True).join()
+    assert engine.get_version() == second
+    results = engine.search(QUERY, 'lnc.ltc', WEIGHTS, max_results=20)
+    assert results == search_snapshot(root, second, Index_formats.COMPRESSED)
+    assert results != search_snapshot(root, first)
+
+    # reloading the current snapshot keeps it
+    assert engine.reload(background=False) is None
+    assert engine.get_version() == second
+    engine.close()
+
+
+def test_pinned_snapshot_outlives_the_swap(tmp_path, indexes):
+    root = str(tmp_path)
+    first = publish_snapshot(root, indexes[0])
+    engine = SnapshotSearchEngine(root, warmup_fields=[Indexes.SUMMARIES])
+    expected = search_snapshot(root, first)
+
+    with engine.acquire() as pinned_engine:
+        publish_snapshot(root, indexes[1])
+        engine.reload(background=False)
+        # the old snapshot is only closed when its last reader is done
+        assert pinned_engine.search(QUERY, 'lnc.ltc', WEIGHTS, max_results=20) == expected
+        assert engine.search(QUERY, 'lnc.ltc', WEIGHTS, max_results=20) != expected
+        pinned_engine.search(['w2*', 'tom hanks'], 'ltn.lnn', WEIGHTS, required=['w2'])
+    # every index the retired snapshot loaded is closed along with it
+    assert all(lazy_indexes.indexes == {} for lazy_indexes in pinned_engine.lazy_indexes)
+    engine.close()
+
+
+def test_manifest_and_pruning(tmp_path, indexes):
+    root = str(tmp_path)
+    with pytest.raises(FileNotFoundError):
+        SnapshotSearchEngine(root)
+
+    names = [publish_snapshot(root, indexes[version % 2]) for version in range(4)]
+    manifest = read_manifest(root)
+    assert names == sorted(names) and len(set(names)) == 4
+    assert manifest['current'] == names[-1]
+    assert manifest['snapshots'][names[-1]] == {'index_format': Index_formats.BINARY.value, 'positional': True}
+
+    prune_snapshots(root, keep=2)
+    assert sorted(read_manifest(root)['snapshots']) == names[2:]
+    assert [os.path.exists(get_snapshot_path(root, name)) for name in names] == [False, False, True, True]
+    assert read_manifest(root)['current'] == names[-1]
@@ -0,0 +1,93 @@
+import random
+
+import pytest
+
+from Logic.core.indexer.doc_id_map import DocIdMap
+from Logic.core.indexer.index_reader import Index_reader
+from Logic.core.indexer.indexes_enum import Indexes, Index_formats
+from Logic.core.indexer.posting_list import PostingList
+from Logic.core.indexer.term_dictionary import BLOCK_SIZE, TermDictionary, TermDictionaryIndex
+
+
+def make_terms(count, seed=3):
+    generator = random.Random(seed)
+    alphabet = 'abcéÿ中'
+    terms = {''.join(generator.choices(alphabet, k=generator.randint(1, 6))) for _ in range(count)}
+    return sorted(terms, key=lambda term: term.encode('utf-8'))
+
+
+@pytest.fixture(scope='module')
+def terms():
+    return make_terms(500)
+
+
+@pytest.fixture(scope='module')
+def term_dictionary(terms):
+    shuffled_terms = list(terms)
+    random.Random(5).shuffle(shuffled_terms)
+    return TermDictionary.from_terms(shuffled_terms)
+
+
+def test_terms_are_kept_in_byte_order(terms, term_dictionary):
+    assert len(term_dictionary) == len(terms)
+    assert list(term_dictionary) == terms
+    assert [term_dictionary.get_term(ordinal) for ordinal in range(len(terms))] == terms
+
+
+def test_find_returns_the_ordinal(terms, term_dictionary):
+    for ordinal, term in enumerate(terms):
+        assert term_dictionary.find(term) == ordinal
+    for term in ('', 'zzz', terms[0] + 'z', 'a' * 7):
+        assert term_dictionary.find(term) == (terms.index(term) if term in terms else -1)
+
+
+@pytest.mark.parametrize('prefix', ['', 'a', 'ab', 'é', 'ÿ', '中中', 'cccccc', 'x'])
+def test_find_prefix(terms, term_dictionary, prefix):
+    expected = [term for term in terms if term.startswith(prefix)]
+
+    assert term_dictionary.get_terms(term_dictionary.find_prefix(prefix)) == expected
+
+
+@pytest.mark.parametrize('low, high', [(None, None), ('b', None), (None, 'c'), ('ab', 'é'), ('c', 'b'), ('é', 'é')])
+def test_find_range(terms, term_dictionary, low, high):
+    expected = [term for term in terms
+                if (low is None or term.encode('utf-8') >= low.encode('utf-8'))
+                and (high is None or term.encode('utf-8') < high.encode('utf-8'))]
+
+    assert term_dictionary.get_terms(term_dictionary.find_range(low, high)) == expected
+
+
+@pytest.mark.parametrize('count', [0, 1, BLOCK_SIZE, BLOCK_SIZE + 1])
+def test_block_boundaries(count):
+    terms = [f'term{number:03d}' for number in range(count)]
+    term_dictionary = TermDictionary.from_terms(terms)
+
+    assert list(term_dictionary) == terms
+    assert [term_dictionary.find(term) for term in terms] == list(range(count))
+    assert term_dictionary.find('term') == -1
+    assert term_dictionary.get_terms(term_dictionary.find_prefix('term')) == terms
+
+
+def test_term_dictionary_index_looks_up_posting_lists(terms):
+    doc_id_map = DocIdMap()
+    field_index = {term: PostingList.from_dict({f'tt{ordinal:07d}': 1}, doc_id_map)
+                   for ordinal, term in enumerate(terms)}
+    term_dictionary_index = TermDictionaryIndex.from_field_index(field_index)
+
+    assert list(term_dictionary_index) == terms
+    assert all(term_dictionary_index[term] is field_index[term] for term in terms)
+    assert 'not-a-term' not in term_dictionary_index
+    assert term_dictionary_index.get_posting_list('not-a-term') is None
+    assert term_dictionary_index.get_terms_with_prefix('a') == [term for term in terms if term.startswith('a')]
+
+
+@pytest.mark.parametrize('index_format', [Index_formats.BINARY, Index_formats.COMPRESSED])
+def test_stored_term_dictionaries_match_the_index(index, index_paths, index_format):
+    field_index = index.index[Indexes.SUMMARIES.value]
+    stored_index = Index_reader(index_paths[index_format], Indexes.SUMMARIES, index_format=index_format).index
+
+    for prefix in ('', 'w', 'w1', 'w59', 'x'):
+        assert stored_index.get_terms_with_prefix(prefix) == field_index.get_terms_with_prefix(prefix)
+    assert stored_index.get_terms_in_range('w2', 'w4') == field_index.get_terms_in_range('w2', 'w4')
+    stored_index.close()
+
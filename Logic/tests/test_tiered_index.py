@@ -0,0 +1,84 @@
+import pytest
+
+from Logic.core.indexer.index import Index
+from Logic.core.indexer.indexes_enum import Indexes
+from Logic.core.indexer.tiered_index import TIERS, Tiered_index, split_into_tiers
+from conftest import ENGINE_FORMATS
+
+WEIGHTS = {Indexes.STARS: 1, Indexes.GENRES: 0.5, Indexes.SUMMARIES: 1}
+QUERIES = [['w0'], ['w0', 'w1', 'drama'], ['w30', 'tom hanks'], ['not-a-term']]
+
+
+def test_split_into_tiers():
+    postings = [(1, 1), (2, 4), (3, 2), (4, 2), (5, 1), (6, 3)]
+    lengths = {1: 1, 2: 8, 3: 2, 4: 4, 5: 10, 6: 3}
+    # impacts 1, 0.5, 1, 0.5, 0.1, 1
+    first_tier, second_tier, third_tier = split_into_tiers(postings, lengths.get, 2, 3)
+
+    assert first_tier == [(1, 1), (3, 2)]
+    assert second_tier == [(2, 4), (4, 2), (6, 3)]
+    assert third_tier == [(5, 1)]
+    assert split_into_tiers(postings, lengths.get, 10, 10) == (sorted(postings), [], [])
+
+
+def assert_tiers_split(tiered_index, index, index_name):
+    """
+    Asserts that the tiers of every term partition its postings by impact.
+    """
+    tiers = tiered_index.get_tiers(index_name)
+    field_index = index.index[index_name.value]
+    first_tier_size, second_tier_size = tiered_index.thresholds[index_name]
+    for term, postings in field_index.items():
+        expected = split_into_tiers(postings.items(), lambda document: index.document_lengths[index_name.value].get(
+            index.doc_id_map.get_document_id(document), 0), first_tier_size, second_tier_size)
+        assert [list(tiers[tier][term].items()) if term in tiers[tier] else [] for tier in TIERS] == list(expected)
+    for tier in TIERS:
+        assert set(tiers[tier]) <= set(field_index)
+
+
+def test_tiers_follow_index_updates(documents, tmp_path):
+    index = Index(documents[:200])
+    tiered_index = Tiered_index(f'{tmp_path}/', index)
+    tiered_index.thresholds[Indexes.SUMMARIES] = (5, 20)
+    tiered_index.tiered_index[Indexes.SUMMARIES] = tiered_index.convert_to_tiered_index(5, 20, Indexes.SUMMARIES)
+    for index_name in Indexes.STARS, Indexes.GENRES, Indexes.SUMMARIES:
+        assert_tiers_split(tiered_index, index, index_name)
+
+    for document in documents[200:250]:
+        index.add_document_to_index(document)
+    for document in documents[:200:3]:
+        index.remove_document_from_index(document['id'])
+    for document in documents[1:200:7]:
+        index.add_document_to_index({**documents[-1], 'id': document['id']})
+    for index_name in Indexes.STARS, Indexes.GENRES, Indexes.SUMMARIES:
+        assert_tiers_split(tiered_index, index, index_name)
+
+
+@pytest.mark.parametrize('engine_format', ENGINE_FORMATS)
+@pytest.mark.parametrize('method', ['lnc.ltc', 'ltn.lnn', 'OkapiBM25'])
+def test_unsafe_ranking_scores_exactly(search_engines, engine_format, method):
+    search_engine = search_engines[engine_format]
+    for query in QUERIES:
+        exhaustive = search_engine.search(query, method, WEIGHTS, max_results=None)
+        scores = dict(exhaustive)
+        for max_results in (1, 5, 20):
+            results = search_engine.search(query, method, WEIGHTS, safe_ranking=False, max_results=max_results)
+            assert len(results) == min(max_results, len(exhaustive))
+            assert results == sorted(results, key=lambda result: (-result[1], result[0]))
+            assert all(score == scores[document_id] for document_id, score in results)
+        # with every tier read, unsafe ranking finds every document
+        assert search_engine.search(query, method, WEIGHTS, safe_ranking=False, max_results=None) == exhaustive
+
+
+def test_unsafe_ranking_reads_the_first_tier_first(search_engines, live_documents):
+    """
+    w0 is in more summaries than its first tier holds, so a small search only reads that tier.
+    """
+    weights = {Indexes.SUMMARIES: 1}
+    search_engine = search_engines['binary']
+    first_tier = search_engine.tiered_index[Indexes.SUMMARIES]['first_tier'].get_posting_list('w0')
+    first_tier_documents = {search_engine.doc_id_map.get_document_id(document) for document in first_tier.keys()}
+    assert len(first_tier_documents) < sum('w0' in document['summaries'][0].split() for document in live_documents)
+
+    results = search_engine.search(['w0'], 'ltn.lnn', weights, safe_ranking=False, max_results=10)
+    assert {document_id for document_id, _ in results} <= first_tier_documents
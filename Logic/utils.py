@@ -1,5 +1,8 @@
+from functools import lru_cache
 from typing import Dict, List
 from .core.search import SearchEngine
+from .core.utility.preprocess import Preprocessor
+from .core.utility.query_cache import QueryCache
 from .core.utility.spell_correction import SpellCorrection
 from .core.utility.snippet import Snippet
 from .core.indexer.indexes_enum import Indexes, Index_types
@@ -7,7 +10,9 @@ import json
 
 movies_dataset = None  # TODO: load your movies dataset (from the json file you saved your indexes in), here
 # You can refer to `get_movie_by_id` to see how this is used.
-# search_engine = SearchEngine()
+all_documents = []  # TODO: the documents the spell correction learns its vocabulary from, see `correct_text`
+# no index is read until the first search, repeated searches are answered from the cache
+search_engine = SearchEngine(query_cache=QueryCache())
 
 
 def correct_text(text: str, all_documents: List[str]) -> str:
@@ -34,10 +39,13 @@ def correct_text(text: str, all_documents: List[str]) -> str:
 def search(
     query: str,
     max_result_count: int,
-    method: str = "ltn-lnn",
+    method: str = "ltn.lnn",
     weights: list = [0.3, 0.3, 0.4],
     should_print=False,
     preferred_genre: str = None,
+    unigram_smoothing: str = None,
+    alpha: float = None,
+    lamda: float = None,
 ):
     """
     Finds relevant documents to query
@@ -50,7 +58,7 @@ def search(
     max_result_count: Return top 'max_result_count' docs which have the highest scores.
                       notice that if max_result_count = -1, then you have to return all docs
 
-    method: 'ltn.lnn' or 'ltc.lnc' or 'OkapiBM25'
+    method: 'ltn.lnn' or 'ltc.lnc' or 'OkapiBM25' or 'BM25F'
 
     weights:
         The list, containing importance weights in the search result for each of these items:
@@ -62,16 +70,46 @@ def search(
         A list containing preference rates for each genre. If None, the preference rates are equal.
         (You can leave it None for now)
 
+    unigram_smoothing, alpha, lamda:
+        The smoothing of the 'unigram' method the UI offers. The search engine has no unigram
+        language model yet, so they are not used by the other methods.
+
     Returns
     ----------------------------------------------------------------------------------------------------
     list
     Retrieved documents with snippet
     """
-    # weights = ...  # TODO
-    # return search_engine.search(
-    #     query, method, weights, max_results=max_result_count, safe_ranking=True
-    # )
-    return None
+    if method == "unigram":
+        raise ValueError("The unigram language model is not supported by the search engine")
+    weights = {Indexes.STARS: weights[0], Indexes.GENRES: weights[1], Indexes.SUMMARIES: weights[2]}
+    return search_engine.search(
+        preprocess_query(query), method, weights,
+        max_results=None if max_result_count == -1 else max_result_count, safe_ranking=True
+    )
+
+
+@lru_cache(maxsize=None)
+def get_preprocessor() -> Preprocessor:
+    return Preprocessor([])
+
+
+def preprocess_query(query: str) -> List[str]:
+    """
+    Normalizes a query the way the documents were normalized when indexed.
+
+    Returns
+    ----------
+    list
+        The terms of the query.
+    """
+    return get_preprocessor().normalize(query).split()
+
+
+def get_search_cache_stats() -> Dict[str, float]:
+    """
+    Returns the hit and miss counters of the search result cache, see `QueryCache.get_stats`.
+    """
+    return search_engine.query_cache.get_stats()
 
 
 def get_movie_by_id(id: str, movies_dataset: List[Dict[str, str]]) -> Dict[str, str]:
@@ -63,6 +63,12 @@ def get_summary_with_snippet(movie_info, query):
 
 def search_time(start, end):
     st.success("Search took: {:.6f} milli-seconds".format((end - start) * 1e3))
+    cache_stats = utils.get_search_cache_stats()
+    st.caption(
+        "Result cache: {} hits, {} misses ({:.0%} hit rate)".format(
+            cache_stats["hits"], cache_stats["misses"], cache_stats["hit_rate"]
+        )
+    )
 
 
 def search_handling(
@@ -246,7 +252,7 @@ def main():
 
         search_weights = [weight_stars, weight_genres, weight_summary]
         search_method = st.selectbox(
-            "Search method", ("ltn.lnn", "ltc.lnc", "OkapiBM25", "unigram")
+            "Search method", ("ltn.lnn", "ltc.lnc", "OkapiBM25", "BM25F", "unigram")
         )
 
         unigram_smoothing = None